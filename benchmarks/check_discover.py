@@ -0,0 +1,134 @@
+"""Check the discover feed's paging against the full order it stands for.
+
+    python benchmarks/check_discover.py                  # the repo's projects_data.json
+    python benchmarks/check_discover.py --catalog-size 40000
+
+A page is computed on its own, from a seed and a cursor, never from the
+pages before it. This checks for several seeds and every mix that:
+
+* the Feistel permutation is a bijection, for sizes around powers of four;
+* the whole feed is a permutation of the live projects (or of the strata
+  that have a weight);
+* random pages at random cursors are exactly slices of the whole feed;
+* weights show up in the share of each stratum near the top of the feed;
+* the feed of a patched catalog skips removed projects and includes added
+  ones.
+
+Prints one line per check and exits with status 1 if any failed.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from fein.catalog import CatalogLoader  # noqa: E402
+from fein.discover import FeistelPermutation, discover_feed  # noqa: E402
+from fein.segments import parse_patch  # noqa: E402
+
+from synthetic_catalog import DEFAULT_SEED, write_catalog  # noqa: E402
+
+SEEDS = (0, 1, 123456789)
+FEEDS = (
+    (None, None),
+    ("domain", None),
+    ("difficulty", None),
+    ("difficulty", {"Beginner": 3, "Expert": 1}),
+)
+PAGES_PER_FEED = 30
+MAX_PAGE = 60
+
+
+def check(source, seed):
+    failures = []
+
+    def report(name, ok, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{f': {detail}' if detail else ''}")
+        if not ok:
+            failures.append(name)
+
+    sizes = [1, 2, 3, 5, 17, 1000, 4095, 4096, 4097]
+    report("permutation", all(
+        sorted(FeistelPermutation(n, key)[i] for i in range(n)) == list(range(n)) for n in sizes for key in SEEDS
+    ))
+
+    workdir = tempfile.mkdtemp(prefix="fein-discover-")
+    try:
+        path = os.path.join(workdir, "projects_data.json")
+        shutil.copy(source, path)
+        loader = CatalogLoader(path, compiled=False)
+        catalog = loader.get()
+        rng = random.Random(seed)
+
+        def paging(catalog, label):
+            for mix, weights in FEEDS:
+                for feed_seed in SEEDS:
+                    feed = discover_feed(catalog, feed_seed, mix, weights)
+                    full, next_cursor = feed.page(0, feed.total)
+                    name = f"{label} {mix or 'all'}{' weighted' if weights else ''} seed {feed_seed}"
+                    if weights is None:
+                        report(f"{name}: every live project once", next_cursor is None
+                               and sorted(full.tolist()) == catalog.live_ids().tolist())
+                    else:
+                        report(f"{name}: no repeats", next_cursor is None and len(set(full.tolist())) == feed.total)
+                    wrong = []
+                    for _ in range(PAGES_PER_FEED):
+                        cursor, size = rng.randrange(feed.total), rng.randint(1, MAX_PAGE)
+                        ids, next_cursor = feed.page(cursor, size)
+                        end = min(cursor + size, feed.total)
+                        if not np.array_equal(ids, full[cursor:end]) or next_cursor != (end if end < feed.total else None):
+                            wrong.append(cursor)
+                    report(f"{name}: pages are slices", not wrong, f"cursors {wrong[:5]}" if wrong else "")
+
+        paging(catalog, "base")
+
+        feed = discover_feed(catalog, SEEDS[1], "difficulty", {"Beginner": 3, "Expert": 1})
+        levels = Counter(catalog.project(pid).difficulty for pid in feed.page(0, 200)[0])
+        report("weights", levels["Intermediate"] == levels["Advanced"] == 0
+               and 2 <= levels["Beginner"] / max(1, levels["Expert"]) <= 4, dict(levels))
+
+        live = catalog.live_ids().tolist()
+        removed = rng.sample(live, 5)
+        document = {
+            "add": [{"domain": "Brand New Domain", "title": f"Discover check {i}", "description": "d",
+                     "difficulty": "Beginner"} for i in range(3)],
+            "remove": removed,
+        }
+        catalog, changes = loader.apply_patch(parse_patch(json.dumps(document)))
+        full = discover_feed(catalog, SEEDS[0]).page(0, catalog.live_count)[0].tolist()
+        report("patched catalog", not set(removed) & set(full) and set(changes.added.tolist()) <= set(full))
+        paging(catalog, "patched")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--catalog", default=os.path.join(ROOT, "projects_data.json"))
+    parser.add_argument("--catalog-size", type=int, help="use a synthetic catalog of this many projects instead")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+    source = args.catalog
+    if args.catalog_size:
+        source = os.path.join(ROOT, "benchmarks", ".data", f"projects_{args.catalog_size}_{args.seed}.json")
+        if not os.path.exists(source):
+            write_catalog(source, args.catalog_size, args.seed)
+    failures = check(source, args.seed)
+    if failures:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    print("discover pages match the full feed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Check that patched catalogs answer like a catalog rebuilt from scratch.
+
+    python benchmarks/check_patches.py                   # 4000 projects, 12 patches
+    python benchmarks/check_patches.py --size 40000 --patches 30
+
+Builds a synthetic catalog, warms every derived structure so they all get
+patched rather than rebuilt, then applies random patches (adds, updates,
+removes; enough of them to merge delta segments). The result is compared
+with a catalog built in one go from the same projects, removed ones left
+as blank gaps so ids line up:
+
+* filter results for every combination of a set of filters;
+* substring and prefix search;
+* sidebar facets and result facet counts;
+* spelling suggestions;
+* ranking and related projects, which keep the base version's IDF and
+  LSA basis until compaction, only for returning live projects;
+* a second loader replaying the saved patches, and a compacted copy.
+
+Prints one line per check and exits with status 1 if any failed.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from fein.catalog import Catalog, CatalogLoader  # noqa: E402
+from fein.facets import CatalogFacets, facet_columns, live_facet_counts  # noqa: E402
+from fein.fuzzy import spell_index  # noqa: E402
+from fein.query import ProjectQuery, filter_ids  # noqa: E402
+from fein.ranking import ranking_model  # noqa: E402
+from fein.search_index import search_index  # noqa: E402
+from fein.segments import MAX_DELTA_SEGMENTS, compact, parse_patch  # noqa: E402
+from fein.semantic import semantic_index  # noqa: E402
+from fein.store import StoreBuilder  # noqa: E402
+
+from synthetic_catalog import DEFAULT_SEED, write_catalog  # noqa: E402
+
+NEW_DOMAIN = "Brand New Domain"
+NEW_TECH = "Quokka (Open Source)"
+NEW_WORD = "zebracorn"
+TOPICS = ["", NEW_WORD, "learn", "ml", "quokkanet"]
+SEARCHES = [f"{NEW_WORD} tr", "quo", "real-time", "tensor", "data pipe"]
+TYPOS = ["zebrakorn", "quokkanat", "lerning", "anomoly", "blokchain"]
+
+
+def random_project(catalog, rng, number):
+    """A project built from a random existing one, with values no base project has."""
+    source = catalog.project(rng.choice(catalog.live_ids().tolist()))
+    return {
+        "domain": rng.choice([NEW_DOMAIN, source.domain]),
+        "title": f"{NEW_WORD.capitalize()} tracker {number}",
+        "description": f"{source.description} with quokkanet",
+        "tech": [*source.tech, NEW_TECH],
+        "difficulty": rng.choice(["Beginner", "Expert"]),
+        "datasets": list(source.datasets),
+        "keywords": [NEW_WORD, *source.keywords[:1]],
+    }
+
+
+def rebuilt(catalog):
+    """``catalog`` built from scratch, removed projects as blanks so ids line up."""
+    builder = StoreBuilder()
+    for project in catalog.projects():
+        record = {"title": project.title, "description": project.description, "tech": list(project.tech),
+                  "difficulty": project.difficulty, "datasets": list(project.datasets), "keywords": list(project.keywords)}
+        builder.add(record, project.domain)
+    return Catalog(path=catalog.path, version="rebuilt", mtime=0, loaded_at=0, load_seconds=0, store=builder.build())
+
+
+def queries():
+    return [
+        ProjectQuery.from_filters(topic, difficulty, tech, dataset, keywords)
+        for topic in TOPICS
+        for difficulty in [(1, 4), (2, 3)]
+        for tech in [(), (NEW_TECH,), ("PyTorch (Open Source)",)]
+        for dataset in ["", "data"]
+        for keywords in ["", NEW_WORD]
+    ]
+
+
+def check(size, patches, seed):
+    failures = []
+
+    def report(name, ok, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{f': {detail}' if detail else ''}")
+        if not ok:
+            failures.append(name)
+
+    workdir = tempfile.mkdtemp(prefix="fein-patches-")
+    try:
+        path = os.path.join(workdir, "projects_data.json")
+        write_catalog(path, size, seed)
+        loader = CatalogLoader(path, compiled=True)
+        catalog = loader.get()
+        for build in (facet_columns, ranking_model, spell_index, semantic_index, search_index):
+            build(catalog)
+
+        rng = random.Random(seed)
+        number = 0
+        added, removed = set(), set()
+        for _ in range(patches):
+            picks = rng.sample(catalog.live_ids().tolist(), 6)
+            document = {
+                "add": [random_project(catalog, rng, number + i) for i in range(3)],
+                "update": [{"id": pid, **random_project(catalog, rng, pid)} for pid in picks[:3]],
+                "remove": picks[3:],
+            }
+            number += 3
+            catalog, changes = loader.apply_patch(parse_patch(json.dumps(document)))
+            added.update(changes.added.tolist())
+            removed.update(changes.removed.tolist())
+        live = catalog.live_ids()
+        report("patches applied", len(catalog.store.segments) <= MAX_DELTA_SEGMENTS + 1,
+               f"{patches} patches, {len(catalog.store.segments)} segments, {len(live)} live projects")
+
+        reference = rebuilt(catalog)
+        all_queries = queries()
+        mismatches = [q for q in all_queries if not np.array_equal(filter_ids(catalog, q), filter_ids(reference, q))]
+        report("filters", not mismatches, f"{len(all_queries) - len(mismatches)}/{len(all_queries)} match")
+
+        patched_index, reference_index = search_index(catalog), search_index(reference)
+        wrong = [text for text in SEARCHES
+                 if not np.array_equal(patched_index.substring(text), np.intersect1d(reference_index.substring(text), live))
+                 or not np.array_equal(patched_index.prefix(text), np.intersect1d(reference_index.prefix(text), live))]
+        report("search", not wrong, ", ".join(wrong))
+
+        patched_facets, reference_facets = CatalogFacets.from_catalog(catalog), CatalogFacets.from_catalog(reference)
+        # The rebuilt catalog has a blank domain for its gaps.
+        reference_domains = {domain: count for domain, count in reference_facets.domain_counts.items() if domain}
+        report("catalog facets", (
+            patched_facets.tech_options == reference_facets.tech_options
+            and patched_facets.dataset_vocabulary == reference_facets.dataset_vocabulary
+            and patched_facets.keyword_vocabulary == reference_facets.keyword_vocabulary
+            and patched_facets.domain_counts == reference_domains
+            and patched_facets.difficulty_histogram == reference_facets.difficulty_histogram
+        ))
+        wrong = [q for q in all_queries[:20] if live_facet_counts(catalog, filter_ids(catalog, q), tech_limit=50)
+                 != live_facet_counts(reference, filter_ids(reference, q), tech_limit=50)]
+        report("result facets", not wrong)
+
+        suggestions = {typo: spell_index(catalog).suggest(typo) for typo in TYPOS}
+        expected = {typo: spell_index(reference).suggest(typo) for typo in TYPOS}
+        report("spelling", suggestions == expected, json.dumps(suggestions))
+
+        candidates = filter_ids(catalog, ProjectQuery.from_filters(NEW_WORD, (1, 4), (), "", ""))
+        ranked = ranking_model(catalog).top_k(candidates, NEW_WORD, len(candidates))
+        report("ranking", sorted(ranked) == sorted(candidates.tolist()) and bool(ranked),
+               f"{len(ranked)} ranked")
+
+        semantic = semantic_index(catalog)
+        neighbours = [pid for new in sorted(added & set(live.tolist())) for pid, _score in semantic.related(new, 5)]
+        neighbours += [pid for pid, _score in semantic.search(f"{NEW_WORD} tracker", 10)]
+        report("semantic", bool(neighbours) and all(catalog.has_project(pid) for pid in neighbours)
+               and not removed & set(neighbours))
+
+        replayed = CatalogLoader(path, compiled=True).get()
+        report("replayed from disk", replayed.version == catalog.version and all(
+            np.array_equal(filter_ids(replayed, q), filter_ids(catalog, q)) for q in all_queries))
+
+        compacted_path = os.path.join(workdir, "compacted.json")
+        compact(catalog, compacted_path)
+        compacted = CatalogLoader(compacted_path, compiled=False).get()
+        # Compaction closes the gaps, so compare by title.
+        report("compacted", all(
+            [compacted.project(pid).title for pid in filter_ids(compacted, q)]
+            == [catalog.project(pid).title for pid in filter_ids(catalog, q)] for q in all_queries))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=4000)
+    parser.add_argument("--patches", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+    failures = check(args.size, args.patches, args.seed)
+    if failures:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    print("patched catalog matches a full rebuild")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
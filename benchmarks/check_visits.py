@@ -0,0 +1,128 @@
+"""Check the global visit counter under concurrent processes and flushes.
+
+    python benchmarks/check_visits.py
+    python benchmarks/check_visits.py --processes 8 --visits 2000
+
+For the file and SQLite stores, this checks that:
+
+* several processes, each with several threads counting visits, persist
+  every visit once;
+* reads running alongside those writers never see a blank or shrinking
+  counter;
+* a session's ``total()`` never goes down while a flush is persisting its
+  pending visits, also when the store is slow.
+
+Prints one line per check and exits with status 1 if any failed.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fein.visits import BatchedVisitCounter, FileCounterStore, SQLiteCounterStore  # noqa: E402
+
+THREADS = 4
+STORES = {"file": FileCounterStore, "sqlite": SQLiteCounterStore}
+
+
+def count_visits(kind, path, visits):
+    counter = BatchedVisitCounter(STORES[kind](path), flush_interval=0.01, max_pending=7).start()
+    threads = [threading.Thread(target=lambda: [counter.increment() for _ in range(visits)])
+               for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.stop()
+
+
+class SlowStore:
+    """A store that takes its time to persist, so flushes overlap reads."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def read(self):
+        return self.store.read()
+
+    def add(self, amount):
+        time.sleep(0.002)
+        return self.store.add(amount)
+
+
+def check(processes, visits):
+    failures = []
+
+    def report(name, ok, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{f': {detail}' if detail else ''}")
+        if not ok:
+            failures.append(name)
+
+    workdir = tempfile.mkdtemp(prefix="fein-visits-")
+    try:
+        for kind, store_class in STORES.items():
+            path = os.path.join(workdir, f"visits.{kind}")
+            store = store_class(path)
+            store.add(1)
+            writers = [multiprocessing.Process(target=count_visits, args=(kind, path, visits))
+                       for _ in range(processes)]
+            for writer in writers:
+                writer.start()
+            seen = [store.read()]
+            while any(writer.is_alive() for writer in writers):
+                seen.append(store.read())
+            for writer in writers:
+                writer.join()
+            expected = 1 + processes * THREADS * visits
+            report(f"{kind}: every visit persisted", store.read() == expected, f"{store.read()}/{expected}")
+            dips = sum(1 for before, after in zip(seen, seen[1:]) if after < before)
+            report(f"{kind}: concurrent reads", dips == 0 and min(seen) >= 1,
+                   f"{len(seen)} reads, {dips} went down, lowest {min(seen)}")
+
+            counter = BatchedVisitCounter(SlowStore(store), flush_interval=0.001, max_pending=3).start()
+            done = threading.Event()
+            totals = []
+
+            def watch():
+                while not done.is_set():
+                    totals.append(counter.total())
+
+            watcher = threading.Thread(target=watch)
+            watcher.start()
+            for i in range(visits):
+                counter.increment()
+                if i % 10 == 0:
+                    time.sleep(0.0005)
+            counter.stop()
+            done.set()
+            watcher.join()
+            dips = sum(1 for before, after in zip(totals, totals[1:]) if after < before)
+            report(f"{kind}: total() during flushes", dips == 0 and counter.total() == expected + visits,
+                   f"{len(totals)} totals, {dips} went down, final {counter.total()}/{expected + visits}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--visits", type=int, default=500, help="visits per thread")
+    args = parser.parse_args(argv)
+    failures = check(args.processes, args.visits)
+    if failures:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+    print("visit counter kept every visit and never went down")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Cold-start import cost of the app, per module.
+
+    python benchmarks/import_report.py                 # the imports of streamlit_app.py
+    python benchmarks/import_report.py fein.ranking sklearn --top 15
+
+Runs the imports in a fresh interpreter under ``python -X importtime`` and
+prints the total, the most expensive modules (cumulative microseconds),
+the resident memory of that interpreter afterwards, and which of the
+known heavy packages ended up loaded.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "streamlit_app.py")
+HEAVY_PACKAGES = ("pandas", "plotly", "scipy", "sklearn", "statsmodels", "pyarrow", "matplotlib")
+
+_PROBE = """
+import importlib, json, resource, sys
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(json.dumps({
+    "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def app_imports(path=APP):
+    """Top-level modules imported at module level by ``path``, in order."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def measure(modules):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, *modules],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # header line
+        name = fields[2].rstrip()
+        timings.append((name.strip(), self_us, cumulative_us, len(name) - len(name.lstrip())))
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, probe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", help="modules to import (default: those of streamlit_app.py)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args(argv)
+
+    modules = args.modules or app_imports()
+    timings, probe = measure(modules)
+    # Top-level entries (least indented) add up to the whole import.
+    depth = min((entry[3] for entry in timings), default=0)
+    total_us = sum(cumulative for _, _, cumulative, indent in timings if indent == depth)
+    loaded = set(probe["modules"])
+    heavy = [name for name in HEAVY_PACKAGES if name in loaded]
+
+    print(f"imports: {', '.join(modules)}")
+    print(f"total import time {total_us / 1000:.1f} ms, {len(loaded)} modules, max RSS {probe['max_rss_kib'] / 1024:.0f} MiB")
+    print(f"heavy packages loaded: {', '.join(heavy) or 'none'}")
+    print(f"\n{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us, _ in sorted(timings, key=lambda entry: -entry[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "modules": modules,
+                "total_import_ms": total_us / 1000,
+                "max_rss_kib": probe["max_rss_kib"],
+                "heavy_packages": heavy,
+                "timings": [{"module": n, "self_us": s, "cumulative_us": c} for n, s, c, _ in timings],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
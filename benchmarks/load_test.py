@@ -0,0 +1,294 @@
+"""Concurrent-session load test for ``streamlit_app.py``, run in-process.
+
+    python benchmarks/load_test.py                               # 40 sessions, 8 at a time
+    python benchmarks/load_test.py --sessions 200 --concurrency 50 --catalog-size 40000
+    python benchmarks/load_test.py --json after.json
+
+Every simulated student gets their own Streamlit ``AppTest`` session and
+walks a scripted flow: landing page, a topic search, a few "Load More"
+clicks, "Generate AI Prompt" on one of the cards and "Back to Projects".
+Sessions run on a thread pool inside one interpreter, like the sessions of
+a single ``streamlit run`` server, so they share the catalog, caches and
+visit counter exactly as they would in production. ``AppTest`` swaps a
+process-global runtime in and out around every run, so script runs take
+turns on a lock; with the GIL a server executes them about the same way.
+Latency is reported as seen by the user (queueing included) and as the
+time the rerun itself took. Background work such as the catalog load and
+the visit-counter flush still runs concurrently.
+
+The app runs in a scratch directory holding the catalog (the repo's
+``projects_data.json`` or a synthetic one), its own visit counter and its
+own usage log, so nothing in the checkout is touched. The report gives
+throughput, per-step rerun latency percentiles, memory per session and how
+many visit-counter increments were lost.
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from synthetic_catalog import DEFAULT_SEED, write_catalog  # noqa: E402
+
+APP = os.path.join(ROOT, "streamlit_app.py")
+SEARCH_TERMS = ["learning", "vision", "fraud", "robot", "blockchain", "nlp", "security", "game", "quantum", "data"]
+STEPS = ("landing", "search", "load_more", "ai_prompt", "back")
+MAX_LOAD_MORE = 3
+RUN_TIMEOUT = 120
+
+
+class SessionFailed(Exception):
+    pass
+
+
+_run_lock = threading.Lock()
+
+
+def _rss_kib():
+    # Current resident set, which unlike ru_maxrss can go down again.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _state_kib(at):
+    state = {}
+    for key in at.session_state:
+        try:
+            state[key] = pickle.dumps(at.session_state[key])
+        except Exception:
+            continue  # widget internals and other unpicklable values
+    return sum(len(value) for value in state.values()) / 1024
+
+
+def _button(buttons, prefix):
+    return [button for button in buttons if (button.key or "").startswith(prefix)]
+
+
+def run_session(number, seed, think_seconds, timings):
+    """Walk one scripted flow; returns the finished ``AppTest`` and its state size."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed * 100_003 + number)
+    at = AppTest.from_file(APP, default_timeout=RUN_TIMEOUT)
+
+    def step(name, action=None):
+        if action is not None:
+            action()
+        requested = time.perf_counter()
+        with _run_lock:
+            started = time.perf_counter()
+            at.run()
+            finished = time.perf_counter()
+        timings.append((name, finished - requested, finished - started))
+        if at.exception:
+            raise SessionFailed(f"session {number}, {name}: {at.exception[0].message}")
+        if think_seconds:
+            time.sleep(rng.uniform(0, 2 * think_seconds))
+
+    step("landing")
+    # A first visit during the initial catalog load shows the preview; the app reruns until it's in.
+    for _ in range(RUN_TIMEOUT * 2):
+        if not any("Loading the full project catalog" in info.value for info in at.info):
+            break
+        step("landing")
+
+    def search():
+        at.sidebar.text_input[0].input(rng.choice(SEARCH_TERMS))
+        next(button for button in at.sidebar.button if "Launch" in button.label).click()
+
+    step("search", search)
+    for _ in range(rng.randint(0, MAX_LOAD_MORE)):
+        load_more = _button(at.button, "load_more_projects")
+        if not load_more:
+            break
+        step("load_more", load_more[0].click)
+    cards = _button(at.button, "ai_prompt_")
+    if cards:
+        step("ai_prompt", rng.choice(cards).click)
+        back = _button(at.sidebar.button, "back_to_projects_btn")
+        if back:
+            step("back", back[0].click)
+    return at, _state_kib(at)
+
+
+def _percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {
+        "count": len(ms),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def prepare_workdir(workdir, catalog, catalog_size, seed):
+    source = os.path.join(workdir, "projects_data.json")
+    if catalog_size:
+        path = os.path.join(ROOT, "benchmarks", ".data", f"projects_{catalog_size}_{seed}.json")
+        if not os.path.exists(path):
+            write_catalog(path, catalog_size, seed)
+        catalog = path
+    os.symlink(os.path.abspath(catalog), source)
+    return source
+
+
+def load_test(sessions, concurrency, catalog, catalog_size=None, seed=DEFAULT_SEED, think_seconds=0.0):
+    workdir = tempfile.mkdtemp(prefix="fein-load-")
+    previous_cwd = os.getcwd()
+    visits_path = os.path.join(workdir, "global_visits.txt")
+    environment = {
+        "FEIN_VISIT_STORE": visits_path,
+        "FEIN_VISIT_BACKEND": "file",
+        "FEIN_USAGE_LOG": os.path.join(workdir, "usage_events.jsonl"),
+    }
+    previous_environment = {name: os.environ.get(name) for name in environment}
+    from fein.usage import shared_event_log
+    from fein.visits import shared_visit_counter
+    try:
+        os.environ.update(environment)
+        prepare_workdir(workdir, catalog, catalog_size, seed)
+        # The app resolves the catalog and visit store relative to the working directory.
+        os.chdir(workdir)
+
+        timings = []
+        failures = []
+        state_kib = []
+        finished = []
+        lock = threading.Lock()
+
+        def one(number):
+            session_timings = []
+            try:
+                at, kib = run_session(number, seed, think_seconds, session_timings)
+            except Exception as e:
+                with lock:
+                    failures.append(str(e) if isinstance(e, SessionFailed) else f"session {number}: {e!r}")
+            else:
+                with lock:
+                    # Keep sessions alive so their state counts towards memory, as on a server.
+                    finished.append(at)
+                    state_kib.append(kib)
+            with lock:
+                timings.extend(session_timings)
+
+        # One session first pays for the catalog load and imports, so the memory
+        # growth below is what the sessions themselves cost.
+        cold_timings = []
+        cold_started = time.perf_counter()
+        run_session(-1, seed, 0, cold_timings)
+        cold_start = time.perf_counter() - cold_started
+
+        rss_before = _rss_kib()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(sessions)))
+        elapsed = time.perf_counter() - started
+        rss_after = _rss_kib()
+
+        counter = shared_visit_counter()
+        counter.flush()
+        try:
+            with open(visits_path) as f:
+                persisted = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            persisted = 0
+
+        by_step = {name: [timing for timing in timings if timing[0] == name] for name in STEPS}
+        return {
+            "sessions": sessions,
+            "concurrency": concurrency,
+            "cold_session_s": cold_start,
+            "cold_landing_ms": sum(total for name, total, _ in cold_timings if name == "landing") * 1000,
+            "completed": len(finished),
+            "failures": failures,
+            "elapsed_s": elapsed,
+            "reruns": len(timings),
+            "reruns_per_s": len(timings) / elapsed if elapsed else 0.0,
+            "sessions_per_s": len(finished) / elapsed if elapsed else 0.0,
+            # As seen by the user, including the wait for other sessions' reruns.
+            "latency": {
+                "all": _percentiles([total for _, total, _ in timings]) if timings else None,
+                **{name: _percentiles([total for _, total, _ in samples]) for name, samples in by_step.items() if samples},
+            },
+            "service": {
+                "all": _percentiles([run for _, _, run in timings]) if timings else None,
+                **{name: _percentiles([run for _, _, run in samples]) for name, samples in by_step.items() if samples},
+            },
+            "rss_growth_kib": rss_after - rss_before,
+            "rss_per_session_kib": (rss_after - rss_before) / max(1, len(finished)),
+            "session_state_kib_p50": float(np.median(state_kib)) if state_kib else 0.0,
+            # Every session, the cold one included, counts itself once on landing.
+            "visits_expected": sessions + 1,
+            "visits_persisted": persisted,
+            "visits_lost": sessions + 1 - persisted,
+        }
+    finally:
+        # The process-wide log and counter write into the scratch directory; stop them before it goes.
+        shared_event_log().stop()
+        shared_visit_counter().stop()
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        for name, value in previous_environment.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def print_report(report):
+    print(f"{report['completed']}/{report['sessions']} sessions, {report['concurrency']} concurrent, "
+          f"{report['elapsed_s']:.1f} s")
+    print(f"cold session {report['cold_session_s']:.1f} s, landing {report['cold_landing_ms']:.0f} ms")
+    print(f"throughput {report['reruns_per_s']:.1f} reruns/s, {report['sessions_per_s']:.2f} sessions/s")
+    for title, key in (("latency seen by the user", "latency"), ("rerun time alone", "service")):
+        print(f"\n{title}\n{'step':<12} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+        for name, stats in report[key].items():
+            if stats:
+                print(f"{name:<12} {stats['count']:>6} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} "
+                      f"{stats['p99_ms']:>10.1f} {stats['max_ms']:>10.1f}")
+    print(f"\nmemory: RSS +{report['rss_growth_kib'] / 1024:.1f} MiB, "
+          f"{report['rss_per_session_kib']:.0f} KiB per session, "
+          f"session state p50 {report['session_state_kib_p50']:.1f} KiB")
+    print(f"visit counter: {report['visits_persisted']}/{report['visits_expected']} persisted, "
+          f"{report['visits_lost']} lost")
+    for failure in report["failures"][:10]:
+        print(f"FAILED {failure}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="sessions running at the same time")
+    parser.add_argument("--catalog", default=os.path.join(ROOT, "projects_data.json"))
+    parser.add_argument("--catalog-size", type=int, help="use a synthetic catalog of this many projects instead")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a session's clicks")
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args(argv)
+
+    report = load_test(args.sessions, args.concurrency, args.catalog, args.catalog_size, args.seed, args.think_ms / 1000)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""Benchmarks for the catalog pipeline at synthetic scale.
+
+    python benchmarks/run.py                                # 4k and 40k projects
+    python benchmarks/run.py --sizes 4000 40000 400000 --json before.json
+    python benchmarks/run.py --compare before.json after.json
+
+Each size gets a deterministic catalog from ``synthetic_catalog.py``,
+cached under ``benchmarks/.data/``. Every stage reports p50/p99 latency
+over its samples and the peak traced Python/NumPy allocation of one run.
+Everything runs offline; results carry the commit and interpreter they
+were measured with so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from fein import catalog_build  # noqa: E402
+from fein.cards import render_card  # noqa: E402
+from fein.catalog import CatalogLoader  # noqa: E402
+from fein.discover import discover_page  # noqa: E402
+from fein.export import iter_export  # noqa: E402
+from fein.facets import FacetColumns, catalog_facets  # noqa: E402
+from fein.fuzzy import spell_index  # noqa: E402
+from fein.query import ProjectQuery, filter_ids  # noqa: E402
+from fein.search_index import SearchIndex, search_index, search_text_match  # noqa: E402
+from fein.segments import apply_patch, parse_patch  # noqa: E402
+from fein.semantic import SemanticIndex  # noqa: E402
+
+from synthetic_catalog import DEFAULT_SEED, write_catalog  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+DEFAULT_SIZES = (4_000, 40_000)
+# The per-project reference scan takes seconds per query beyond this.
+REFERENCE_LIMIT = 40_000
+
+SEARCH_QUERIES = ["a", "ml", "learn", "vision", "fraud detection", "real-time natural", "pytorch", "zzzz"]
+TYPOS = ["pytorh", "detecton", "tensorflw", "blokchain", "qauntum", "recomender", "xyzzyq"]
+FILTER_QUERIES = [
+    ProjectQuery.from_filters("", (1, 4), [], "", ""),
+    ProjectQuery.from_filters("", (2, 3), [], "", ""),
+    ProjectQuery.from_filters("data", (1, 4), [], "", ""),
+    ProjectQuery.from_filters("", (1, 4), ["PyTorch (Open Source)", "TensorFlow (Open Source)"], "", ""),
+    ProjectQuery.from_filters("", (1, 4), [], "medical", ""),
+    ProjectQuery.from_filters("", (1, 4), [], "", "real-time"),
+    ProjectQuery.from_filters("detect", (3, 4), ["Python (Open Source)"], "logs", "security"),
+]
+PAGE_SIZE = 10
+
+
+def sample_patch(catalog, rng):
+    """One added, one updated and one removed project, copied from random catalog entries."""
+    def entry(pid):
+        project = catalog.project(pid)
+        return {"domain": project.domain, "title": project.title + " v2", "description": project.description,
+                "tech": list(project.tech), "difficulty": project.difficulty,
+                "datasets": list(project.datasets), "keywords": list(project.keywords)}
+
+    updated, removed = rng.sample(range(catalog.project_count), 2)
+    return parse_patch({"add": [entry(rng.randrange(catalog.project_count))],
+                        "update": [{"id": updated, **entry(updated)}], "remove": [removed]})
+
+
+def catalog_path(size, seed):
+    path = os.path.join(DATA_DIR, f"projects_{size}_{seed}.json")
+    if not os.path.exists(path):
+        write_catalog(path, size, seed)
+    return path
+
+
+def _samples(run, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        run()
+        samples.append((time.perf_counter_ns() - start) / 1e6)
+    return samples
+
+
+def _peak_kib(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(name, runs, repeat):
+    """Time every callable in ``runs`` ``repeat`` times; memory is traced on the first."""
+    samples = [sample for run in runs for sample in _samples(run, repeat)]
+    return {
+        "stage": name,
+        "samples": len(samples),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(np.mean(samples)),
+        "peak_kib": _peak_kib(runs[0]),
+    }
+
+
+def bench_size(size, seed, repeat, load_repeat):
+    path = catalog_path(size, seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Work on a copy so the compiled build lands in a throwaway directory.
+        source = os.path.join(tmp, "projects_data.json")
+        os.symlink(path, source)
+        catalog = CatalogLoader(source, compiled=True).get()
+        rng = random.Random(seed)
+        pages = [rng.sample(range(catalog.project_count), PAGE_SIZE) for _ in range(repeat)]
+        # Built once up front, so the lookup stages time lookups, not builds.
+        index, spell, semantic = search_index(catalog), spell_index(catalog), SemanticIndex.from_catalog(catalog)
+        results = [
+            measure("load_json", [lambda: CatalogLoader(source, compiled=False).get()], load_repeat),
+            measure("load_compiled", [lambda: catalog_build.read_compiled(source)], load_repeat),
+            measure("search_index_build", [lambda: SearchIndex.from_catalog(catalog)], load_repeat),
+            measure("search", [lambda q=q: index.substring(q) for q in SEARCH_QUERIES], repeat),
+            measure("semantic_build", [lambda: SemanticIndex.from_catalog(catalog)], load_repeat),
+            measure("related", [lambda page=page: semantic.related(page[0], 5) for page in pages], 1),
+            measure("spell_correct", [lambda w=w: spell.suggest(w) for w in TYPOS], repeat),
+            measure("filter", [lambda q=q: filter_ids(catalog, q) for q in FILTER_QUERIES], repeat),
+            # A fresh session's first page and a deep one, plain and balanced across domains.
+            measure("discover_page", [lambda cursor=cursor, mix=mix: discover_page(catalog, seed, cursor, PAGE_SIZE, mix)
+                                      for seed in range(3) for cursor in (0, size // 2) for mix in (None, "domain")], repeat),
+            # Facet columns and spelling dictionary are built by now, so they get patched too.
+            measure("patch", [lambda patch=sample_patch(catalog, rng): apply_patch(catalog, patch) for _ in range(repeat)], 1),
+            # The whole catalog; peak memory should stay at about one chunk whatever the size.
+            measure("export_csv", [lambda: sum(map(len, iter_export(catalog, catalog.live_ids(), "csv")))], load_repeat),
+            measure("facet_columns_build", [lambda: FacetColumns.from_catalog(catalog)], load_repeat),
+            # What the sidebar reads on every rerun: the facets cached for this catalog version.
+            measure("tech_options", [lambda: catalog_facets(catalog).tech_options], repeat),
+            measure("card_html", [lambda page=page: [render_card(catalog.project(pid)) for pid in page] for page in pages], 1),
+        ]
+        if size <= REFERENCE_LIMIT:
+            results.append(measure(
+                "search_reference",
+                [lambda q=q: [p.id for p in catalog.projects() if search_text_match(p, q)] for q in SEARCH_QUERIES[:3]],
+                1,
+            ))
+    for result in results:
+        result["size"] = size
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def print_table(results):
+    print(f"{'size':>8} {'stage':<20} {'n':>5} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10}")
+    for r in results:
+        print(f"{r['size']:>8} {r['stage']:<20} {r['samples']:>5} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['peak_kib']:>10.0f}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = {(r["size"], r["stage"]): r for r in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+    print(f"{'size':>8} {'stage':<20} {'p50 before':>11} {'p50 after':>11} {'change':>8}")
+    for r in after:
+        old = before.get((r["size"], r["stage"]))
+        if old:
+            change = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+            print(f"{r['size']:>8} {r['stage']:<20} {old['p50_ms']:>11.3f} {r['p50_ms']:>11.3f} {change:>+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=20, help="samples per query/page for the fast stages")
+    parser.add_argument("--load-repeat", type=int, default=3, help="samples for the load and index-build stages")
+    parser.add_argument("--json", help="also write the results here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two --json result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for size in args.sizes:
+        results.extend(bench_size(size, args.seed, args.repeat, args.load_repeat))
+    print_table(results)
+    max_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"max RSS {max_rss_kib / 1024:.0f} MiB")
+
+    if args.json:
+        report = {
+            "environment": environment(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "load_repeat": args.load_repeat,
+            "max_rss_kib": max_rss_kib,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
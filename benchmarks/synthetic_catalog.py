@@ -0,0 +1,120 @@
+"""Deterministic synthetic catalogs in the ``projects_data.json`` schema.
+
+The vocabularies below are fixed and generation is seeded, so a given
+``(size, seed)`` produces byte-identical output on every machine and
+commit, which is what makes benchmark numbers comparable.
+
+    python benchmarks/synthetic_catalog.py 40000 -o /tmp/projects_40k.json
+"""
+import argparse
+import json
+import os
+import random
+
+DEFAULT_SEED = 1234
+
+DOMAINS = [
+    "Artificial Intelligence (AI) & Machine Learning (ML)", "Data Science & Big Data", "Web Development",
+    "Mobile App Development", "Cloud Computing", "Cybersecurity", "Blockchain & Distributed Ledger Technologies",
+    "Internet of Things (IoT)", "Game Development", "Robotics & Automation", "Software Engineering & Systems",
+    "Database Systems", "Networking", "Bioinformatics / Computational Biology", "Quantum Computing",
+    "Augmented Reality (AR) / Virtual Reality (VR)",
+]
+DIFFICULTIES = ["Beginner", "Intermediate", "Advanced", "Expert"]
+ADJECTIVES = [
+    "Real-time", "Efficient", "Scalable", "Robust", "Intelligent", "Secure", "Automated", "Interactive",
+    "Distributed", "Lightweight", "Adaptive", "Resilient", "Immersive", "Precise", "Fault-tolerant",
+    "Comprehensive", "Responsive", "Theoretical", "Fast-paced", "Insightful",
+]
+SUBJECTS = [
+    "natural language", "fraud detection", "recommender system", "image classifier", "chatbot",
+    "network monitor", "data pipeline", "query optimizer", "malware analysis tool", "fitness tracker",
+    "AR navigation app", "humanoid robot", "quantum algorithm", "genomic pipeline", "smart home hub",
+    "supply chain ledger", "multiplayer game", "customer insights", "speech recognizer", "traffic simulator",
+    "edge inference service", "anomaly detector", "code review assistant", "weather forecaster",
+]
+VERBS = ["Develop", "Design", "Build", "Implement", "Create", "Prototype", "Deploy", "Engineer"]
+GOALS = [
+    "predict user behavior", "detect anomalies in transactions", "classify medical images",
+    "summarize long documents", "optimize delivery routes", "monitor network traffic", "secure IoT devices",
+    "recommend products", "forecast energy demand", "analyze gene expression", "render 3D scenes",
+    "automate warehouse robots", "translate speech in real time", "score credit risk",
+]
+TARGETS = ["high recall", "low latency", "high accuracy", "strong privacy", "low cost", "easy deployment"]
+TECH = [
+    f"{name} ({kind})" for name, kind in [
+        ("Python", "Open Source"), ("PyTorch", "Open Source"), ("TensorFlow", "Open Source"),
+        ("Scikit-learn", "Open Source"), ("Pandas", "Open Source"), ("Numpy", "Open Source"),
+        ("Keras", "Open Source"), ("OpenCV", "Open Source"), ("SpaCy", "Open Source"), ("NLTK", "Open Source"),
+        ("Hugging Face", "Open Source"), ("XGBoost", "Open Source"), ("Apache Spark", "Open Source"),
+        ("Apache Kafka", "Open Source"), ("Apache Airflow", "Open Source"), ("PostgreSQL", "Open Source"),
+        ("MongoDB", "Open Source"), ("Redis", "Open Source"), ("React", "Open Source"), ("Node.js", "Open Source"),
+        ("Django", "Open Source"), ("Flask", "Open Source"), ("Flutter", "Open Source"), ("Kotlin", "Open Source"),
+        ("Swift", "Open Source"), ("Unity", "Free Tier"), ("Unreal Engine", "Free Tier"), ("Docker", "Open Source"),
+        ("Kubernetes", "Open Source"), ("Terraform", "Open Source"), ("Solidity", "Open Source"),
+        ("Qiskit", "Open Source"), ("ROS", "Open Source"), ("Arduino", "Open Source"), ("Wireshark", "Open Source"),
+        ("AWS SageMaker", "Paid Service"), ("Google BigQuery", "Paid Service"), ("Azure Machine Learning", "Paid Service"),
+        ("Snowflake", "Paid Service"), ("Tableau", "Paid Service"), ("Power BI", "Paid Service"),
+        ("Firebase", "Paid Service"), ("Databricks MLflow", "Paid Service"), ("Google Cloud AI Platform", "Paid Service"),
+    ]
+]
+DATASETS = [
+    "ImageNet", "COCO", "IMDB reviews", "Kaggle competition data", "customer demographics", "financial time series",
+    "transaction logs", "custom medical data", "social media feeds", "sensor readings", "network packet captures",
+    "public genome data", "OpenStreetMap", "Common Crawl", "MNIST", "synthetic user data", "game telemetry",
+]
+KEYWORDS = [
+    "machine learning", "deep learning", "NLP", "computer vision", "real-time", "privacy", "edge", "cloud",
+    "analytics", "automation", "security", "IoT", "blockchain", "AR", "VR", "robotics", "quantum", "generative",
+    "forecasting", "classification", "recommendation", "streaming", "visualization", "optimization",
+]
+
+
+def generate_project(rng):
+    subject = rng.choice(SUBJECTS)
+    tech = rng.sample(TECH, rng.randint(2, 5))
+    return {
+        "title": f"{rng.choice(ADJECTIVES)} {subject} Project",
+        "description": (
+            f"{rng.choice(VERBS)} a {rng.choice(ADJECTIVES).lower()} {subject} to {rng.choice(GOALS)}, "
+            f"aiming for {rng.choice(TARGETS)} using {tech[0].split(' (')[0]}."
+        ),
+        "tech": tech,
+        "difficulty": rng.choice(DIFFICULTIES),
+        "datasets": rng.sample(DATASETS, rng.randint(1, 3)),
+        "keywords": rng.sample(KEYWORDS, rng.randint(2, 5)),
+    }
+
+
+def generate_catalog(size, seed=DEFAULT_SEED):
+    """``size`` projects spread round-robin over :data:`DOMAINS`."""
+    rng = random.Random(seed)
+    catalog = [{"domain": domain, "projects": []} for domain in DOMAINS]
+    for i in range(size):
+        catalog[i % len(DOMAINS)]["projects"].append(generate_project(rng))
+    return catalog
+
+
+def write_catalog(path, size, seed=DEFAULT_SEED):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(generate_catalog(size, seed), f, indent=1)
+    os.replace(tmp, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("size", type=int)
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+    write_catalog(args.output, args.size, args.seed)
+    print(f"Wrote {args.size} projects to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Catalog, search and prompt helpers behind the FE!N Streamlit app."""
@@ -0,0 +1,136 @@
+"""Command line for the FE!N catalog: ``python -m fein {search,prompt,related,export,export-prompts,patch,compact,serve}``."""
+import argparse
+import json
+import logging
+import os
+import sys
+
+from fein import api
+from fein.catalog import DEFAULT_CATALOG_PATH, load_catalog, shared_loader
+from fein.export import FORMATS as EXPORT_FORMATS
+from fein.prompts import export_prompts
+from fein.query import PAGE_SIZE, ProjectQuery, resolve_query
+from fein.segments import compact, remove_patches
+
+
+def _add_filters(parser):
+    parser.add_argument("topic", nargs="?", default="", help="search box text")
+    parser.add_argument("--difficulty", default="1-4", help="level range, 1 (Beginner) to 4 (Expert), e.g. 2-3")
+    parser.add_argument("--tech", action="append", default=[], help="tech stack contains (repeatable, any of)")
+    parser.add_argument("--dataset", default="", help="dataset keywords")
+    parser.add_argument("--keywords", default="", help="project keywords")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m fein", description=__doc__)
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH, help="catalog file or directory of shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="print one page of matching projects as JSON")
+    _add_filters(search)
+    search.add_argument("--sort", choices=api.SORT_ORDERS, default="catalog")
+    search.add_argument("--cursor", type=int, default=0)
+    search.add_argument("--limit", type=int, default=PAGE_SIZE)
+    search.add_argument("--facets", action="store_true", help="include result counts")
+
+    prompt = commands.add_parser("prompt", help="print the AI prompt for a project")
+    prompt.add_argument("id", type=int)
+    prompt.add_argument("--model", default="gemini", help="gemini, chatgpt or llama3")
+    prompt.add_argument("--json", action="store_true", help="print the full JSON record")
+    prompt.add_argument("--id-space", help="fail if the catalog was renumbered since this id space")
+
+    related = commands.add_parser("related", help="print projects similar to a project or to free text as JSON")
+    related.add_argument("id", nargs="?", type=int, help="project id")
+    related.add_argument("--text", default="", help="describe the project instead of giving an id")
+    related.add_argument("--limit", type=int, default=api.RELATED_COUNT)
+    related.add_argument("--id-space", help="fail if the catalog was renumbered since this id space")
+
+    export_rows = commands.add_parser("export", help="write every matching project as CSV, JSON lines or Parquet")
+    export_rows.add_argument("output", help="output file, or - for stdout")
+    _add_filters(export_rows)
+    export_rows.add_argument("--format", choices=list(EXPORT_FORMATS), help="default: from the output file extension, else csv")
+    export_rows.add_argument("--sort", choices=api.SORT_ORDERS, default="catalog")
+
+    export = commands.add_parser("export-prompts", help="write prompts for every matching project as JSON lines")
+    export.add_argument("output", help="output file, or - for stdout")
+    _add_filters(export)
+    export.add_argument("--model", action="append", default=[], help="repeatable; default all models")
+
+    patch = commands.add_parser("patch", help="add, update or remove projects without rebuilding the catalog")
+    patch.add_argument("file", help="patch JSON (see fein/segments.py), or - for stdin")
+
+    compaction = commands.add_parser("compact", help="fold saved patches into the catalog file")
+    compaction.add_argument("--output", help="write here instead of replacing the catalog file")
+
+    serve = commands.add_parser("serve", help="serve /search and /prompt over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+
+    args = parser.parse_args(argv)
+    # Keep stdout/stderr clean for piping unless running the server.
+    logging.basicConfig(level=logging.INFO if args.command == "serve" else logging.WARNING,
+                        format="%(asctime)s %(name)s %(message)s")
+
+    try:
+        if args.command == "serve":
+            api.serve(args.host, args.port, args.catalog)
+            return 0
+        if args.command == "patch":
+            if args.file == "-":
+                document = sys.stdin.read()
+            else:
+                with open(args.file, encoding="utf-8") as f:
+                    document = f.read()
+            print(json.dumps(api.patch(shared_loader(args.catalog), document), indent=2))
+            return 0
+        if args.command == "compact":
+            if not args.output and os.path.isdir(args.catalog):
+                parser.exit(2, "error: a directory of shards needs --output\n")
+            loader = shared_loader(args.catalog)
+            count = compact(loader.get(), args.output or args.catalog)
+            if not args.output:
+                # The catalog file now includes them; ids of later projects moved up over removed ones.
+                remove_patches(args.catalog, loader.applied_patches)
+            print(f"Wrote {count} projects to {args.output or args.catalog}", file=sys.stderr)
+            return 0
+        catalog = load_catalog(args.catalog)
+        if args.command == "search":
+            result = api.search(
+                catalog, args.topic, args.difficulty, args.tech, args.dataset, args.keywords,
+                sort=args.sort, cursor=args.cursor, limit=args.limit, facets=args.facets,
+            )
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        elif args.command == "prompt":
+            result = api.prompt(catalog, args.id, args.model, args.id_space)
+            print(json.dumps(result, ensure_ascii=False, indent=2) if args.json else result["prompt"])
+        elif args.command == "related":
+            result = api.related(catalog, args.id, args.text, args.limit, args.id_space)
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        elif args.command == "export":
+            extension = os.path.splitext(args.output)[1].lstrip(".")
+            export_format = args.format or (extension if extension in EXPORT_FORMATS else "csv")
+            _content_type, chunks = api.export(
+                catalog, export_format, args.topic, args.difficulty, args.tech, args.dataset, args.keywords, args.sort,
+            )
+            out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+            try:
+                for chunk in chunks:
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+        elif args.command == "export-prompts":
+            query = ProjectQuery.from_filters(
+                args.topic, api.parse_difficulty(args.difficulty), args.tech, args.dataset, args.keywords,
+            )
+            models = [api.resolve_model(model) for model in args.model]
+            query, ids = resolve_query(catalog, query)
+            count = export_prompts(catalog, ids, sys.stdout if args.output == "-" else args.output, models)
+            print(f"Wrote {count} prompts for {len(ids)} projects", file=sys.stderr)
+    except (LookupError, ValueError) as e:
+        parser.exit(2, f"error: {e}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
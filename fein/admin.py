@@ -0,0 +1,13 @@
+"""Admin access for the operator panels in the app.
+
+There are no user accounts: an operator sets ``FEIN_ADMIN_TOKEN`` in the
+server environment and opens the app with ``?admin=<token>``. Without the
+variable, admin features are off for everyone.
+"""
+import hmac
+import os
+
+
+def is_admin(token):
+    expected = os.environ.get("FEIN_ADMIN_TOKEN", "")
+    return bool(expected and token) and hmac.compare_digest(str(token), expected)
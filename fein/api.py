@@ -0,0 +1,349 @@
+"""Programmatic access to search and prompts, without Streamlit.
+
+:func:`search` and :func:`prompt` give the same answers as the app's
+sidebar and "Generate AI Prompt" page, as JSON-ready dicts. :func:`serve`
+exposes them over HTTP::
+
+    GET /search?topic=vision&difficulty=2-3&tech=PyTorch&sort=relevance&cursor=0&limit=10
+    GET /prompt?id=42&model=gemini&id_space=eb05e0d15a54
+    GET /related?id=42&limit=5             projects similar to project 42
+    GET /related?text=detect+credit+card+fraud
+    GET /export?format=csv&topic=vision    every match, streamed as csv, jsonl or parquet
+    GET /health
+    GET /metrics          stage timings in the Prometheus text format
+    POST /patch           add/update/remove projects (see fein.segments);
+                          needs "Authorization: Bearer $FEIN_ADMIN_TOKEN"
+
+Project ids are positions in the catalog and stay valid only within one
+id space (see :attr:`fein.catalog.Catalog.id_space`), which every response
+reports; ``/export`` sends it as ``X-Fein-Id-Space``. Pass it back with an
+id and a catalog renumbered since answers ``409`` instead of some other
+project.
+
+``python -m fein`` wraps all of this in a command line.
+"""
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from fein.admin import is_admin
+from fein.catalog import DEFAULT_CATALOG_PATH, StaleIdError, shared_loader
+from fein.export import FORMATS as EXPORT_FORMATS, iter_export
+from fein.facets import live_facet_counts
+from fein.profiling import begin_run, end_run, metrics_text, mode_from, span
+from fein.prompts import MODELS, generate_prompt, prompt_templates
+from fein.query import PAGE_SIZE, ProjectQuery, query_page, resolve_query
+from fein.ranking import warm_ranking_model
+from fein.segments import parse_patch
+from fein.semantic import RELATED_COUNT, semantic_index, warm_semantic_index
+
+logger = logging.getLogger(__name__)
+
+SORT_ORDERS = ("catalog", "relevance")
+MAX_PAGE_SIZE = 100
+FACET_TECH_COUNT = 10
+DIFFICULTY_RANGE = (1, 4)
+ROUTES = ("/search", "/prompt", "/related", "/export", "/health", "/patch")
+# Patches are meant for a handful of projects; bigger changes go through the catalog file.
+MAX_PATCH_BYTES = 8 * 1024 * 1024
+
+
+def parse_difficulty(value):
+    """``(1, 4)``, ``[1, 4]``, ``"1-4"`` or ``"3"`` -> a validated ``(low, high)``."""
+    if isinstance(value, str):
+        value = value.split("-") if "-" in value else (value, value)
+    try:
+        low, high = (int(level) for level in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"difficulty must be a range like 1-4, not {value!r}") from None
+    if not DIFFICULTY_RANGE[0] <= low <= high <= DIFFICULTY_RANGE[1]:
+        raise ValueError(f"difficulty must lie within {DIFFICULTY_RANGE[0]}-{DIFFICULTY_RANGE[1]}")
+    return low, high
+
+
+def _project_dict(project):
+    record = project._asdict()
+    for field in ("tech", "datasets", "keywords"):
+        record[field] = list(record[field])
+    return record
+
+
+def _check_id_space(catalog, id_space):
+    if id_space and id_space != catalog.id_space:
+        raise StaleIdError(f"Ids from catalog {id_space} no longer apply, the catalog is now {catalog.id_space}; search again")
+
+
+def resolve_model(name):
+    """A model display name, or its template name (``gemini``, ``chatgpt``, ``llama3``)."""
+    if name in MODELS:
+        return name
+    for model, (filename, _link) in MODELS.items():
+        if filename.rsplit(".", 1)[0] == name.lower():
+            return model
+    raise ValueError(f"Unknown model {name!r}")
+
+
+def search(catalog, topic='', difficulty=DIFFICULTY_RANGE, tech=(), dataset='', keywords='',
+           sort='catalog', cursor=0, limit=PAGE_SIZE, facets=False):
+    """One page of projects matching the sidebar filters.
+
+    Like the app, a topic with no exact matches falls back to its spelling
+    correction, reported as ``corrected_topic``. ``next_cursor`` is ``None``
+    on the last page. ``facets=True`` adds the
+    result counts the app shows above the cards.
+    """
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_ORDERS)}")
+    cursor, limit = int(cursor or 0), int(limit)
+    if cursor < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"cursor must be >= 0 and limit within 1-{MAX_PAGE_SIZE}")
+    requested = ProjectQuery.from_filters(topic, parse_difficulty(difficulty), tech, dataset, keywords)
+    query, matching_ids = resolve_query(catalog, requested)
+    ids, next_cursor = query_page(catalog, query, cursor, limit, ranked=sort == 'relevance')
+    result = {
+        "catalog_version": catalog.version,
+        "id_space": catalog.id_space,
+        "corrected_topic": query.topic if query != requested else None,
+        "total": len(matching_ids),
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "projects": [_project_dict(catalog.project(pid)) for pid in ids],
+    }
+    if facets:
+        result["facets"] = live_facet_counts(catalog, matching_ids, tech_limit=FACET_TECH_COUNT)
+    return result
+
+
+def export(catalog, format='csv', topic='', difficulty=DIFFICULTY_RANGE, tech=(), dataset='', keywords='', sort='catalog'):
+    """Every project matching the sidebar filters as ``(mime type, byte chunks)``.
+
+    The rows and their order are those the app shows for the same filters,
+    spelling correction included; see :mod:`fein.export` for the formats.
+    """
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_ORDERS)}")
+    requested = ProjectQuery.from_filters(topic, parse_difficulty(difficulty), tech, dataset, keywords)
+    query, ids = resolve_query(catalog, requested)
+    if sort == 'relevance':
+        ids, _ = query_page(catalog, query, 0, len(ids), ranked=True)
+    return EXPORT_FORMATS.get(format), iter_export(catalog, ids, format)
+
+
+def prompt(catalog, pid, model, id_space=None):
+    """The AI prompt the app generates for project ``pid`` and ``model``.
+
+    With ``id_space``, an id from a catalog renumbered since raises
+    :class:`~fein.catalog.StaleIdError`.
+    """
+    _check_id_space(catalog, id_space)
+    pid = int(pid)
+    if not catalog.has_project(pid):
+        raise LookupError(f"No project with id {pid}")
+    model = resolve_model(model)
+    return {
+        "catalog_version": catalog.version,
+        "id_space": catalog.id_space,
+        "id": pid,
+        "title": catalog.project(pid).title,
+        "model": model,
+        "link": prompt_templates()[model].link,
+        "prompt": generate_prompt(catalog, pid, model),
+    }
+
+
+def related(catalog, pid=None, text='', limit=RELATED_COUNT, id_space=None):
+    """Projects closest in meaning to project ``pid``, or to free ``text``.
+
+    Each result carries its cosine ``similarity``, best first. ``id_space``
+    is checked as in :func:`prompt`.
+    """
+    limit = int(limit)
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be within 1-{MAX_PAGE_SIZE}")
+    if (pid is None or pid == '') == (not text):
+        raise ValueError("Give exactly one of id or text")
+    index = semantic_index(catalog)
+    if text:
+        matches = index.search(text, limit)
+    else:
+        _check_id_space(catalog, id_space)
+        pid = int(pid)
+        if not catalog.has_project(pid):
+            raise LookupError(f"No project with id {pid}")
+        matches = index.related(pid, limit)
+    return {
+        "catalog_version": catalog.version,
+        "id_space": catalog.id_space,
+        "id": pid if not text else None,
+        "text": text or None,
+        "projects": [{**_project_dict(catalog.project(other)), "similarity": round(score, 4)} for other, score in matches],
+    }
+
+
+def patch(loader, document):
+    """Apply and save a catalog patch; see :mod:`fein.segments` for the format.
+
+    Returns the new catalog version and the ids given to added projects.
+    """
+    catalog, changes = loader.apply_patch(parse_patch(document))
+    return {
+        "catalog_version": catalog.version,
+        "id_space": catalog.id_space,
+        "added": changes.added.tolist(),
+        "removed": changes.removed.tolist(),
+        "projects": catalog.live_count,
+    }
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    """Routes ``GET /search``, ``/prompt``, ``/related``, ``/export``, ``/health`` and ``POST /patch`` to the functions above."""
+
+    server_version = "fein"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            return self._send_text(200, metrics_text())
+        # Timed like an app rerun when FEIN_PROFILE is set; free otherwise.
+        begin_run("api", mode_from())
+        try:
+            # Unknown paths share one label so scanners can't grow the metrics.
+            with span(url.path if url.path in ROUTES else "other"):
+                self._route(url)
+        finally:
+            end_run()
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        begin_run("api", mode_from())
+        try:
+            with span(url.path if url.path in ROUTES else "other"):
+                self._route_post(url)
+        finally:
+            end_run()
+
+    def _route_post(self, url):
+        if url.path != "/patch":
+            return self._send(404, {"error": f"Unknown path {url.path}"})
+        scheme, _, token = self.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not is_admin(token.strip()):
+            return self._send(403, {"error": "Patching the catalog needs the admin token"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if not 0 < length <= MAX_PATCH_BYTES:
+                raise ValueError(f"Patch body must be 1 byte to {MAX_PATCH_BYTES} bytes")
+            body = patch(self.server.loader, self.rfile.read(length))
+        except LookupError as e:
+            return self._send(404, {"error": str(e)})
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        except Exception:
+            logger.exception("Request %s failed", self.path)
+            return self._send(500, {"error": "Internal error"})
+        self._send(200, body)
+
+    def _route(self, url):
+        params = parse_qs(url.query)
+
+        def one(name, default=''):
+            values = params.get(name)
+            return values[-1] if values else default
+
+        try:
+            catalog = self.server.loader.get()
+            if url.path == "/search":
+                body = search(
+                    catalog,
+                    topic=one("topic"),
+                    difficulty=one("difficulty", "1-4"),
+                    tech=params.get("tech", ()),
+                    dataset=one("dataset"),
+                    keywords=one("keywords"),
+                    sort=one("sort", "catalog"),
+                    cursor=one("cursor", 0),
+                    limit=one("limit", PAGE_SIZE),
+                    facets=one("facets") in ("1", "true"),
+                )
+            elif url.path == "/prompt":
+                body = prompt(catalog, one("id"), one("model", "gemini"), one("id_space"))
+            elif url.path == "/related":
+                body = related(catalog, one("id", None), one("text"), one("limit", RELATED_COUNT), one("id_space"))
+            elif url.path == "/export":
+                export_format = one("format", "csv")
+                content_type, chunks = export(
+                    catalog, export_format, one("topic"), one("difficulty", "1-4"), params.get("tech", ()),
+                    one("dataset"), one("keywords"), one("sort", "catalog"),
+                )
+                return self._send_stream(content_type, chunks, f"fein_projects.{export_format}", catalog.id_space)
+            elif url.path == "/health":
+                body = {"status": "ok", **self.server.loader.stats()}
+            else:
+                return self._send(404, {"error": f"Unknown path {url.path}"})
+        except StaleIdError as e:
+            return self._send(409, {"error": str(e)})
+        except LookupError as e:
+            return self._send(404, {"error": str(e)})
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        except Exception:
+            logger.exception("Request %s failed", self.path)
+            return self._send(500, {"error": "Internal error"})
+        self._send(200, body)
+
+    def _send(self, status, body):
+        self._send_bytes(status, json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+    def _send_stream(self, content_type, chunks, filename, id_space):
+        # No Content-Length: the body ends when the (HTTP/1.0) connection closes.
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.send_header("X-Fein-Id-Space", id_space)
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                self.wfile.write(chunk)
+        except OSError as e:
+            logger.debug("Export to %s stopped: %s", self.address_string(), e)
+        except Exception:
+            # Too late for an error status; the client sees a truncated file.
+            logger.exception("Export %s failed", self.path)
+
+    def _send_text(self, status, text):
+        self._send_bytes(status, text.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+
+    def _send_bytes(self, status, payload, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(host="127.0.0.1", port=8000, path=DEFAULT_CATALOG_PATH):
+    """A threaded HTTP server over the shared catalog loader for ``path``."""
+    server = ThreadingHTTPServer((host, port), APIRequestHandler)
+    server.daemon_threads = True
+    server.loader = shared_loader(path)
+    # Load before accepting requests rather than on the first one; the
+    # ranking model and semantic index follow in the background (relevance
+    # searches and /related wait for them).
+    catalog = server.loader.get()
+    warm_ranking_model(catalog)
+    warm_semantic_index(catalog)
+    return server
+
+
+def serve(host="127.0.0.1", port=8000, path=DEFAULT_CATALOG_PATH):
+    server = make_server(host, port, path)
+    logger.info("Serving the FE!N API on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,44 @@
+"""Pre-rendered HTML for the project cards.
+
+A card depends only on its project, so its markup is built and escaped once
+per catalog version and then served from a bounded cache shared by every
+session; painting a page of cards is a handful of dictionary lookups.
+"""
+import html
+
+from fein.cache import LRUCache
+
+# Comfortably more than the cards all active sessions have on screen.
+CARD_CACHE_SIZE = 4096
+card_cache = LRUCache(maxsize=CARD_CACHE_SIZE)
+
+
+def render_card(project):
+    """The markup of one card, with every project value HTML-escaped."""
+    escape = html.escape
+    details = f'<span>🌐 {escape(project.domain)}</span> <span>🧠 {escape(project.difficulty)}</span>'
+    if project.tech:
+        details += f' <span>🛠️ {escape(", ".join(project.tech))}</span>'
+    if project.datasets:
+        details += f' <span>📊 {escape(", ".join(project.datasets))}</span>'
+    return (
+        f'<div class="project-card">'
+        f'<p class="project-title">{escape(project.title)}</p>'
+        f'<p class="project-description">{escape(project.description)}</p>'
+        f'<div class="project-details">{details}</div>'
+        f'</div>'
+    )
+
+
+def card_html(source, pid, cache=card_cache):
+    """Cached card markup for project ``pid`` of a catalog.
+
+    Entries are keyed by catalog version, so a reload never serves a stale
+    card. Sources without a version (the loading preview) are rendered
+    directly.
+    """
+    version = getattr(source, "version", None)
+    if version is None:
+        return render_card(source.project(pid))
+    pid = int(pid)
+    return cache.get_or_compute((version, pid), lambda: render_card(source.project(pid)))
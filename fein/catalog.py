@@ -0,0 +1,428 @@
+"""Process-wide, change-aware loader for ``projects_data.json``.
+
+Streamlit re-executes the whole script on every interaction, so the catalog
+is parsed once per process and handed out to every session. The file is only
+re-parsed when its mtime/size changes *and* its content hash differs from the
+catalog currently being served. A new catalog is fully built before it is
+published, so readers always see either the old or the new one.
+
+With ``compiled=True`` (the default; ``FEIN_COMPILED_CATALOG=0`` turns it
+off) the loader maps the compiled catalog from :mod:`fein.catalog_build`
+when it matches the JSON file, and recompiles it whenever the JSON is newer.
+
+The catalog may also be several files or a directory of shards; see
+:mod:`fein.ingest`. Parsing streams project by project.
+
+Small edits don't need a reload at all: patches saved next to the catalog
+(see :mod:`fein.segments`) are applied to the catalog in service as they
+appear, at a cost proportional to the patch.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from fein import catalog_build, ingest, segments
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = "projects_data.json"
+
+
+class StaleIdError(LookupError):
+    """A project id from an id space the current catalog no longer uses."""
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """An immutable snapshot of the project catalog."""
+    path: str
+    version: str
+    mtime: float
+    loaded_at: float
+    load_seconds: float
+    # Projects in file order; a project's id is its position in the store,
+    # which only holds within one id space (see ``id_space``).
+    store: object = field(repr=False)
+    _derived: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+    # One lock per derived name, so a slow build only holds up readers of the same structure.
+    _derived_locks: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+    _derived_lock: object = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    @property
+    def project_count(self):
+        return len(self.store)
+
+    @property
+    def domain_names(self):
+        return self.store.domain_names
+
+    def project(self, pid):
+        """The :class:`~fein.store.Project` with id ``pid``."""
+        return self.store.project(pid)
+
+    def projects(self):
+        """Every project, in id order."""
+        return iter(self.store)
+
+    def live_ids(self):
+        """Ids of the projects currently in the catalog; removed ones leave gaps."""
+        if isinstance(self.store, segments.SegmentedStore):
+            return self.store.live_ids()
+        return np.arange(len(self.store), dtype=np.int32)
+
+    @property
+    def live_count(self):
+        if isinstance(self.store, segments.SegmentedStore):
+            return int(np.count_nonzero(self.store.owner >= 0))
+        return len(self.store)
+
+    def has_project(self, pid):
+        if isinstance(self.store, segments.SegmentedStore):
+            return self.store.is_live(pid)
+        return 0 <= pid < len(self.store)
+
+    @property
+    def id_space(self):
+        """The catalog version that numbered the ids.
+
+        Patches keep every id, so all patched versions of a catalog share its
+        id space. A reload of an edited file or a compaction renumbers the
+        projects and starts a new one, so anything holding ids across requests
+        should hold :meth:`ref` instead.
+        """
+        if isinstance(self.store, segments.SegmentedStore):
+            return self.store.base_version
+        return self.version
+
+    def ref(self, pid):
+        """``(id space, id)`` for project ``pid``, to keep beyond this request."""
+        return self.id_space, int(pid)
+
+    def resolve(self, ref):
+        """The id a :meth:`ref` stands for in this catalog, or ``None``.
+
+        ``None`` when the project was removed or the ref comes from another
+        id space. An id space of ``None`` (ids from the loading preview,
+        taken before any catalog was numbered) counts as this one.
+        """
+        id_space, pid = ref
+        if id_space is not None and id_space != self.id_space:
+            return None
+        return pid if self.has_project(pid) else None
+
+    def derived(self, name, build):
+        """Return ``build(self)``, computed once per catalog version.
+
+        Indexes and other structures derived from the catalog live here so
+        they are thrown away together with the catalog they were built from.
+        Builders may themselves call :meth:`derived` for other structures.
+        Concurrent callers wait only for a build of the same ``name``.
+        """
+        value = self._derived.get(name)
+        if value is None:
+            with self._name_lock(name):
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = build(self)
+        return value
+
+    def _name_lock(self, name):
+        lock = self._derived_locks.get(name)
+        if lock is None:
+            with self._derived_lock:
+                lock = self._derived_locks.setdefault(name, threading.RLock())
+        return lock
+
+    def built(self, name):
+        """The derived structure ``name`` if it has been built, else ``None``; never builds."""
+        return self._derived.get(name)
+
+    def provide(self, name, value):
+        """Register an already-built derived structure, e.g. one loaded from disk."""
+        with self._name_lock(name):
+            self._derived.setdefault(name, value)
+
+
+class CatalogLoader:
+    """Serves the current :class:`Catalog`, reloading it when the file changes.
+
+    ``path`` is a catalog file, a directory of shards, or a list of either.
+    """
+
+    PREVIEW_SIZE = 10
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH, compiled=None):
+        self.path = path
+        # The compiled build sits next to the first source.
+        self.primary_path = path if isinstance(path, (str, os.PathLike)) else path[0]
+        if compiled is None:
+            compiled = os.environ.get("FEIN_COMPILED_CATALOG", "1") != "0"
+        self.compiled = compiled
+        self._catalog = None
+        self._signature = None
+        self._base_version = None
+        self._patches_seen = None
+        self._applied = set()
+        self._patches = 0
+        self._lock = threading.Lock()
+        # Hits are counted without waiting on a reload that holds _lock.
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+        self._unchanged = 0
+        self._errors = 0
+        self._total_load_seconds = 0.0
+        self.last_error = None
+        self._background = None
+        self._background_error = None
+        self._background_lock = threading.Lock()
+        self._preview = None
+
+    def get(self):
+        """Return the current catalog, reloading it first if the file changed.
+
+        New patch files (see :mod:`fein.segments`) are applied on top of the
+        catalog being served, without reloading it.
+
+        Raises ``FileNotFoundError``/``json.JSONDecodeError`` only when no
+        catalog has been loaded yet; afterwards a broken or missing file keeps
+        the last good catalog in service.
+        """
+        try:
+            sources = ingest.resolve_sources(self.path)
+            if not sources:
+                raise FileNotFoundError(f"No catalog files found in {self.path}")
+            signature = ingest.sources_signature(sources)
+        except FileNotFoundError:
+            if self._catalog is None:
+                raise
+            self._hit()
+            return self._catalog
+
+        patches = self._patches_signature()
+        catalog = self._catalog
+        if catalog is not None and signature == self._signature and patches == self._patches_seen:
+            self._hit()
+            return catalog
+
+        with self._lock:
+            try:
+                if self._catalog is None or signature != self._signature:
+                    self._load(sources, signature)
+                elif patches == self._patches_seen:
+                    # Another session caught up while we waited for the lock.
+                    self._hit()
+                if patches != self._patches_seen:
+                    self._catalog = self._apply_pending(self._catalog)
+                    self._patches_seen = patches
+                return self._catalog
+            except (OSError, ValueError) as e:
+                self._errors += 1
+                self.last_error = e
+                if self._catalog is None:
+                    raise
+                logger.warning("Keeping catalog %s, reload failed: %s", self._catalog.version, e)
+                return self._catalog
+
+    def _hit(self):
+        with self._stats_lock:
+            self._hits += 1
+
+    def _patches_signature(self):
+        try:
+            return os.stat(segments.patches_dir(self.primary_path)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _apply_pending(self, catalog):
+        """``catalog`` with every saved patch not applied yet applied, in order."""
+        for name in segments.list_patches(self.primary_path):
+            if name in self._applied:
+                continue
+            # A patch that can't be applied is skipped for good rather than retried on every request.
+            self._applied.add(name)
+            started = time.perf_counter()
+            try:
+                patch = segments.read_patch(self.primary_path, name)
+                if patch.base is not None and patch.base != catalog.version:
+                    raise ValueError(f"written against catalog {patch.base}, not {catalog.version}")
+                catalog, _changes = segments.apply_patch(catalog, patch)
+            except (OSError, ValueError, LookupError) as e:
+                logger.warning("Skipping catalog patch %s: %s", name, e)
+                continue
+            self._patches += 1
+            logger.info("Applied catalog patch %s (%d changes) as %s in %.1f ms",
+                        name, patch.size, catalog.version, (time.perf_counter() - started) * 1000)
+        return catalog
+
+    def apply_patch(self, patch):
+        """Apply ``patch`` to the current catalog and save it for other processes.
+
+        Returns ``(catalog, changes)``; see :func:`fein.segments.apply_patch`.
+        A ``patch.base`` other than the current version raises ``ValueError``.
+        Patches are meant to come from one writer at a time: a patch saved by
+        another process in between is written against an older version and
+        gets skipped.
+        """
+        self.get()
+        with self._lock:
+            catalog = self._catalog
+            if patch.base is not None and patch.base != catalog.version:
+                raise ValueError(f"Patch is for catalog {patch.base}, the current one is {catalog.version}")
+            patch = replace(patch, base=catalog.version)
+            # Validates before anything is written.
+            patched, changes = segments.apply_patch(catalog, patch)
+            self._applied.add(segments.write_patch(self.primary_path, patch))
+            self._patches += 1
+            self._catalog = patched
+        return patched, changes
+
+    @property
+    def applied_patches(self):
+        """Names of the saved patches included in the catalog being served."""
+        return sorted(self._applied)
+
+    def _keep_current(self, signature):
+        # Touched but not edited: keep the parsed catalog.
+        self._signature = signature
+        self._unchanged += 1
+        self._hit()
+
+    def _load(self, sources, signature):
+        started = time.perf_counter()
+        index = None
+        compiled = catalog_build.read_compiled(self.primary_path, signature) if self.compiled else None
+        if compiled is not None:
+            version, store, index = compiled
+            if version == self._base_version:
+                return self._keep_current(signature)
+        else:
+            version = ingest.sources_version(sources)
+            if version == self._base_version:
+                return self._keep_current(signature)
+
+            store = ingest.build_store(sources)
+            if self.compiled:
+                index = catalog_build.build_search_index(store)
+                try:
+                    catalog_build.write_compiled(self.primary_path, signature, version, store, index)
+                except OSError as e:
+                    logger.warning("Could not write compiled catalog for %s: %s", self.primary_path, e)
+        elapsed = time.perf_counter() - started
+        catalog = Catalog(
+            path=self.path,
+            version=version,
+            mtime=max(mtime_ns for mtime_ns, _size in signature) / 1e9,
+            loaded_at=time.time(),
+            load_seconds=elapsed,
+            store=store,
+        )
+        if index is not None:
+            catalog.provide("search_index", index)
+        # Saved patches apply to the new base too, before anyone sees it.
+        self._applied = set()
+        self._patches = 0
+        self._patches_seen = self._patches_signature()
+        catalog = self._apply_pending(catalog)
+
+        self._misses += 1
+        if self._catalog is not None:
+            self._reloads += 1
+        self._total_load_seconds += elapsed
+        self.last_error = None
+        # Publish the fully built catalog in a single assignment.
+        self._catalog = catalog
+        self._base_version = version
+        self._signature = signature
+        logger.info(
+            "Loaded catalog %s (%d projects) from %s in %.1f ms",
+            version, catalog.project_count, "compiled build" if compiled is not None else "JSON", elapsed * 1000,
+        )
+
+    @property
+    def loading(self):
+        """True while a background first load is running."""
+        return self._catalog is None and self._background is not None and self._background.is_alive()
+
+    def _load_in_background(self):
+        try:
+            self.get()
+        except Exception as e:
+            self._background_error = e
+
+    def get_nowait(self):
+        """Like :meth:`get`, but returns ``None`` instead of waiting for the first load.
+
+        The first call starts loading on a background thread; use
+        :meth:`preview` to show something meanwhile. An error from the
+        background load is raised by the next call, which also allows a retry.
+        """
+        if self._catalog is not None:
+            return self.get()
+        with self._background_lock:
+            error, self._background_error = self._background_error, None
+            if error is not None:
+                self._background = None
+                raise error
+            if self._background is None:
+                self._background = threading.Thread(target=self._load_in_background, name="catalog-load", daemon=True)
+                self._background.start()
+        return self._catalog
+
+    def preview(self, limit=PREVIEW_SIZE):
+        """The first ``limit`` projects, streamed without waiting for the full catalog.
+
+        Ids match the full catalog, which lists the same projects first.
+        """
+        preview = self._preview
+        if preview is None or len(preview) < limit:
+            preview = self._preview = ingest.build_store(ingest.resolve_sources(self.path), limit=limit)
+        return preview
+
+    def stats(self):
+        """Counters for confirming the cache behaves under real traffic."""
+        catalog = self._catalog
+        return {
+            "path": self.path,
+            "version": catalog.version if catalog else None,
+            "projects": catalog.live_count if catalog else 0,
+            "patches": self._patches,
+            "hits": self._hits,
+            "misses": self._misses,
+            "reloads": self._reloads,
+            "unchanged_touches": self._unchanged,
+            "errors": self._errors,
+            "last_load_seconds": catalog.load_seconds if catalog else None,
+            "total_load_seconds": self._total_load_seconds,
+        }
+
+
+_loaders = {}
+_loaders_lock = threading.Lock()
+
+
+def shared_loader(path=DEFAULT_CATALOG_PATH):
+    """Return the process-wide loader for ``path``, shared by all sessions.
+
+    ``path`` is anything :class:`CatalogLoader` takes; spellings of the same
+    files share a loader.
+    """
+    paths = [path] if isinstance(path, (str, os.PathLike)) else path
+    key = tuple(os.path.abspath(p) for p in paths)
+    loader = _loaders.get(key)
+    if loader is None:
+        with _loaders_lock:
+            loader = _loaders.get(key)
+            if loader is None:
+                loader = _loaders[key] = CatalogLoader(path)
+    return loader
+
+
+def load_catalog(path=DEFAULT_CATALOG_PATH):
+    """Shortcut for ``shared_loader(path).get()``."""
+    return shared_loader(path).get()
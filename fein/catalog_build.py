@@ -0,0 +1,203 @@
+"""Compiled, memory-mappable form of ``projects_data.json``.
+
+``projects_data.json`` stays the source of truth. Compiling it writes the
+:class:`~fein.store.ProjectStore` columns and the prebuilt
+:class:`~fein.search_index.SearchIndex` next to it as ``.npy`` arrays plus a
+JSON manifest::
+
+    projects_data.catalog/
+        CURRENT                  name of the live build directory
+        <version>/manifest.json  vocabularies, source signature, counts
+        <version>/*.npy          store columns and posting lists
+        <version>/search_texts.bin
+
+Loading maps the arrays read-only, so start-up skips JSON parsing and every
+worker process on the machine shares the same pages. A build is only used
+while the source files' mtimes and sizes match the ones it was compiled
+from; otherwise the loader recompiles it.
+
+Run ``python -m fein.catalog_build [projects_data.json]`` to compile ahead
+of deployment.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from fein.search_index import SearchIndex, searchable_text
+from fein.store import EncodedLists, EncodedValues, ProjectStore, StringTable
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+_LIST_COLUMNS = ("tech", "datasets", "keywords")
+
+
+def compiled_dir(json_path):
+    """``projects_data.json`` -> ``projects_data.catalog``."""
+    return os.path.splitext(json_path)[0] + ".catalog"
+
+
+def _store_arrays(store):
+    arrays = {
+        "titles_blob": store.titles.blob,
+        "titles_offsets": store.titles.offsets,
+        "descriptions_blob": store.descriptions.blob,
+        "descriptions_offsets": store.descriptions.offsets,
+        "domain_codes": store.domain.codes,
+        "difficulty_codes": store.difficulty.codes,
+    }
+    for name in _LIST_COLUMNS:
+        column = getattr(store, name)
+        arrays[f"{name}_offsets"] = column.offsets
+        arrays[f"{name}_values"] = column.values
+    return arrays
+
+
+def write_compiled(json_path, signature, version, store, index):
+    """Write a build for ``version`` and make it the current one; returns its directory."""
+    root = compiled_dir(json_path)
+    os.makedirs(root, exist_ok=True)
+    target = os.path.join(root, version)
+    staging = tempfile.mkdtemp(prefix=f".{version}-", dir=root)
+    try:
+        os.chmod(staging, 0o755)
+        for name, array in {**_store_arrays(store), **index.arrays()}.items():
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+        with open(os.path.join(staging, "search_texts.bin"), "wb") as f:
+            f.write(index.texts)
+        manifest = {
+            "format": FORMAT_VERSION,
+            "version": version,
+            "source": {"files": [list(pair) for pair in signature]},
+            "project_count": len(store),
+            "built_at": time.time(),
+            "vocabularies": {
+                "domain": store.domain.vocabulary,
+                "difficulty": store.difficulty.vocabulary,
+                **{name: getattr(store, name).vocabulary for name in _LIST_COLUMNS},
+            },
+            "github_urls": {str(pid): url for pid, url in store.github_urls.items()},
+            "search": {"grams": index.grams, "tokens": index.tokens},
+        }
+        with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another process already published this version.
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(root, f".CURRENT-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, "CURRENT"))
+    _remove_stale_builds(root, keep=version)
+    return target
+
+
+def _remove_stale_builds(root, keep):
+    # Processes still mapping an old build keep their pages; unlinking is safe.
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name != keep and not name.startswith(".") and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _load_array(directory, name):
+    path = os.path.join(directory, f"{name}.npy")
+    try:
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+    except ValueError:
+        # Zero-length arrays can't be memory-mapped.
+        return np.load(path, allow_pickle=False)
+
+
+def _map_bytes(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_compiled(json_path, signature=None):
+    """Map the current build as ``(version, store, index)``.
+
+    Returns ``None`` when there is no usable build, or when ``signature``
+    (``(mtime_ns, size)`` of each source file) differs from the one it was
+    compiled from.
+    """
+    root = compiled_dir(json_path)
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            directory = os.path.join(root, f.read().strip())
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    source = manifest.get("source", {})
+    if manifest.get("format") != FORMAT_VERSION:
+        return None
+    if signature is not None and source.get("files") != [list(pair) for pair in signature]:
+        return None
+
+    try:
+        arrays = {name: _load_array(directory, name) for name in (
+            "titles_blob", "titles_offsets", "descriptions_blob", "descriptions_offsets",
+            "domain_codes", "difficulty_codes",
+            *(f"{name}_{part}" for name in _LIST_COLUMNS for part in ("offsets", "values")),
+            "text_offsets", "gram_offsets", "gram_ids", "token_offsets", "token_ids",
+        )}
+        texts = _map_bytes(os.path.join(directory, "search_texts.bin"))
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable compiled catalog %s: %s", directory, e)
+        return None
+
+    vocabularies = manifest["vocabularies"]
+    store = ProjectStore(
+        titles=StringTable(arrays["titles_blob"], arrays["titles_offsets"]),
+        descriptions=StringTable(arrays["descriptions_blob"], arrays["descriptions_offsets"]),
+        domain=EncodedValues(vocabularies["domain"], arrays["domain_codes"]),
+        difficulty=EncodedValues(vocabularies["difficulty"], arrays["difficulty_codes"]),
+        **{
+            name: EncodedLists(vocabularies[name], arrays[f"{name}_offsets"], arrays[f"{name}_values"])
+            for name in _LIST_COLUMNS
+        },
+        github_urls={int(pid): url for pid, url in manifest.get("github_urls", {}).items()},
+    )
+    search = manifest["search"]
+    index = SearchIndex(
+        texts, arrays["text_offsets"],
+        search["grams"], arrays["gram_offsets"], arrays["gram_ids"],
+        search["tokens"], arrays["token_offsets"], arrays["token_ids"],
+    )
+    return manifest["version"], store, index
+
+
+def build_search_index(store):
+    return SearchIndex.build(searchable_text(project) for project in store)
+
+
+def main(argv=None):
+    from fein.catalog import CatalogLoader, DEFAULT_CATALOG_PATH
+
+    parser = argparse.ArgumentParser(description="Compile projects_data.json into a memory-mappable catalog.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_CATALOG_PATH)
+    args = parser.parse_args(argv)
+
+    # A fresh loader with no usable build parses the JSON and writes one.
+    catalog = CatalogLoader(args.path, compiled=True).get()
+    print(f"{compiled_dir(args.path)}: version {catalog.version}, {catalog.project_count} projects")
+
+
+if __name__ == "__main__":
+    main()
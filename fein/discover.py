@@ -0,0 +1,178 @@
+"""The "discover" feed: the catalog in a per-session random order, one page at a time.
+
+A session keeps only a seed and a cursor. The order is never materialized:
+position ``i`` maps to a project through a keyed pseudo-random permutation
+(:class:`FeistelPermutation`), so a page costs O(page size) whatever the
+catalog size or how deep the session has scrolled, and the same seed always
+gives the same order.
+
+The feed can also mix strata, the projects of each domain or difficulty
+level, with a weight per stratum. Each stratum is shuffled on its own, and
+its ``k``-th project is placed at virtual time ``(k + offset) / weight``;
+the feed is all strata merged by that time. A stratum with twice the weight
+shows up twice as often until it runs out. How many projects of each
+stratum come before any position follows from a binary search over time,
+so deep pages stay O(page size + strata) too.
+"""
+import heapq
+import math
+
+import numpy as np
+
+from fein.facets import DIFFICULTY_LABELS, facet_columns
+from fein.query import PAGE_SIZE
+
+MIXES = ("domain", "difficulty")
+FEISTEL_ROUNDS = 4
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(value):
+    # splitmix64's finalizer: a cheap, well-spread 64-bit hash.
+    value &= _MASK64
+    value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9 & _MASK64
+    value = (value ^ (value >> 27)) * 0x94D049BB133111EB & _MASK64
+    return value ^ (value >> 31)
+
+
+class FeistelPermutation:
+    """A seeded pseudo-random permutation of ``range(n)``, evaluated one position at a time.
+
+    A balanced Feistel network is a bijection on the smallest ``4**k``
+    covering ``n``; positions that land outside ``range(n)`` are encrypted
+    again (cycle walking), which takes fewer than four rounds on average.
+    """
+
+    def __init__(self, n, seed):
+        self.n = n
+        self._half = max(1, ((n - 1).bit_length() + 1) // 2)
+        self._mask = (1 << self._half) - 1
+        self._keys = [_mix64(seed * FEISTEL_ROUNDS + round_ + 1) for round_ in range(FEISTEL_ROUNDS)]
+
+    def __len__(self):
+        return self.n
+
+    def _encrypt(self, value):
+        left, right = value >> self._half, value & self._mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix64(right ^ key) & self._mask)
+        return (left << self._half) | right
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        value = self._encrypt(i)
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+
+def _strata(catalog, mix):
+    """``[(name, sorted live ids)]`` for ``mix``, built once per catalog version."""
+    if mix is not None and mix not in MIXES:
+        raise ValueError(f"mix must be one of {', '.join(MIXES)}")
+
+    def build(catalog):
+        live = catalog.live_ids()
+        if mix is None:
+            return [("", live)]
+        columns = facet_columns(catalog)
+        if mix == "domain":
+            codes, names = columns.domain[live], dict(enumerate(columns.domain_names))
+        else:
+            codes, names = columns.difficulty[live], DIFFICULTY_LABELS
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        return [
+            (names.get(int(codes[group[0]]), "Other"), live[np.sort(group)])
+            for group in np.split(order, bounds) if len(group)
+        ]
+
+    return catalog.derived(f"discover_strata_{mix or 'all'}", build)
+
+
+class DiscoverFeed:
+    """One session's random order over the catalog; see the module docstring."""
+
+    def __init__(self, strata, seed, weights=None):
+        self._strata = []
+        for number, (name, ids) in enumerate(strata):
+            weight = 1.0 if weights is None else float(weights.get(name, 0.0))
+            if weight > 0 and len(ids):
+                key = _mix64(seed * 1_000_003 + number)
+                offset = (key >> 11) / float(1 << 53)
+                self._strata.append((ids, FeistelPermutation(len(ids), key), weight, offset))
+        self.total = sum(len(ids) for ids, _, _, _ in self._strata)
+
+    def __len__(self):
+        return self.total
+
+    def _counts(self, time):
+        """Projects of each stratum placed strictly before virtual ``time``."""
+        counts = []
+        for ids, _, weight, offset in self._strata:
+            count = min(len(ids), max(0, math.ceil(time * weight - offset)))
+            # Rounding may put the estimate one off; settle it with the exact placement times.
+            while count > 0 and (count - 1 + offset) / weight >= time:
+                count -= 1
+            while count < len(ids) and (count + offset) / weight < time:
+                count += 1
+            counts.append(count)
+        return counts
+
+    def _start(self, cursor):
+        """Per-stratum counts at some time before position ``cursor``, plus how many positions are left to skip."""
+        low, high = 0.0, max((len(ids) + offset) / weight for ids, _, weight, offset in self._strata)
+        while True:
+            middle = (low + high) / 2
+            if middle in (low, high):
+                break
+            if sum(self._counts(middle)) <= cursor:
+                low = middle
+            else:
+                high = middle
+        counts = self._counts(low)
+        return counts, cursor - sum(counts)
+
+    def page(self, cursor=0, size=PAGE_SIZE):
+        """``(ids, next_cursor)`` like :func:`fein.query.page`."""
+        cursor = int(cursor or 0)
+        end = min(cursor + size, self.total)
+        if cursor >= end:
+            return np.empty(0, dtype=np.int32), None
+        if len(self._strata) == 1:
+            ids, permutation, _, _ = self._strata[0]
+            picked = [ids[permutation[position]] for position in range(cursor, end)]
+        else:
+            counts, skip = self._start(cursor)
+            # Ties in time go to the earlier stratum, here and in _counts alike.
+            queue = [((count + offset) / weight, number, count)
+                     for number, ((ids, _, weight, offset), count) in enumerate(zip(self._strata, counts))
+                     if count < len(ids)]
+            heapq.heapify(queue)
+            picked = []
+            while len(picked) < end - cursor:
+                _, number, k = heapq.heappop(queue)
+                ids, permutation, weight, offset = self._strata[number]
+                if skip:
+                    skip -= 1
+                else:
+                    picked.append(ids[permutation[k]])
+                if k + 1 < len(ids):
+                    heapq.heappush(queue, ((k + 1 + offset) / weight, number, k + 1))
+        return np.array(picked, dtype=np.int32), (end if end < self.total else None)
+
+
+def discover_feed(catalog, seed, mix=None, weights=None):
+    """The feed for ``seed``: every project, or strata by ``mix`` (``domain``/``difficulty``).
+
+    ``weights`` maps stratum names (domains or difficulty labels) to their
+    share of the feed; strata it leaves out are skipped. Without it every
+    stratum gets the same weight.
+    """
+    return DiscoverFeed(_strata(catalog, mix), seed, weights)
+
+
+def discover_page(catalog, seed, cursor=0, size=PAGE_SIZE, mix=None, weights=None):
+    """One page of the discover feed for ``seed``."""
+    return discover_feed(catalog, seed, mix, weights).page(cursor, size)
@@ -0,0 +1,127 @@
+"""Bulk export of search results as CSV, JSON lines or Parquet.
+
+:func:`iter_export` turns the ids of a result set (the same ids the sidebar
+filters produce, see :func:`fein.query.resolve_query`) into a stream of
+byte chunks. Projects are materialized :data:`CHUNK_SIZE` at a time and
+each chunk is encoded before the next one is read, so memory stays bounded
+by one chunk whatever the size of the result. A chunk becomes one Parquet
+row group; Parquet needs ``pyarrow``, which is optional.
+"""
+import csv
+import importlib.util
+import io
+import json
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+COLUMNS = ("id", "domain", "title", "description", "difficulty", "tech", "datasets", "keywords", "github_url")
+LIST_COLUMNS = ("tech", "datasets", "keywords")
+# CSV has no list type; list values are joined with this.
+LIST_SEPARATOR = "; "
+CHUNK_SIZE = 1000
+
+
+def parquet_available():
+    # Without importing it: pyarrow is heavy, and only a Parquet export needs it loaded.
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _chunks(catalog, ids, size):
+    for start in range(0, len(ids), size):
+        yield [catalog.project(pid) for pid in ids[start:start + size]]
+
+
+def _record(project):
+    record = {column: getattr(project, column) for column in COLUMNS}
+    for column in LIST_COLUMNS:
+        record[column] = list(record[column])
+    return record
+
+
+def _csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for projects in chunks:
+        for project in projects:
+            writer.writerow([
+                LIST_SEPARATOR.join(value) if column in LIST_COLUMNS else ("" if value is None else value)
+                for column, value in zip(COLUMNS, (getattr(project, column) for column in COLUMNS))
+            ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # The header alone, for an empty result.
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _jsonl(chunks):
+    for projects in chunks:
+        yield "".join(json.dumps(_record(project), ensure_ascii=False) + "\n" for project in projects).encode("utf-8")
+
+
+class _Sink:
+    """A write-only file that hands out what was written since the last :meth:`take`."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _parquet(chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int32()), ("domain", pa.string()), ("title", pa.string()), ("description", pa.string()),
+        ("difficulty", pa.string()), *((column, pa.list_(pa.string())) for column in LIST_COLUMNS),
+        ("github_url", pa.string()),
+    ])
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for projects in chunks:
+            columns = {column: [getattr(project, column) for project in projects] for column in COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+_ENCODERS = {"csv": _csv, "jsonl": _jsonl, "parquet": _parquet}
+
+
+def iter_export(catalog, ids, format, chunk_size=CHUNK_SIZE):
+    """The projects ``ids``, in that order, as byte chunks of ``format``.
+
+    Raises ``ValueError`` right away (not on first iteration) for an
+    unknown format or when Parquet is asked for without ``pyarrow``.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if format == "parquet" and not parquet_available():
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+    return _ENCODERS[format](_chunks(catalog, ids, chunk_size))
+
@@ -0,0 +1,244 @@
+"""Columnar view of the catalog for the sidebar's facet filters.
+
+Difficulty becomes a NumPy code array and every tech, dataset and keyword
+value gets a sorted array of the project ids carrying it. Each filter in the
+sidebar then turns into a boolean mask over project ids.
+
+:class:`CatalogFacets` holds the vocabularies and counts the sidebar needs,
+computed once per catalog version; :func:`live_facet_counts` counts facets
+for a result set straight from the columns.
+"""
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+
+from fein.segments import SegmentedStore
+
+DIFFICULTY_LEVELS = {"Beginner": 1, "Intermediate": 2, "Advanced": 3, "Expert": 4}
+
+
+_NO_IDS = np.empty(0, dtype=np.int32)
+
+
+def _removed(ids, pids):
+    # Posting lists are long and patches touch a few ids: find them by bisection.
+    pids = np.array(sorted(pids), dtype=np.int32)
+    positions = np.searchsorted(ids, pids)
+    found = positions < len(ids)
+    found[found] = ids[positions[found]] == pids[found]
+    return np.delete(ids, positions[found]) if found.any() else ids
+
+
+def _inserted(ids, pids):
+    pids = np.array(sorted(pids), dtype=np.int32)
+    positions = np.searchsorted(ids, pids)
+    new = positions == len(ids)
+    new[~new] = ids[positions[~new]] != pids[~new]
+    return np.insert(ids, positions[new], pids[new]) if new.any() else ids
+
+
+class FacetColumns:
+    """Difficulty codes plus per-value id arrays for tech, datasets and keywords."""
+
+    def __init__(self, domain_names, domain, difficulty, tech, datasets, keywords):
+        self.size = len(difficulty)
+        self.domain_names = domain_names
+        self.domain = domain
+        self.difficulty = difficulty
+        self.tech = tech
+        self.datasets = datasets
+        self.keywords = keywords
+        # Lower-cased vocabularies for the substring filters.
+        self._datasets_lower = [(value.lower(), value) for value in self.datasets]
+        self._keywords_lower = [(value.lower(), value) for value in self.keywords]
+
+    @classmethod
+    def from_store(cls, store):
+        # Unknown difficulty labels map to 0, which no slider range includes.
+        levels = np.array([DIFFICULTY_LEVELS.get(label, 0) for label in store.difficulty.vocabulary], dtype=np.int8)
+        return cls(
+            domain_names=store.domain.vocabulary,
+            domain=store.domain.codes,
+            difficulty=levels[store.difficulty.codes] if len(store) else np.zeros(0, dtype=np.int8),
+            tech=store.tech.postings(),
+            datasets=store.datasets.postings(),
+            keywords=store.keywords.postings(),
+        )
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        store = catalog.store
+        if isinstance(store, SegmentedStore):
+            base = store.segments[0].store
+            return cls.from_store(base).patched(store, np.flatnonzero(store.owner != 0), base)
+        return cls.from_store(store)
+
+    def patched(self, store, ids, previous):
+        """These columns with the projects ``ids`` re-read from ``store``.
+
+        ``previous`` is the store these columns were built from; only the
+        posting lists of values the changed projects had or now have are
+        rewritten. Removed projects get difficulty 0, so no filter matches them.
+        """
+        ids = np.asarray(ids, dtype=np.int32)
+        domain_names = list(self.domain_names)
+        domain_codes = {name: code for code, name in enumerate(domain_names)}
+        domain = np.zeros(len(store), dtype=self.domain.dtype)
+        domain[:self.size] = self.domain
+        difficulty = np.zeros(len(store), dtype=np.int8)
+        difficulty[:self.size] = self.difficulty
+        changes = {"tech": {}, "datasets": {}, "keywords": {}}
+        for pid in ids.tolist():
+            old = previous.project(pid) if pid < len(previous) else None
+            new = store.project(pid)
+            live = store.is_live(pid)
+            if live:
+                if new.domain not in domain_codes:
+                    domain_codes[new.domain] = len(domain_names)
+                    domain_names.append(new.domain)
+                domain[pid] = domain_codes[new.domain]
+            difficulty[pid] = DIFFICULTY_LEVELS.get(new.difficulty, 0) if live else 0
+            for field, values in changes.items():
+                for value in getattr(old, field) if old is not None else ():
+                    values.setdefault(value, (set(), set()))[0].add(pid)
+                for value in getattr(new, field):
+                    values.setdefault(value, (set(), set()))[1].add(pid)
+        postings = {}
+        for field, values in changes.items():
+            postings[field] = dict(getattr(self, field))
+            for value, (dropped, added) in values.items():
+                carrying = _removed(postings[field].get(value, _NO_IDS), dropped - added)
+                carrying = _inserted(carrying, added)
+                if len(carrying):
+                    postings[field][value] = carrying
+                else:
+                    postings[field].pop(value, None)
+        return FacetColumns(domain_names, domain, difficulty, **postings)
+
+    def ids_mask(self, ids):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[ids] = True
+        return mask
+
+    def _any_of(self, postings, values):
+        mask = np.zeros(self.size, dtype=bool)
+        for value in values:
+            ids = postings.get(value)
+            if ids is not None:
+                mask[ids] = True
+        return mask
+
+    def difficulty_mask(self, min_level, max_level):
+        return (self.difficulty >= min_level) & (self.difficulty <= max_level)
+
+    def tech_mask(self, techs):
+        """Projects using at least one of ``techs`` (exact names)."""
+        return self._any_of(self.tech, techs)
+
+    def dataset_mask(self, text):
+        """Projects with a dataset whose name contains ``text``, ignoring case."""
+        needle = text.lower()
+        return self._any_of(self.datasets, [value for lower, value in self._datasets_lower if needle in lower])
+
+    def keyword_mask(self, text):
+        """Projects with a keyword containing ``text``, ignoring case."""
+        needle = text.lower()
+        return self._any_of(self.keywords, [value for lower, value in self._keywords_lower if needle in lower])
+
+
+def facet_columns(catalog):
+    """The :class:`FacetColumns` for ``catalog``, built once per catalog version."""
+    return catalog.derived("facet_columns", FacetColumns.from_catalog)
+
+
+DIFFICULTY_LABELS = {level: label for label, level in DIFFICULTY_LEVELS.items()}
+
+
+def _difficulty_counts(codes):
+    counts = np.bincount(codes, minlength=len(DIFFICULTY_LABELS) + 1)
+    return {label: int(counts[level]) for level, label in sorted(DIFFICULTY_LABELS.items())}
+
+
+def _domain_counts(columns, codes):
+    counts = np.bincount(codes, minlength=len(columns.domain_names))
+    return {domain: int(count) for domain, count in zip(columns.domain_names, counts) if count}
+
+
+@dataclass(frozen=True)
+class CatalogFacets:
+    """Vocabularies and counts for the whole catalog."""
+    tech_options: list
+    dataset_vocabulary: list
+    keyword_vocabulary: list
+    domain_counts: dict
+    difficulty_histogram: dict
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        columns = facet_columns(catalog)
+        domain, difficulty = columns.domain, columns.difficulty
+        if catalog.live_count < catalog.project_count:
+            live = catalog.live_ids()
+            domain, difficulty = domain[live], difficulty[live]
+        return cls(
+            tech_options=sorted(columns.tech),
+            dataset_vocabulary=sorted(columns.datasets),
+            keyword_vocabulary=sorted(columns.keywords),
+            domain_counts=_domain_counts(columns, domain),
+            difficulty_histogram=_difficulty_counts(difficulty),
+        )
+
+
+def catalog_facets(catalog):
+    """The :class:`CatalogFacets` for ``catalog``, built once per catalog version."""
+    return catalog.derived("catalog_facets", CatalogFacets.from_catalog)
+
+
+def _list_counts(lists, rows):
+    """Projects among ``rows`` carrying each value of an :class:`~fein.store.EncodedLists`."""
+    rows = np.asarray(rows, dtype=np.intp)
+    starts = lists.offsets[rows]
+    lengths = lists.offsets[rows + 1] - starts
+    if not lengths.sum():
+        return Counter()
+    # Positions of every value of every row, gathered from the CSR arrays without a Python loop.
+    positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    size = len(lists.vocabulary)
+    # A value repeated within one project counts once, as in the posting lists.
+    keys = np.sort(np.repeat(np.arange(len(rows), dtype=np.int64), lengths) * size + lists.values[positions])
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    counts = np.bincount(keys % size, minlength=size)
+    return Counter({lists.vocabulary[value]: int(counts[value]) for value in np.flatnonzero(counts)})
+
+
+def _tech_counts(store, ids):
+    if not isinstance(store, SegmentedStore):
+        return _list_counts(store.tech, ids)
+    counts = Counter()
+    owners = store.owner[ids]
+    for number in np.unique(owners).tolist():
+        segment = store.segments[number]
+        in_segment = ids[owners == number]
+        rows = in_segment if number == 0 else [segment.row(pid) for pid in in_segment.tolist()]
+        counts.update(_list_counts(segment.store.tech, rows))
+    return counts
+
+
+def live_facet_counts(catalog, ids, tech_limit=0):
+    """Difficulty and domain counts for the projects in ``ids``, plus the top ``tech_limit`` techs if asked.
+
+    Everything is read from the rows of ``ids`` alone, so the cost follows
+    the size of the result, not of the catalog.
+    """
+    columns = facet_columns(catalog)
+    ids = np.asarray(ids, dtype=np.intp)
+    counts = {
+        "total": len(ids),
+        "difficulty": _difficulty_counts(columns.difficulty[ids]),
+        "domains": _domain_counts(columns, columns.domain[ids]),
+    }
+    if tech_limit:
+        top_tech = sorted(_tech_counts(catalog.store, ids).items(), key=lambda item: (-item[1], item[0]))
+        counts["tech"] = dict(top_tech[:tech_limit])
+    return counts
@@ -0,0 +1,148 @@
+"""Typo-tolerant correction of search words against the catalog vocabulary.
+
+A SymSpell-style deletion dictionary maps every string obtained by deleting
+up to :data:`MAX_DISTANCE` characters from a vocabulary word's prefix back to
+that word. Looking up a misspelled word generates its own deletions, so
+candidates are found with a handful of dictionary probes, independent of
+the catalog size. Each candidate is then confirmed with a bounded
+Damerau-Levenshtein (optimal string alignment) distance.
+
+Only words the exact search can't place get corrected; see
+:func:`fein.query.corrected_query`.
+"""
+from itertools import combinations
+
+from fein.search_index import search_index
+
+# Words up to this length tolerate one edit, longer ones two.
+ONE_EDIT_MAX_LENGTH = 4
+MAX_DISTANCE = 2
+MIN_WORD_LENGTH = 3
+# Deletions are generated from this many leading characters only, which
+# bounds the dictionary size without losing candidates (SymSpell's prefix trick).
+PREFIX_LENGTH = 7
+
+
+def max_edits(word):
+    if len(word) < MIN_WORD_LENGTH:
+        return 0
+    return 1 if len(word) <= ONE_EDIT_MAX_LENGTH else MAX_DISTANCE
+
+
+def _deletes(word, distance):
+    prefix = word[:PREFIX_LENGTH]
+    deletes = {prefix}
+    for removed in range(1, min(distance, len(prefix) - 1) + 1):
+        for positions in combinations(range(len(prefix)), removed):
+            deletes.add("".join(char for i, char in enumerate(prefix) if i not in positions))
+    return deletes
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or ``limit + 1`` once it must exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellIndex:
+    """Deletion dictionary over a vocabulary, with a frequency per word.
+
+    :meth:`extended` layers the words of patched projects over a base
+    dictionary instead of rebuilding it.
+    """
+
+    def __init__(self, words, frequencies, base=None):
+        self.words = list(words)
+        self.frequencies = list(frequencies)
+        self._base = base
+        self._deletes = {}
+        for slot, word in enumerate(self.words):
+            for delete in _deletes(word, max_edits(word)):
+                self._deletes.setdefault(delete, []).append(slot)
+
+    @classmethod
+    def from_search_index(cls, index):
+        """Vocabulary and document frequencies of a :class:`~fein.search_index.SearchIndex`."""
+        return cls(*_vocabulary(zip(index.tokens, index.token_frequencies())))
+
+    def __len__(self):
+        return len(self.words) + (len(self._base) if self._base is not None else 0)
+
+    def extended(self, words):
+        """This dictionary plus ``words`` (``{word: project count}``) it doesn't know yet.
+
+        Words of removed projects stay until the next full build; a
+        correction to one of them simply finds nothing.
+        """
+        base = self._base if self._base is not None else self
+        known = base.__dict__.get("_known")
+        if known is None:
+            known = base.__dict__["_known"] = set(base.words)
+        added = dict(zip(self.words, self.frequencies)) if self._base is not None else {}
+        for word, frequency in zip(*_vocabulary(words.items())):
+            if word not in known:
+                added[word] = added.get(word, 0) + frequency
+        return SpellIndex(added, added.values(), base=base)
+
+    def _best(self, word, limit):
+        best = None
+        seen = set()
+        for delete in _deletes(word, limit):
+            for slot in self._deletes.get(delete, ()):
+                if slot in seen:
+                    continue
+                seen.add(slot)
+                candidate = self.words[slot]
+                # Short vocabulary words only tolerate one edit, whichever side is longer.
+                distance = edit_distance(word, candidate, min(limit, max_edits(candidate)))
+                if distance <= min(limit, max_edits(candidate)):
+                    key = (distance, -self.frequencies[slot], candidate)
+                    if best is None or key < best:
+                        best = key
+        if self._base is not None:
+            base_best = self._base._best(word, limit)
+            if best is None or (base_best is not None and base_best < best):
+                best = base_best
+        return best
+
+    def suggest(self, word):
+        """The closest vocabulary word within ``max_edits(word)``, or ``None``.
+
+        Ties go to the word found in more projects.
+        """
+        word = word.lower()
+        limit = max_edits(word)
+        if not limit:
+            return None
+        best = self._best(word, limit)
+        return best[2] if best is not None else None
+
+
+def _vocabulary(counts):
+    words, frequencies = [], []
+    for word, frequency in counts:
+        if len(word) >= MIN_WORD_LENGTH and word.isalpha():
+            words.append(word)
+            frequencies.append(frequency)
+    return words, frequencies
+
+
+def spell_index(catalog):
+    """The :class:`SpellIndex` for ``catalog``, built once per catalog version."""
+    return catalog.derived("spell_index", lambda catalog: SpellIndex.from_search_index(search_index(catalog)))
@@ -0,0 +1,211 @@
+"""Streaming ingestion of project catalogs.
+
+``json.load`` has to materialize a whole catalog document before the first
+project can be used. The readers here yield ``(project, domain)`` pairs one
+at a time instead, so building a :class:`~fein.store.ProjectStore` keeps
+only the compact store plus a single project dict in memory.
+
+A catalog can be spread over several sources:
+
+* ``*.json`` - the ``[{"domain": ..., "projects": [...]}, ...]`` layout of
+  ``projects_data.json``, parsed incrementally;
+* ``*.ndjson`` / ``*.jsonl`` - one project object per line, with its domain
+  in a ``"domain"`` key or, failing that, taken from the file name (one
+  shard per domain);
+* a directory - every such file inside it, in name order.
+"""
+import hashlib
+import json
+import os
+
+from fein.store import StoreBuilder
+
+CHUNK_SIZE = 1 << 16
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+CATALOG_SUFFIXES = (".json",) + NDJSON_SUFFIXES
+
+_WHITESPACE = " \t\n\r"
+
+
+def resolve_sources(paths):
+    """Expand a path or list of paths (files or directories) into catalog files."""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    sources = []
+    for path in paths:
+        path = os.fspath(path)
+        if os.path.isdir(path):
+            sources.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith(CATALOG_SUFFIXES) and not name.startswith(".")
+            )
+        else:
+            sources.append(path)
+    return sources
+
+
+def sources_signature(sources):
+    """``((mtime_ns, size), ...)`` for each source; raises if one is missing."""
+    signature = []
+    for source in sources:
+        stat = os.stat(source)
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def sources_version(sources):
+    """Short content hash over all sources, read in chunks."""
+    digest = hashlib.sha1()
+    for source in sources:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class _JSONStream:
+    """Pulls JSON values out of a text file without reading all of it."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop what has been consumed before growing the buffer.
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at end of input."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def expect_end(self):
+        # Like json.load: anything but whitespace after the top-level value is an error.
+        if self.peek():
+            raise json.JSONDecodeError("Extra data", self._buffer, self._pos)
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Most likely cut off at the end of the buffer: read on.
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk.
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_json_catalog(path):
+    """Yield ``(project, domain)`` from a ``projects_data.json``-style file.
+
+    Projects listed before their domain's ``"domain"`` key are held until it
+    is known; everything else streams through.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        stream.expect("[")
+        if stream.peek() == "]":
+            stream.expect("]")
+            stream.expect_end()
+            return
+        while True:
+            stream.expect("{")
+            domain = None
+            pending = []
+            if stream.peek() != "}":
+                while True:
+                    key = stream.value()
+                    stream.expect(":")
+                    if key == "projects" and stream.peek() == "[":
+                        stream.expect("[")
+                        if stream.peek() != "]":
+                            while True:
+                                project = stream.value()
+                                if domain:
+                                    yield project, domain
+                                else:
+                                    pending.append(project)
+                                if stream.expect(",]") == "]":
+                                    break
+                        else:
+                            stream.expect("]")
+                    else:
+                        value = stream.value()
+                        if key == "domain":
+                            domain = value
+                    if stream.expect(",}") == "}":
+                        break
+            else:
+                stream.expect("}")
+            if domain:
+                for project in pending:
+                    yield project, domain
+            if stream.expect(",]") == "]":
+                break
+        stream.expect_end()
+
+
+def iter_ndjson_catalog(path):
+    """Yield ``(project, domain)`` from a file with one project object per line."""
+    shard_domain = os.path.splitext(os.path.basename(path))[0]
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                project = json.loads(line)
+                yield project, project.get("domain") or shard_domain
+
+
+def iter_projects(paths):
+    """Yield ``(project, domain)`` from every source in ``paths``, in order."""
+    for source in resolve_sources(paths):
+        if source.endswith(NDJSON_SUFFIXES):
+            yield from iter_ndjson_catalog(source)
+        else:
+            yield from iter_json_catalog(source)
+
+
+def build_store(paths, limit=None):
+    """Stream ``paths`` into a :class:`~fein.store.ProjectStore`.
+
+    ``limit`` stops after that many projects, which is enough to render a
+    first page while the full catalog is still loading.
+    """
+    builder = StoreBuilder()
+    for project, domain in iter_projects(paths):
+        if limit is not None and len(builder) >= limit:
+            break
+        try:
+            builder.add(project, domain)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Malformed project #{len(builder)} in domain {domain!r}: {e!r}") from e
+    return builder.build()
@@ -0,0 +1,209 @@
+"""Per-rerun timing spans with optional cProfile/tracemalloc capture.
+
+A script run calls :func:`begin_run` with a mode and :func:`end_run` when it
+is done; code in between wraps its stages in ``with span("filter"):``.
+Modes:
+
+* ``None`` - nothing is recorded; :func:`span` hands back a shared no-op
+  context manager, so instrumented code pays one thread-local lookup;
+* ``"spans"`` - stage durations only;
+* ``"cprofile"`` - spans plus a cProfile of the whole run;
+* ``"tracemalloc"`` - spans plus the run's top allocation sites.
+
+Finished runs feed a process-wide histogram per stage, exposed in the
+Prometheus text format by :func:`metrics_text`, and are logged as one JSON
+line on the ``fein.profiling`` logger.
+"""
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+MODES = ("spans", "cprofile", "tracemalloc")
+# Upper bounds in seconds, as Prometheus histogram buckets.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PROFILE_LINES = 25
+ALLOCATION_LINES = 15
+
+_NO_SPAN = contextlib.nullcontext()
+_local = threading.local()
+
+
+def mode_from(requested=None, env=None):
+    """The profiling mode for a run: ``requested`` if valid, else ``$FEIN_PROFILE``."""
+    env = os.environ.get("FEIN_PROFILE", "") if env is None else env
+    for mode in (requested, env):
+        mode = (mode or "").strip().lower()
+        if mode in ("1", "true", "on"):
+            return "spans"
+        if mode in MODES:
+            return mode
+    return None
+
+
+class RunProfile:
+    """Spans (and optionally a profile) collected for one script run."""
+
+    def __init__(self, name, mode):
+        self.name = name
+        self.mode = mode
+        self.spans = {}
+        self.notes = []
+        self._started = time.perf_counter()
+        self._profiler = None
+        self._own_tracemalloc = False
+        if mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Only one profiler can be active at a time (another session's run).
+                self._profiler = None
+                self.notes.append("cProfile busy in another run; recorded spans only")
+        elif mode == "tracemalloc" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+
+    def discard(self):
+        """Stop any profiler without reporting; for runs that never reached :func:`end_run`."""
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler = None
+        if self._own_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] = self.spans.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self):
+        summary = {
+            "run": self.name,
+            "mode": self.mode,
+            "total_ms": (time.perf_counter() - self._started) * 1000,
+            "spans_ms": {name: seconds * 1000 for name, seconds in self.spans.items()},
+        }
+        if self._profiler is not None:
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            summary["cprofile"] = out.getvalue()
+        if self.mode == "tracemalloc" and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            summary["allocations"] = [str(stat) for stat in snapshot.statistics("lineno")[:ALLOCATION_LINES]]
+            summary["traced_peak_kib"] = tracemalloc.get_traced_memory()[1] / 1024
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+            else:
+                self.notes.append("tracemalloc was already running; allocations include other threads")
+        if self.notes:
+            summary["notes"] = self.notes
+        registry.record(self.name, self.spans)
+        logger.info(json.dumps({key: summary[key] for key in ("run", "mode", "total_ms", "spans_ms")}))
+        return summary
+
+
+class StageHistograms:
+    """Process-wide duration histograms per stage, shared by all sessions."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._runs = {}
+
+    def record(self, run, spans):
+        with self._lock:
+            self._runs[run] = self._runs.get(run, 0) + 1
+            for stage, seconds in spans.items():
+                counts, total = self._stages.get(stage, ([0] * (len(self.buckets) + 1), 0.0))
+                counts[next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))] += 1
+                self._stages[stage] = (counts, total + seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._runs), {stage: (list(counts), total) for stage, (counts, total) in self._stages.items()}
+
+
+registry = StageHistograms()
+
+
+def metrics_text(histograms=registry):
+    """The stage histograms in the Prometheus text exposition format."""
+    runs, stages = histograms.snapshot()
+    lines = [
+        "# HELP fein_profiled_runs_total Script runs recorded with profiling enabled.",
+        "# TYPE fein_profiled_runs_total counter",
+    ]
+    lines += [f'fein_profiled_runs_total{{run="{run}"}} {count}' for run, count in sorted(runs.items())]
+    lines += [
+        "# HELP fein_stage_seconds Time spent in each stage of a script run.",
+        "# TYPE fein_stage_seconds histogram",
+    ]
+    for stage, (counts, total) in sorted(stages.items()):
+        cumulative = 0
+        for bound, count in zip((*map(str, histograms.buckets), "+Inf"), counts):
+            cumulative += count
+            lines.append(f'fein_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'fein_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'fein_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+    return "\n".join(lines) + "\n"
+
+
+_open_runs = {}
+_open_runs_lock = threading.Lock()
+
+
+def _discard_abandoned_runs():
+    # A run interrupted by an exception (Streamlit's rerun/stop) never ends;
+    # make sure its profiler doesn't outlive the thread that started it.
+    with _open_runs_lock:
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in _open_runs if ident not in alive or ident == threading.get_ident()]:
+            _open_runs.pop(ident).discard()
+
+
+def begin_run(name, mode):
+    """Start recording this thread's run; returns it, or ``None`` when ``mode`` is off."""
+    if _open_runs:
+        _discard_abandoned_runs()
+    run = RunProfile(name, mode) if mode else None
+    _local.run = run
+    if run is not None:
+        with _open_runs_lock:
+            _open_runs[threading.get_ident()] = run
+    return run
+
+
+def current_run():
+    return getattr(_local, "run", None)
+
+
+def end_run():
+    """Finish this thread's run and return its summary (``None`` if nothing was recorded)."""
+    run = current_run()
+    _local.run = None
+    if run is None:
+        return None
+    with _open_runs_lock:
+        _open_runs.pop(threading.get_ident(), None)
+    return run.finish()
+
+
+def span(name):
+    """Time the enclosed block as stage ``name`` of the current run, if one is recording."""
+    run = getattr(_local, "run", None)
+    return _NO_SPAN if run is None else run.span(name)
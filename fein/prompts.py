@@ -0,0 +1,134 @@
+"""AI prompt templates for the "Generate AI Prompt" page.
+
+Each model's template is a Markdown file in ``prompt_templates/`` with
+``{title}``, ``{description}``, ``{tech}`` and ``{difficulty}`` fields. The
+files are read and compiled once per process; a template's version is a
+hash of its text, so editing a file never serves prompts cached from the
+old one. Generated prompts are memoized per catalog version, project,
+model and template version, and :func:`export_prompts` writes the prompts
+for a whole result set in one pass.
+"""
+import hashlib
+import json
+import os
+import string
+import threading
+from dataclasses import dataclass
+
+from fein.cache import LRUCache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "prompt_templates")
+# Display name -> (template file, where to paste the prompt).
+MODELS = {
+    "Gemini (Google)": ("gemini.md", "https://gemini.google.com/"),
+    "ChatGPT (OpenAI)": ("chatgpt.md", "https://chat.openai.com/"),
+    "Llama 3 (Meta)": ("llama3.md", "https://llama.meta.com/"),
+}
+PROMPT_CACHE_SIZE = 2048
+EXPORT_CHUNK_SIZE = 64
+
+prompt_cache = LRUCache(maxsize=PROMPT_CACHE_SIZE)
+
+
+def _fields(project):
+    return {
+        "title": project.title,
+        "description": project.description,
+        "tech": ", ".join(project.tech),
+        "difficulty": project.difficulty,
+    }
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A template split once into literal text and field names."""
+    model: str
+    link: str
+    version: str
+    parts: tuple
+
+    @classmethod
+    def compile(cls, model, link, text):
+        parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if spec or conversion:
+                raise ValueError(f"{model} template: format specs are not supported ({{{field}}})")
+            parts.append((literal, field))
+        version = hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+        return cls(model, link, version, tuple(parts))
+
+    def render(self, project):
+        fields = _fields(project)
+        return "".join(literal + (fields[field] if field is not None else "") for literal, field in self.parts)
+
+
+_templates = None
+_templates_lock = threading.Lock()
+
+
+def load_templates(directory=TEMPLATE_DIR):
+    """``{model: PromptTemplate}`` read from ``directory``."""
+    templates = {}
+    for model, (filename, link) in MODELS.items():
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            templates[model] = PromptTemplate.compile(model, link, f.read().rstrip("\n"))
+    return templates
+
+
+def prompt_templates():
+    """The compiled templates, loaded on first use and shared by all sessions."""
+    global _templates
+    if _templates is None:
+        with _templates_lock:
+            if _templates is None:
+                _templates = load_templates()
+    return _templates
+
+
+def generate_prompt(catalog, pid, model, cache=prompt_cache):
+    """The ``model`` prompt for project ``pid``, memoized."""
+    template = prompt_templates()[model]
+    pid = int(pid)
+    key = (catalog.version, pid, model, template.version)
+    return cache.get_or_compute(key, lambda: template.render(catalog.project(pid)))
+
+
+def _render_chunk(catalog, ids, templates):
+    # Rendered directly: a bulk export would otherwise flush the prompts
+    # interactive sessions are reusing out of the shared cache.
+    lines = []
+    for pid in ids:
+        project = catalog.project(pid)
+        for template in templates:
+            record = {
+                "id": project.id,
+                "title": project.title,
+                "model": template.model,
+                "prompt": template.render(project),
+            }
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+    return "".join(lines)
+
+
+def export_prompts(catalog, ids, out, models=None):
+    """Write one JSON line per (project, model) for every id in ``ids`` to ``out``.
+
+    ``out`` is a path or a text file object. Prompts are rendered and
+    written a chunk at a time, in id order; returns the number of prompts
+    written. Rendering is pure-Python string work, so it runs in one loop:
+    threads only contend for the GIL.
+    """
+    models = list(models or MODELS)
+    unknown = [model for model in models if model not in MODELS]
+    if unknown:
+        raise ValueError(f"Unknown models: {', '.join(unknown)}")
+    templates = [prompt_templates()[model] for model in models]
+    ids = [int(pid) for pid in ids]
+    chunks = [ids[i:i + EXPORT_CHUNK_SIZE] for i in range(0, len(ids), EXPORT_CHUNK_SIZE)]
+
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, "w", encoding="utf-8") as f:
+            return export_prompts(catalog, ids, f, models)
+    for chunk in chunks:
+        out.write(_render_chunk(catalog, chunk, templates))
+    return len(ids) * len(models)
@@ -0,0 +1,140 @@
+"""The sidebar filters as one value, and their evaluation against a catalog.
+
+Results are read a page at a time: :func:`query_page` (and the discover
+feed in :mod:`fein.discover`) return ``(ids, next_cursor)`` where the cursor
+is the offset of the next page in the (shared, cached) id sequence, so a
+session only needs to keep its cursor, never a result list.
+"""
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from fein.cache import LRUCache
+from fein.facets import facet_columns
+from fein.fuzzy import spell_index
+from fein.ranking import ranking_model, warm_ranking_model
+from fein.search_index import TOKEN_RE, search_index
+
+# Shared by every session: popular queries, "Load More" clicks and returning
+# from the AI prompt page all reuse the same id array.
+RESULT_CACHE_SIZE = 1024
+RESULT_CACHE_TTL = 15 * 60
+result_cache = LRUCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+PAGE_SIZE = 10
+
+
+@dataclass(frozen=True)
+class ProjectQuery:
+    """Search box text, difficulty range and the three advanced filters."""
+    topic: str = ''
+    difficulty_range: tuple = (1, 4)
+    tech: tuple = ()
+    dataset: str = ''
+    keywords: str = ''
+
+    @classmethod
+    def from_filters(cls, topic, difficulty_range, tech_filter, dataset_filter, keywords_filter):
+        # Every text filter is case-insensitive and the tech filter is an
+        # "any of", so case and selection order don't change the result.
+        return cls(
+            topic=(topic or '').lower(),
+            difficulty_range=tuple(int(level) for level in difficulty_range),
+            tech=tuple(sorted(set(tech_filter or ()))),
+            dataset=(dataset_filter or '').lower(),
+            keywords=(keywords_filter or '').lower(),
+        )
+
+
+def filter_ids(catalog, query):
+    """Ids of the projects matching ``query``, in catalog order."""
+    columns = facet_columns(catalog)
+    mask = columns.difficulty_mask(*query.difficulty_range)
+    if query.topic:
+        mask &= columns.ids_mask(search_index(catalog).substring(query.topic))
+    if query.tech:
+        mask &= columns.tech_mask(query.tech)
+    if query.dataset:
+        mask &= columns.dataset_mask(query.dataset)
+    if query.keywords:
+        mask &= columns.keyword_mask(query.keywords)
+    return np.flatnonzero(mask)
+
+
+def cached_filter_ids(catalog, query, cache=result_cache):
+    """:func:`filter_ids` through the shared result cache.
+
+    Keys combine the catalog version with the normalized query, so a catalog
+    reload never serves stale ids. Cached arrays are read-only.
+    """
+    def compute():
+        ids = filter_ids(catalog, query).astype(np.int32)
+        ids.setflags(write=False)
+        return ids
+
+    return cache.get_or_compute((catalog.version, query), compute)
+
+
+def corrected_query(catalog, query):
+    """``query`` with misspelled topic words replaced, or ``None`` if none were.
+
+    A word counts as misspelled when no indexed word starts with it; it is
+    replaced by the closest vocabulary word within the edit bound of
+    :mod:`fein.fuzzy`.
+    """
+    if not query.topic:
+        return None
+    index = search_index(catalog)
+    spelling = spell_index(catalog)
+
+    def correct(match):
+        word = match.group(0)
+        if index.expand_prefix(word):
+            return word
+        return spelling.suggest(word) or word
+
+    topic = TOKEN_RE.sub(correct, query.topic)
+    return replace(query, topic=topic) if topic != query.topic else None
+
+
+def resolve_query(catalog, query):
+    """``(query, ids)`` for the search, falling back to a spelling-corrected topic.
+
+    The exact (substring) search always wins; only when it finds nothing is
+    the corrected query tried, and it is returned only if it finds something.
+    """
+    ids = cached_filter_ids(catalog, query)
+    if not len(ids):
+        corrected = corrected_query(catalog, query)
+        if corrected is not None:
+            corrected_ids = cached_filter_ids(catalog, corrected)
+            if len(corrected_ids):
+                return corrected, corrected_ids
+    return query, ids
+
+
+def page(ids, cursor=0, size=PAGE_SIZE):
+    """``(ids[cursor:cursor + size], next_cursor)``; ``next_cursor`` is ``None`` after the last page."""
+    cursor = int(cursor or 0)
+    end = min(cursor + size, len(ids))
+    return ids[cursor:end], (end if end < len(ids) else None)
+
+
+def query_page(catalog, query, cursor=0, size=PAGE_SIZE, ranked=False, wait=True):
+    """One page of the projects matching ``query``.
+
+    With ``ranked``, matches are ordered by relevance to ``query.topic``;
+    only the prefix up to the end of the page is ranked. With ``wait=False``
+    they stay in catalog order until the ranking model has been built in
+    the background (started here if it wasn't yet).
+    """
+    ids = cached_filter_ids(catalog, query)
+    if not (ranked and query.topic):
+        return page(ids, cursor, size)
+    model = ranking_model(catalog) if wait else catalog.built("ranking_model")
+    if model is None:
+        warm_ranking_model(catalog)
+        return page(ids, cursor, size)
+    cursor = int(cursor or 0)
+    end = min(cursor + size, len(ids))
+    top = model.top_k(ids, query.topic, end)
+    return np.array(top[cursor:end], dtype=np.int32), (end if end < len(ids) else None)
@@ -0,0 +1,196 @@
+"""BM25 relevance ranking for topic searches.
+
+Each catalog version gets one precomputed sparse matrix of BM25 term weights
+(projects x terms). The title, keyword, tech and description fields are
+scored separately and summed with ``FIELD_WEIGHTS``. Scoring a query sums a
+handful of matrix columns, and a heap keeps only the ``k`` best matches, so
+showing the first page never sorts the whole result set.
+
+Building the model imports scikit-learn and fits the whole catalog, so the
+app starts it on a background thread (:func:`warm_ranking_model`) rather
+than on the first relevance search.
+"""
+import bisect
+import heapq
+import logging
+import threading
+
+import numpy as np
+
+from fein.segments import overlay_rows
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {"title": 3.0, "keywords": 2.0, "tech": 1.5, "description": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Upper bound on vocabulary terms a single partial word may expand to.
+MAX_PREFIX_TERMS = 50
+# Single-character tokens matter here ("C", "R"), unlike scikit-learn's default pattern.
+TOKEN_PATTERN = r"(?u)\b\w+\b"
+
+
+def _field_text(project, field):
+    value = getattr(project, field)
+    return " ".join(value) if isinstance(value, tuple) else value
+
+
+def _average_length(counts):
+    lengths = np.asarray(counts.sum(axis=1)).ravel()
+    return lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+
+
+def _bm25_weights(counts, idf, k1, b, average):
+    """BM25-saturated, IDF-weighted copy of a CSR term-count matrix."""
+    lengths = np.asarray(counts.sum(axis=1)).ravel()
+    row_lengths = np.repeat(lengths, np.diff(counts.indptr))
+    tf = counts.data
+    weights = counts.copy()
+    weights.data = (idf[counts.indices] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * row_lengths / average))).astype(np.float32)
+    return weights
+
+
+class RankingModel:
+    """Precomputed BM25 weights for one catalog version.
+
+    A model patched for a few changed projects (:meth:`patched`) keeps the
+    base matrix and overrides their rows with ``overlay`` rows, weighted
+    with the base IDF and field lengths.
+    """
+
+    def __init__(self, matrix, vocabulary, analyzer, idf=None, averages=None, weights=None, k1=BM25_K1, b=BM25_B,
+                 size=None, overlay_ids=None, overlay=None):
+        self._matrix = matrix
+        self._vocabulary = vocabulary
+        self._terms = sorted(vocabulary)
+        self._analyzer = analyzer
+        self._idf = idf
+        self._averages = averages
+        self._weights = weights
+        self._k1 = k1
+        self._b = b
+        self._size = matrix.shape[0] if size is None else size
+        self._overlay_ids = overlay_ids
+        self._overlay = overlay
+
+    @classmethod
+    def from_catalog(cls, catalog, weights=None, k1=BM25_K1, b=BM25_B):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        weights = weights or FIELD_WEIGHTS
+        projects = list(catalog.projects())
+        texts = {field: [_field_text(project, field) for project in projects] for field in weights}
+
+        vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, dtype=np.float32)
+        vectorizer.fit(text for field_texts in texts.values() for text in field_texts)
+        counts = {field: vectorizer.transform(field_texts).tocsr() for field, field_texts in texts.items()}
+
+        # Document frequency counts a term once per project, whichever field it is in.
+        present = sum(counts.values()).tocsr()
+        present.data[:] = 1
+        document_frequency = np.asarray(present.sum(axis=0)).ravel()
+        n = len(projects)
+        idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        averages = {field: _average_length(counts[field]) for field in weights}
+        matrix = sum(weight * _bm25_weights(counts[field], idf, k1, b, averages[field]) for field, weight in weights.items())
+        return cls(matrix.tocsc(), vectorizer.vocabulary_, vectorizer.build_analyzer(), idf, averages, weights, k1, b)
+
+    def patched(self, catalog, ids):
+        """This model with the projects ``ids`` re-weighted from ``catalog``.
+
+        IDF and average field lengths stay as they were until the model is
+        next built from scratch; words the model has never seen get an IDF
+        from their frequency among the patched projects.
+        """
+        from scipy import sparse
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        ids = np.asarray(ids, dtype=np.int32)
+        projects = [catalog.project(pid) for pid in ids.tolist()]
+        texts = {field: [_field_text(project, field) for project in projects] for field in self._weights}
+        vocabulary = dict(self._vocabulary)
+        new_terms = {}
+        for words in zip(*(texts.values())):
+            for term in set(self._analyzer(" ".join(words))) - vocabulary.keys():
+                new_terms[term] = new_terms.get(term, 0) + 1
+        idf = self._idf
+        if new_terms:
+            first = len(vocabulary)
+            vocabulary.update((term, first + i) for i, term in enumerate(sorted(new_terms)))
+            frequency = np.array([new_terms[term] for term in sorted(new_terms)], dtype=np.float64)
+            n = catalog.live_count
+            idf = np.concatenate([idf, np.log1p((n - frequency + 0.5) / (frequency + 0.5))])
+
+        vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, dtype=np.float32, vocabulary=vocabulary)
+        rows = sum(
+            weight * _bm25_weights(vectorizer.transform(texts[field]).tocsr(), idf, self._k1, self._b, self._averages[field])
+            for field, weight in self._weights.items()
+        ).tocsr()
+        previous = self._overlay
+        if previous is not None and previous.shape[1] < len(vocabulary):
+            previous = sparse.csr_matrix((previous.data, previous.indices, previous.indptr),
+                                         shape=(previous.shape[0], len(vocabulary)))
+        overlay_ids, overlay = overlay_rows(
+            self._overlay_ids, previous, ids, rows, lambda blocks: sparse.vstack(blocks, format="csr"),
+        )
+        return RankingModel(
+            self._matrix, vocabulary, self._analyzer, idf, self._averages, self._weights, self._k1, self._b,
+            size=catalog.project_count, overlay_ids=overlay_ids, overlay=overlay,
+        )
+
+    def query_terms(self, text):
+        """Column ids for the words of ``text``; unknown words expand as prefixes."""
+        columns = set()
+        for word in self._analyzer(text):
+            column = self._vocabulary.get(word)
+            if column is not None:
+                columns.add(column)
+                continue
+            start = bisect.bisect_left(self._terms, word)
+            for term in self._terms[start:start + MAX_PREFIX_TERMS]:
+                if not term.startswith(word):
+                    break
+                columns.add(self._vocabulary[term])
+        return sorted(columns)
+
+    def scores(self, text):
+        """BM25 score of every project for ``text``."""
+        columns = self.query_terms(text)
+        if not columns:
+            return np.zeros(self._size, dtype=np.float32)
+        # Words added by patches only have overlay columns.
+        scores = np.asarray(self._matrix[:, [c for c in columns if c < self._matrix.shape[1]]].sum(axis=1)).ravel()
+        if self._overlay_ids is None:
+            return scores
+        patched = np.zeros(self._size, dtype=scores.dtype)
+        patched[:len(scores)] = scores
+        patched[self._overlay_ids] = np.asarray(self._overlay[:, columns].sum(axis=1)).ravel()
+        return patched
+
+    def top_k(self, ids, text, k):
+        """The ``k`` best-scoring ``ids`` for ``text``, best first; ties keep catalog order."""
+        scores = self.scores(text)
+        return heapq.nlargest(k, (int(pid) for pid in ids), key=lambda pid: (scores[pid], -pid))
+
+
+def ranking_model(catalog):
+    """The :class:`RankingModel` for ``catalog``, built once per catalog version."""
+    return catalog.derived("ranking_model", RankingModel.from_catalog)
+
+
+def warm_ranking_model(catalog):
+    """Build the model of ``catalog`` on a daemon thread, once per catalog version."""
+
+    def warm(catalog):
+        def run():
+            try:
+                ranking_model(catalog)
+            except Exception:
+                logger.exception("Could not build the ranking model for catalog %s", catalog.version)
+
+        thread = threading.Thread(target=run, name="ranking-model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    return catalog.derived("ranking_model_warmup", warm)
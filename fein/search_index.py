@@ -0,0 +1,283 @@
+"""Inverted n-gram index for the topic search box.
+
+``search_text_match`` below is the original per-project check: a
+case-insensitive substring test over the title, description, tech stack and
+keywords. :class:`SearchIndex` answers the same question for the whole
+catalog at once: candidate ids come from intersecting the posting lists of
+the query's trigrams, and only those candidates get the substring check.
+A token index over the same fields adds prefix matching ("tensor" finds
+"TensorFlow").
+
+Everything is held in flat arrays (a UTF-8 text blob plus CSR posting
+lists), so a compiled catalog can map the index straight from disk.
+"""
+import bisect
+import re
+
+import numpy as np
+
+from fein.segments import SegmentedStore
+
+GRAM_SIZE = 3
+# Joins the searchable fields of one project; never typed into a search box,
+# so a query can't match across two fields.
+FIELD_SEPARATOR = "\x00"
+TOKEN_RE = re.compile(r"\w+")
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def search_text_match(project, search_text):
+    if not search_text:
+        return True
+    search_text_lower = search_text.lower()
+    return (
+        search_text_lower in project.title.lower() or
+        search_text_lower in project.description.lower() or
+        any(search_text_lower in tech.lower() for tech in project.tech) or
+        any(search_text_lower in kw.lower() for kw in project.keywords)
+    )
+
+
+def searchable_text(project):
+    """Lower-cased haystack covering exactly the fields ``search_text_match`` reads."""
+    fields = [project.title, project.description, *project.tech, *project.keywords]
+    return FIELD_SEPARATOR.join(text.lower() for text in fields)
+
+
+def _grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _intersect(postings):
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for ids in postings[1:]:
+        if not len(result):
+            break
+        result = np.intersect1d(result, ids, assume_unique=True)
+    return result
+
+
+def _csr(postings):
+    """Sorted keys plus CSR offsets/ids for a ``{key: [id, ...]}`` dict."""
+    keys = sorted(postings)
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(postings[key]) for key in keys], out=offsets[1:])
+    ids = np.fromiter((pid for key in keys for pid in postings[key]), dtype=np.int32, count=int(offsets[-1]))
+    return keys, offsets, ids
+
+
+class SearchIndex:
+    """Trigram and token posting lists over every project's searchable text.
+
+    ``texts`` is a bytes-like object with a ``find`` method (``bytes`` or an
+    ``mmap``) holding each project's lower-cased UTF-8 text, delimited by
+    ``text_offsets``. Grams and tokens are sorted keys whose posting lists
+    are slices of ``*_ids`` given by ``*_offsets``.
+    """
+
+    def __init__(self, texts, text_offsets, grams, gram_offsets, gram_ids, tokens, token_offsets, token_ids):
+        self._texts = texts
+        self._text_offsets = text_offsets
+        self.grams = grams
+        self._gram_slots = {gram: slot for slot, gram in enumerate(grams)}
+        self._gram_offsets = gram_offsets
+        self._gram_ids = gram_ids
+        self.tokens = tokens
+        self._token_slots = {token: slot for slot, token in enumerate(tokens)}
+        self._token_offsets = token_offsets
+        self._token_ids = token_ids
+
+    @classmethod
+    def build(cls, texts):
+        blob = bytearray()
+        text_offsets = [0]
+        grams = {}
+        tokens = {}
+        for pid, text in enumerate(texts):
+            for gram in _grams(text):
+                if FIELD_SEPARATOR not in gram:
+                    grams.setdefault(gram, []).append(pid)
+            for token in set(TOKEN_RE.findall(text)):
+                tokens.setdefault(token, []).append(pid)
+            blob += text.encode("utf-8")
+            text_offsets.append(len(blob))
+        # Ids are appended in increasing order, so every posting list is sorted.
+        return cls(bytes(blob), np.array(text_offsets, dtype=np.int64), *_csr(grams), *_csr(tokens))
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        if isinstance(catalog.store, SegmentedStore):
+            return SegmentedSearchIndex(catalog.store)
+        return cls.build(searchable_text(project) for project in catalog.projects())
+
+    def arrays(self):
+        """The flat arrays behind the index, for writing it to disk."""
+        return {
+            "text_offsets": self._text_offsets,
+            "gram_offsets": self._gram_offsets,
+            "gram_ids": self._gram_ids,
+            "token_offsets": self._token_offsets,
+            "token_ids": self._token_ids,
+        }
+
+    @property
+    def texts(self):
+        return self._texts
+
+    def __len__(self):
+        return len(self._text_offsets) - 1
+
+    def all_ids(self):
+        return np.arange(len(self), dtype=np.int32)
+
+    def token_frequencies(self):
+        """Number of projects containing each of :attr:`tokens`."""
+        return np.diff(self._token_offsets).tolist()
+
+    def _gram_postings(self, gram):
+        slot = self._gram_slots.get(gram)
+        if slot is None:
+            return None
+        return self._gram_ids[self._gram_offsets[slot]:self._gram_offsets[slot + 1]]
+
+    def _token_postings(self, token):
+        slot = self._token_slots[token]
+        return self._token_ids[self._token_offsets[slot]:self._token_offsets[slot + 1]]
+
+    def _bounds(self):
+        # Python ints index ``find`` far faster than NumPy scalars do.
+        bounds = self.__dict__.get("_bounds_list")
+        if bounds is None:
+            bounds = self.__dict__["_bounds_list"] = self._text_offsets.tolist()
+        return bounds
+
+    def _scan(self, needle):
+        """Every project containing ``needle``, found by walking the text blob."""
+        find = self._texts.find
+        bounds = self._bounds()
+        matches = []
+        position = find(needle)
+        while position != -1:
+            pid = bisect.bisect_right(bounds, position) - 1
+            end = bounds[pid + 1]
+            # A match running past ``end`` straddles two projects; any later
+            # match starting in this project would too, so move on either way.
+            if position + len(needle) <= end:
+                matches.append(pid)
+            position = find(needle, end)
+        return np.array(matches, dtype=np.int32)
+
+    def _matching(self, needle, candidates):
+        find = self._texts.find
+        bounds = self._bounds()
+        return np.array([pid for pid in candidates if find(needle, bounds[pid], bounds[pid + 1]) != -1], dtype=np.int32)
+
+    def substring(self, query):
+        """Sorted ids of projects for which ``search_text_match(project, query)`` holds."""
+        if not query:
+            return self.all_ids()
+        needle = query.lower()
+        if FIELD_SEPARATOR in needle:
+            return _EMPTY
+        encoded = needle.encode("utf-8")
+        if len(needle) < GRAM_SIZE:
+            return self._scan(encoded)
+        postings = []
+        for gram in _grams(needle):
+            ids = self._gram_postings(gram)
+            if ids is None:
+                return _EMPTY
+            postings.append(ids)
+        return self._matching(encoded, _intersect(postings).tolist())
+
+    def expand_prefix(self, prefix):
+        """Indexed tokens starting with ``prefix`` (already lower-cased)."""
+        start = bisect.bisect_left(self.tokens, prefix)
+        end = bisect.bisect_left(self.tokens, prefix + "\U0010ffff")
+        return self.tokens[start:end]
+
+    def prefix(self, query):
+        """Sorted ids of projects where every query word starts some indexed word."""
+        words = TOKEN_RE.findall(query.lower())
+        if not words:
+            return self.all_ids()
+        postings = []
+        for word in set(words):
+            matches = [self._token_postings(token) for token in self.expand_prefix(word)]
+            if not matches:
+                return _EMPTY
+            postings.append(matches[0] if len(matches) == 1 else np.unique(np.concatenate(matches)))
+        return _intersect(postings)
+
+
+def _segment_index(segment):
+    return SearchIndex.build(searchable_text(project) for project in segment.store)
+
+
+class SegmentedSearchIndex:
+    """One :class:`SearchIndex` per segment of a patched catalog.
+
+    Each segment's index is built once, when the segment is created, and
+    shared by every later catalog version containing it. Matches are mapped
+    to global ids and kept only where the segment still holds the current
+    version of the project. ``tokens`` and their frequencies still count
+    superseded versions until the next compaction.
+    """
+
+    def __init__(self, store):
+        self._owner = store.owner
+        self._live = store.live_ids
+        self._segments = [
+            (number, segment.ids, segment.derived("search_index", _segment_index))
+            for number, segment in enumerate(store.segments)
+        ]
+
+    def __len__(self):
+        return len(self._owner)
+
+    def all_ids(self):
+        return self._live()
+
+    def _merge(self, matches):
+        parts = []
+        for (number, ids, _index), local in zip(self._segments, matches):
+            found = ids[local]
+            parts.append(found[self._owner[found] == number])
+        return np.sort(np.concatenate(parts)) if parts else _EMPTY
+
+    def substring(self, query):
+        if not query:
+            return self.all_ids()
+        return self._merge([index.substring(query) for _, _, index in self._segments])
+
+    def prefix(self, query):
+        if not TOKEN_RE.findall(query.lower()):
+            return self.all_ids()
+        return self._merge([index.prefix(query) for _, _, index in self._segments])
+
+    def expand_prefix(self, prefix):
+        return sorted({token for _, _, index in self._segments for token in index.expand_prefix(prefix)})
+
+    def _vocabulary(self):
+        vocabulary = self.__dict__.get("_vocabulary_counts")
+        if vocabulary is None:
+            counts = {}
+            for _, _, index in self._segments:
+                for token, frequency in zip(index.tokens, index.token_frequencies()):
+                    counts[token] = counts.get(token, 0) + frequency
+            vocabulary = self.__dict__["_vocabulary_counts"] = dict(sorted(counts.items()))
+        return vocabulary
+
+    @property
+    def tokens(self):
+        return list(self._vocabulary())
+
+    def token_frequencies(self):
+        return list(self._vocabulary().values())
+
+
+def search_index(catalog):
+    """The :class:`SearchIndex` for ``catalog``, built once per catalog version."""
+    return catalog.derived("search_index", SearchIndex.from_catalog)
@@ -0,0 +1,428 @@
+"""Incremental catalog updates: patches applied as segments with tombstones.
+
+A patch adds, updates or removes a handful of projects::
+
+    {
+      "base": "eb05e0d15a54",                  catalog version it was written against
+      "add": [{"domain": "Web Development", "title": ..., "description": ...,
+               "tech": [...], "difficulty": "Beginner", "datasets": [...], "keywords": [...]}],
+      "update": [{"id": 42, "domain": ..., "title": ..., ...}],
+      "remove": [7, 8]
+    }
+
+Applying one never touches the projects it doesn't mention. The changed
+projects become a new, small *segment*: a :class:`~fein.store.ProjectStore`
+of their own plus the global ids its rows stand for. A :class:`SegmentedStore`
+stacks the segments on top of the base store and keeps, per id, which
+segment holds its current version (``-1`` once removed; the id stays
+reserved and reads back as an empty project). Updated projects keep their
+id and added ones get the next free ids, so ids never change between
+compactions.
+
+Derived structures follow along at the cost of the change: the search
+index is kept per segment, and the facet columns, BM25 model, spelling
+dictionary and semantic vectors already built for the previous version are
+patched rather than rebuilt (see :data:`PATCHERS`). Once there are more
+than :data:`MAX_DELTA_SEGMENTS` delta segments they are merged into one.
+
+Patches are saved as numbered files in ``projects_data.patches/`` so every
+server process picks them up (:class:`~fein.catalog.CatalogLoader` checks
+the directory on each request) and they survive restarts.
+``python -m fein compact`` folds them back into ``projects_data.json``.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from fein.store import Project, StoreBuilder
+
+logger = logging.getLogger(__name__)
+
+MAX_DELTA_SEGMENTS = 8
+# Past this share of the base catalog in delta segments, compaction is due.
+COMPACT_RATIO = 0.1
+PATCH_SUFFIX = ".json"
+_TEXT_FIELDS = ("title", "description", "difficulty")
+_LIST_FIELDS = ("tech", "datasets", "keywords")
+
+
+def patches_dir(json_path):
+    """``projects_data.json`` -> ``projects_data.patches``."""
+    return os.path.splitext(json_path)[0] + ".patches"
+
+
+@dataclass(frozen=True)
+class Patch:
+    """A validated patch: ``adds`` and ``updates`` hold ``(project, domain)`` pairs."""
+    base: str = None
+    adds: tuple = ()
+    updates: tuple = ()
+    removes: tuple = ()
+
+    @property
+    def size(self):
+        return len(self.adds) + len(self.updates) + len(self.removes)
+
+
+def _project(entry, where):
+    if not isinstance(entry, dict):
+        raise ValueError(f"{where}: expected a project object")
+    domain = entry.get("domain")
+    if not isinstance(domain, str) or not domain:
+        raise ValueError(f"{where}: missing domain")
+    for field in _TEXT_FIELDS:
+        if not isinstance(entry.get(field), str):
+            raise ValueError(f"{where}: {field} must be a string")
+    for field in _LIST_FIELDS:
+        values = entry.get(field, [])
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise ValueError(f"{where}: {field} must be a list of strings")
+    if entry.get("github_url") is not None and not isinstance(entry["github_url"], str):
+        raise ValueError(f"{where}: github_url must be a string")
+    project = {key: value for key, value in entry.items() if key not in ("id", "domain")}
+    return project, domain
+
+
+def parse_patch(data):
+    """Validate a patch document (a dict, or JSON text) into a :class:`Patch`."""
+    if isinstance(data, (str, bytes)):
+        try:
+            data = json.loads(data)
+        except ValueError as e:
+            raise ValueError(f"Patch is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("A patch is a JSON object with add, update and/or remove")
+    unknown = set(data) - {"base", "add", "update", "remove"}
+    if unknown:
+        raise ValueError(f"Unknown patch keys: {', '.join(sorted(unknown))}")
+    adds = tuple(_project(entry, f"add[{i}]") for i, entry in enumerate(data.get("add", [])))
+    updates = []
+    for i, entry in enumerate(data.get("update", [])):
+        if not isinstance(entry, dict) or not isinstance(entry.get("id"), int):
+            raise ValueError(f"update[{i}]: needs an integer id")
+        updates.append((entry["id"], *_project(entry, f"update[{i}]")))
+    removes = data.get("remove", [])
+    if not isinstance(removes, list) or not all(isinstance(pid, int) for pid in removes):
+        raise ValueError("remove must be a list of project ids")
+    touched = [pid for pid, _, _ in updates] + list(removes)
+    if len(set(touched)) != len(touched):
+        raise ValueError("A project id may appear only once per patch")
+    return Patch(base=data.get("base"), adds=adds, updates=tuple(updates), removes=tuple(removes))
+
+
+def patch_document(patch):
+    """The JSON-ready form of ``patch``, as accepted by :func:`parse_patch`."""
+    return {
+        "base": patch.base,
+        "add": [{"domain": domain, **project} for project, domain in patch.adds],
+        "update": [{"id": pid, "domain": domain, **project} for pid, project, domain in patch.updates],
+        "remove": list(patch.removes),
+    }
+
+
+def _blank_project(pid):
+    return Project(id=pid, domain="", title="", description="", tech=(), difficulty="", datasets=(), keywords=())
+
+
+class Segment:
+    """An immutable store plus the global ids of its rows."""
+
+    def __init__(self, store, ids):
+        self.store = store
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self._rows = None
+        self._derived = {}
+        self._lock = threading.RLock()
+
+    def row(self, pid):
+        if self._rows is None:
+            self._rows = {pid: row for row, pid in enumerate(self.ids.tolist())}
+        return self._rows[pid]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def derived(self, name, build):
+        """Like :meth:`fein.catalog.Catalog.derived`, for structures over this segment's rows."""
+        value = self._derived.get(name)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = build(self)
+        return value
+
+
+class BaseSegment(Segment):
+    """The compiled/parsed catalog as segment 0; row ``i`` is id ``i``."""
+
+    def __init__(self, store):
+        super().__init__(store, np.arange(len(store), dtype=np.int32))
+
+    def row(self, pid):
+        return pid
+
+
+class SegmentedStore:
+    """Read-only store over a base segment and delta segments.
+
+    ``owner[pid]`` is the index of the segment holding the current version
+    of ``pid``, or ``-1`` for a removed project.
+    """
+
+    def __init__(self, segments, owner, base_version, patch_count=0):
+        self.segments = segments
+        self.owner = owner
+        self.base_version = base_version
+        self.patch_count = patch_count
+
+    @classmethod
+    def from_base(cls, store, version, search_index=None):
+        base = BaseSegment(store)
+        if search_index is not None:
+            base._derived["search_index"] = search_index
+        return cls([base], np.zeros(len(store), dtype=np.int16), version)
+
+    def __len__(self):
+        return len(self.owner)
+
+    def is_live(self, pid):
+        return 0 <= pid < len(self.owner) and self.owner[pid] >= 0
+
+    def live_ids(self):
+        return np.flatnonzero(self.owner >= 0).astype(np.int32)
+
+    def project(self, pid):
+        pid = int(pid)
+        segment = self.owner[pid]
+        if segment < 0:
+            return _blank_project(pid)
+        store = self.segments[segment]
+        return store.store.project(store.row(pid))._replace(id=pid)
+
+    def __iter__(self):
+        for pid in range(len(self)):
+            yield self.project(pid)
+
+    @property
+    def domain_names(self):
+        names = {}
+        for segment in self.segments:
+            names.update(dict.fromkeys(segment.store.domain_names))
+        return list(names)
+
+    @property
+    def delta_size(self):
+        return sum(len(segment) for segment in self.segments[1:])
+
+    @property
+    def nbytes(self):
+        return self.owner.nbytes + sum(segment.store.nbytes for segment in self.segments)
+
+
+def _segment_store(entries):
+    builder = StoreBuilder()
+    for project, domain in entries:
+        builder.add(project, domain)
+    return builder.build()
+
+
+def _merge_deltas(segments, owner):
+    # Current versions from every delta segment, rewritten as one segment.
+    ids = np.flatnonzero(owner > 0).astype(np.int32)
+    store = SegmentedStore(segments, owner, None)
+    entries = []
+    for pid in ids.tolist():
+        project = store.project(pid)
+        record = {"title": project.title, "description": project.description, "difficulty": project.difficulty,
+                  "tech": list(project.tech), "datasets": list(project.datasets), "keywords": list(project.keywords)}
+        if project.github_url:
+            record["github_url"] = project.github_url
+        entries.append((record, project.domain))
+    merged = Segment(_segment_store(entries), ids)
+    owner = owner.copy()
+    owner[ids] = 1
+    return [segments[0], merged], owner
+
+
+@dataclass(frozen=True)
+class Changes:
+    """What a patch did, for patching derived structures."""
+    parent: object
+    catalog: object
+    # Every id whose project changed (updated, added or removed), sorted.
+    ids: np.ndarray
+    added: np.ndarray
+    removed: np.ndarray
+
+
+def apply_patch(catalog, patch):
+    """A new :class:`~fein.catalog.Catalog` with ``patch`` applied, plus its :class:`Changes`.
+
+    Raises ``LookupError`` when an updated or removed id isn't in the catalog.
+    """
+    store = catalog.store
+    if not isinstance(store, SegmentedStore):
+        store = SegmentedStore.from_base(store, catalog.version, catalog.built("search_index"))
+    for pid in [pid for pid, _, _ in patch.updates] + list(patch.removes):
+        if not store.is_live(pid):
+            raise LookupError(f"No project with id {pid}")
+
+    first_new = len(store)
+    added = np.arange(first_new, first_new + len(patch.adds), dtype=np.int32)
+    updated = np.array([pid for pid, _, _ in patch.updates], dtype=np.int32)
+    removed = np.array(sorted(patch.removes), dtype=np.int32)
+    segments = list(store.segments)
+    owner = np.concatenate([store.owner, np.full(len(added), -1, dtype=np.int16)])
+    entries = [(project, domain) for _, project, domain in patch.updates] + list(patch.adds)
+    if entries:
+        segments.append(Segment(_segment_store(entries), np.concatenate([updated, added])))
+        owner[np.concatenate([updated, added])] = len(segments) - 1
+    owner[removed] = -1
+    if len(segments) - 1 > MAX_DELTA_SEGMENTS:
+        segments, owner = _merge_deltas(segments, owner)
+
+    patched_store = SegmentedStore(segments, owner, store.base_version, store.patch_count + 1)
+    if patched_store.delta_size > COMPACT_RATIO * max(len(segments[0]), 1):
+        logger.warning("Delta segments hold %d projects; run `python -m fein compact` to fold them in",
+                       patched_store.delta_size)
+    digest = hashlib.sha1(catalog.version.encode())
+    digest.update(json.dumps(patch_document(patch), sort_keys=True).encode("utf-8"))
+    patched = replace(catalog, version=digest.hexdigest()[:12], store=patched_store)
+    changes = Changes(
+        parent=catalog, catalog=patched,
+        ids=np.unique(np.concatenate([updated, added, removed])), added=added, removed=removed,
+    )
+    _patch_derived(changes)
+    return patched, changes
+
+
+def overlay_rows(ids, rows, new_ids, new_rows, stack):
+    """Replacement rows by id, ``(ids, rows)``, updated with ``(new_ids, new_rows)``.
+
+    Used by the derived structures that patch a per-project matrix: they
+    keep the base matrix and these few rows overriding it. ``stack`` joins
+    two row blocks (``np.vstack`` or ``scipy.sparse.vstack``).
+    """
+    new_ids = np.asarray(new_ids, dtype=np.int32)
+    if ids is None or not len(ids):
+        ids, rows = new_ids, new_rows
+    else:
+        kept = np.flatnonzero(~np.isin(ids, new_ids))
+        ids = np.concatenate([ids[kept], new_ids])
+        rows = stack([rows[kept], new_rows])
+    order = np.argsort(ids, kind="stable")
+    return ids[order], rows[order]
+
+
+def _patch_derived(changes):
+    for name, patcher in PATCHERS.items():
+        previous = changes.parent.built(name)
+        if previous is not None:
+            changes.catalog.provide(name, patcher(previous, changes))
+
+
+def _patch_facet_columns(columns, changes):
+    return columns.patched(changes.catalog.store, changes.ids, changes.parent.store)
+
+
+def _patch_ranking_model(model, changes):
+    return model.patched(changes.catalog, changes.ids)
+
+
+def _patch_spell_index(spelling, changes):
+    from fein.search_index import TOKEN_RE, searchable_text
+
+    words = {}
+    for pid in changes.ids.tolist():
+        for word in set(TOKEN_RE.findall(searchable_text(changes.catalog.project(pid)))):
+            words[word] = words.get(word, 0) + 1
+    return spelling.extended(words)
+
+
+def _patch_semantic_index(index, changes):
+    return index.patched(changes.catalog, changes.ids)
+
+
+# Derived structures that can follow a patch instead of being rebuilt. The
+# search index needs no entry: it is built per segment (see SegmentedSearchIndex).
+PATCHERS = {
+    "facet_columns": _patch_facet_columns,
+    "ranking_model": _patch_ranking_model,
+    "spell_index": _patch_spell_index,
+    "semantic_index": _patch_semantic_index,
+}
+
+
+def list_patches(json_path):
+    """Patch file names in ``projects_data.patches/``, in the order they apply."""
+    try:
+        names = os.listdir(patches_dir(json_path))
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if name.endswith(PATCH_SUFFIX) and not name.startswith("."))
+
+
+def read_patch(json_path, name):
+    with open(os.path.join(patches_dir(json_path), name), encoding="utf-8") as f:
+        return parse_patch(f.read())
+
+
+def write_patch(json_path, patch):
+    """Save ``patch`` as the next numbered file; returns its name."""
+    directory = patches_dir(json_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".patch-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(patch_document(patch), f, ensure_ascii=False)
+        os.chmod(tmp, 0o644)
+        while True:
+            existing = list_patches(json_path)
+            number = int(existing[-1].split(".")[0]) + 1 if existing else 1
+            name = f"{number:06d}{PATCH_SUFFIX}"
+            try:
+                # link() fails if another writer took this number first.
+                os.link(tmp, os.path.join(directory, name))
+                return name
+            except FileExistsError:
+                continue
+    finally:
+        os.unlink(tmp)
+
+
+def remove_patches(json_path, names):
+    for name in names:
+        try:
+            os.unlink(os.path.join(patches_dir(json_path), name))
+        except FileNotFoundError:
+            pass
+
+
+def compact(catalog, output):
+    """Write every current project of ``catalog`` to ``output`` as one JSON catalog.
+
+    Runs of projects from the same domain share a group, so projects keep
+    their order; the gaps left by removed projects close up.
+    """
+    groups = []
+    for pid in catalog.live_ids().tolist():
+        project = catalog.project(pid)
+        record = {"title": project.title, "description": project.description, "tech": list(project.tech),
+                  "difficulty": project.difficulty, "datasets": list(project.datasets), "keywords": list(project.keywords)}
+        if project.github_url:
+            record["github_url"] = project.github_url
+        if not groups or groups[-1]["domain"] != project.domain:
+            groups.append({"domain": project.domain, "projects": []})
+        groups[-1]["projects"].append(record)
+    tmp = f"{output}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(groups, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, output)
+    return sum(len(group["projects"]) for group in groups)
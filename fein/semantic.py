@@ -0,0 +1,351 @@
+"""Semantic similarity: "related projects" and free-text meaning search.
+
+Every project's title, description, keywords, tech stack and domain are
+embedded once per catalog version: TF-IDF weights reduced with a truncated
+SVD (latent semantic analysis) to :data:`VECTOR_DIMENSIONS` dimensions,
+stored as one L2-normalized float32 matrix. Similarity is then a single
+matrix-vector product followed by a partial sort for the top ``k``.
+
+Queries are encoded with the stored vocabulary, IDF weights and SVD
+components alone, so only building the index needs scikit-learn. Catalogs
+of :data:`ANN_MIN_PROJECTS` or more also get an inverted-file partition
+(k-means cells over the vectors); a query then scores only the projects in
+its :data:`ANN_PROBES` nearest cells instead of the whole matrix.
+
+Patched catalogs (:mod:`fein.segments`) re-encode just the changed
+projects into a small overlay on top of the existing vectors.
+
+The index is saved inside the compiled catalog build of its version, so
+``python -m fein.semantic [projects_data.json]`` can build it ahead of
+deployment. The app never waits for it: :func:`warm_semantic_index` loads
+or builds it on a background thread when a catalog version comes into
+service, and :func:`related_projects` finds nothing until it is ready.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from fein.catalog_build import compiled_dir
+from fein.ranking import TOKEN_PATTERN
+from fein.segments import SegmentedStore, overlay_rows
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIMENSIONS = 128
+MAX_FEATURES = 50_000
+# Below this an exact scan over every vector is cheap enough.
+ANN_MIN_PROJECTS = 100_000
+ANN_PROBES = 8
+RELATED_COUNT = 5
+INDEX_DIR = "semantic"
+_ARRAYS = ("idf", "components", "vectors", "centroids", "cell_offsets", "cell_ids")
+_TOKEN_RE = re.compile(TOKEN_PATTERN)
+
+
+def semantic_text(project):
+    # "PyTorch (Open Source)" -> "PyTorch": the licence kind says nothing about the topic.
+    tech = [name.split(" (")[0] for name in project.tech]
+    return " ".join([project.title, project.description, *project.keywords, *tech, project.domain])
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return (matrix / norms).astype(np.float32)
+
+
+def _partition(vectors, seed=0):
+    """k-means cells over ``vectors``, as centroids plus CSR member lists."""
+    from sklearn.cluster import MiniBatchKMeans
+
+    cells = max(1, int(np.sqrt(len(vectors))))
+    kmeans = MiniBatchKMeans(n_clusters=cells, batch_size=4096, n_init=1, random_state=seed).fit(vectors)
+    order = np.argsort(kmeans.labels_, kind="stable").astype(np.int32)
+    offsets = np.zeros(cells + 1, dtype=np.int64)
+    np.cumsum(np.bincount(kmeans.labels_, minlength=cells), out=offsets[1:])
+    return _normalize(kmeans.cluster_centers_), offsets, order
+
+
+class SemanticIndex:
+    """Project vectors plus what's needed to embed a query into the same space."""
+
+    def __init__(self, terms, idf, components, vectors, centroids=None, cell_offsets=None, cell_ids=None,
+                 size=None, overlay_ids=None, overlay=None):
+        self.terms = list(terms)
+        self._vocabulary = {term: column for column, term in enumerate(self.terms)}
+        self._idf = idf
+        self._components = components
+        self.vectors = vectors
+        self._centroids = centroids
+        self._cell_offsets = cell_offsets
+        self._cell_ids = cell_ids
+        # Projects changed by patches since the vectors were built, and their new vectors.
+        self.size = len(vectors) if size is None else size
+        self._overlay_ids = overlay_ids
+        self._overlay = overlay
+
+    @classmethod
+    def from_catalog(cls, catalog, dimensions=VECTOR_DIMENSIONS, ann_min_projects=ANN_MIN_PROJECTS):
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(
+            token_pattern=TOKEN_PATTERN, stop_words="english", sublinear_tf=True,
+            max_features=MAX_FEATURES, dtype=np.float32,
+        )
+        try:
+            tfidf = vectorizer.fit_transform(semantic_text(project) for project in catalog.projects())
+        except ValueError:
+            # Empty catalog, or nothing but stop words.
+            return cls([], np.zeros(0, np.float32), np.zeros((0, 0), np.float32),
+                       np.zeros((catalog.project_count, 0), np.float32))
+        terms = vectorizer.get_feature_names_out().tolist()
+        dimensions = min(dimensions, len(terms) - 1, tfidf.shape[0] - 1)
+        if dimensions >= 2:
+            svd = TruncatedSVD(n_components=dimensions, random_state=0)
+            vectors = svd.fit_transform(tfidf)
+            components = svd.components_.astype(np.float32)
+        else:
+            # Too few projects or terms to reduce; compare the TF-IDF vectors directly.
+            vectors = tfidf.toarray()
+            components = np.eye(len(terms), dtype=np.float32)
+        vectors = _normalize(vectors)
+        partition = _partition(vectors) if len(vectors) >= ann_min_projects else (None, None, None)
+        return cls(terms, vectorizer.idf_.astype(np.float32), components, vectors, *partition)
+
+    def patched(self, catalog, ids):
+        """This index with the projects ``ids`` re-encoded from ``catalog``.
+
+        New and changed projects are embedded with the existing vocabulary
+        and components; removed ones get a zero vector and never match.
+        """
+        ids = np.asarray(ids, dtype=np.int32)
+        rows = np.zeros((len(ids), self._components.shape[0]), dtype=np.float32)
+        for row, pid in enumerate(ids.tolist()):
+            rows[row] = self.encode(semantic_text(catalog.project(pid)))
+        overlay_ids, overlay = overlay_rows(self._overlay_ids, self._overlay, ids, rows, np.vstack)
+        return SemanticIndex(
+            self.terms, self._idf, self._components, self.vectors, self._centroids, self._cell_offsets, self._cell_ids,
+            size=catalog.project_count, overlay_ids=overlay_ids, overlay=overlay,
+        )
+
+    @property
+    def partitioned(self):
+        return self._centroids is not None
+
+    def encode(self, text):
+        """The unit vector for ``text``; all zeros when none of its words are known."""
+        counts = {}
+        for word in _TOKEN_RE.findall(text.lower()):
+            column = self._vocabulary.get(word)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        query = np.zeros(self._components.shape[0], dtype=np.float32)
+        if not counts:
+            return query
+        columns = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self._idf[columns]
+        weights /= np.linalg.norm(weights)
+        query = self._components[:, columns] @ weights
+        return _normalize(query)
+
+    def _candidates(self, query, probes):
+        if not self.partitioned:
+            return None
+        cells = np.argsort(-(self._centroids @ query), kind="stable")[:probes]
+        candidates = np.concatenate([self._cell_ids[self._cell_offsets[c]:self._cell_offsets[c + 1]] for c in cells])
+        if self._overlay_ids is not None:
+            # Patched projects aren't in any cell; they are few, so always score them.
+            candidates = np.union1d(candidates, self._overlay_ids)
+        return candidates
+
+    def _overlay_slots(self, ids):
+        slots = np.searchsorted(self._overlay_ids, ids).clip(max=len(self._overlay_ids) - 1)
+        return slots, self._overlay_ids[slots] == ids
+
+    def _scores(self, ids, query):
+        if self._overlay_ids is None or not len(self._overlay_ids):
+            return self.vectors[ids] @ query
+        scores = np.zeros(len(ids), dtype=np.float32)
+        base = ids < len(self.vectors)
+        scores[base] = self.vectors[ids[base]] @ query
+        slots, patched = self._overlay_slots(ids)
+        scores[patched] = self._overlay[slots[patched]] @ query
+        return scores
+
+    def vector(self, pid):
+        if self._overlay_ids is not None and len(self._overlay_ids):
+            slots, patched = self._overlay_slots(np.array([pid]))
+            if patched[0]:
+                return self._overlay[slots[0]]
+        return self.vectors[pid] if pid < len(self.vectors) else np.zeros(self.vectors.shape[1], dtype=np.float32)
+
+    def nearest(self, query, k, exclude=None, ids=None, probes=ANN_PROBES):
+        """The ``k`` projects most similar to unit vector ``query``, as ``[(id, score)]``.
+
+        ``ids`` restricts the search to those projects (always scanned
+        exactly); otherwise a partitioned index probes ``probes`` cells.
+        Ties keep catalog order.
+        """
+        if k <= 0 or not query.any():
+            return []
+        candidates = ids if ids is not None else self._candidates(query, probes)
+        if candidates is None:
+            # Exact scan: one product over the whole matrix, no gathered copy.
+            candidates = np.arange(self.size, dtype=np.int32)
+            scores = self.vectors @ query
+            if self._overlay_ids is not None:
+                scores = np.concatenate([scores, np.zeros(self.size - len(scores), dtype=scores.dtype)])
+                scores[self._overlay_ids] = self._overlay @ query
+        else:
+            candidates = np.asarray(candidates)
+            scores = self._scores(candidates, query)
+        if exclude is not None:
+            scores[candidates == exclude] = -np.inf
+        if k < len(candidates):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(int(candidates[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def related(self, pid, k=RELATED_COUNT, ids=None):
+        """Projects most like project ``pid``, excluding itself."""
+        return self.nearest(self.vector(pid), k, exclude=pid, ids=ids)
+
+    def search(self, text, k, ids=None):
+        """Projects closest in meaning to free text ``text``."""
+        return self.nearest(self.encode(text), k, ids=ids)
+
+    def arrays(self):
+        arrays = {"idf": self._idf, "components": self._components, "vectors": self.vectors}
+        if self.partitioned:
+            arrays.update(centroids=self._centroids, cell_offsets=self._cell_offsets, cell_ids=self._cell_ids)
+        return arrays
+
+
+def _index_dir(catalog, version=None):
+    primary = catalog.path if isinstance(catalog.path, (str, os.PathLike)) else catalog.path[0]
+    return os.path.join(compiled_dir(primary), version or catalog.version, INDEX_DIR)
+
+
+def save(index, directory):
+    """Write ``index`` to ``directory`` atomically; the parent must exist."""
+    parent = os.path.dirname(directory)
+    staging = tempfile.mkdtemp(prefix=f".{INDEX_DIR}-", dir=parent)
+    try:
+        os.chmod(staging, 0o755)
+        for name, array in index.arrays().items():
+            np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+        with open(os.path.join(staging, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(index.terms, f, ensure_ascii=False)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # Another process already saved this version's index.
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def load(directory):
+    """The index saved in ``directory``, memory-mapped; ``None`` if there is none."""
+    try:
+        with open(os.path.join(directory, "terms.json"), encoding="utf-8") as f:
+            terms = json.load(f)
+        arrays = {}
+        for name in _ARRAYS:
+            path = os.path.join(directory, f"{name}.npy")
+            if os.path.exists(path):
+                arrays[name] = np.load(path, mmap_mode="r", allow_pickle=False)
+    except (OSError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logger.warning("Ignoring unreadable semantic index %s: %s", directory, e)
+        return None
+    return SemanticIndex(terms, **arrays)
+
+
+def _load_or_build(catalog):
+    store = catalog.store
+    if isinstance(store, SegmentedStore):
+        # A patched catalog starts from the saved index of its base version.
+        base = load(_index_dir(catalog, store.base_version))
+        if base is not None:
+            return base.patched(catalog, np.flatnonzero(store.owner != 0))
+    directory = _index_dir(catalog)
+    index = load(directory)
+    if index is not None:
+        return index
+    started = time.perf_counter()
+    index = SemanticIndex.from_catalog(catalog)
+    logger.info("Built semantic index for %s (%d projects) in %.1f ms",
+                catalog.version, catalog.project_count, (time.perf_counter() - started) * 1000)
+    # Persist next to the compiled build of this version, if there is one.
+    if os.path.isdir(os.path.dirname(directory)):
+        try:
+            save(index, directory)
+        except OSError as e:
+            logger.warning("Could not save semantic index to %s: %s", directory, e)
+    return index
+
+
+def semantic_index(catalog):
+    """The :class:`SemanticIndex` for ``catalog``, built or loaded once per catalog version."""
+    return catalog.derived("semantic_index", _load_or_build)
+
+
+def warm_semantic_index(catalog):
+    """Load or build the index of ``catalog`` on a daemon thread, once per catalog version."""
+
+    def warm(catalog):
+        def run():
+            try:
+                semantic_index(catalog)
+            except Exception:
+                logger.exception("Could not build the semantic index for catalog %s", catalog.version)
+
+        thread = threading.Thread(target=run, name="semantic-index-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    return catalog.derived("semantic_index_warmup", warm)
+
+
+def related_projects(catalog, pid, k=RELATED_COUNT):
+    """Ids of the ``k`` projects most similar to ``pid``, most similar first.
+
+    Never waits for the index: empty until :func:`warm_semantic_index` (started
+    here if it wasn't yet) has it ready.
+    """
+    index = catalog.built("semantic_index")
+    if index is None:
+        warm_semantic_index(catalog)
+        return []
+    return [other for other, _score in index.related(pid, k)]
+
+
+def main(argv=None):
+    from fein.catalog import DEFAULT_CATALOG_PATH, CatalogLoader
+
+    parser = argparse.ArgumentParser(description="Build the semantic index of a compiled catalog ahead of time.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_CATALOG_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    catalog = CatalogLoader(args.path, compiled=True).get()
+    index = semantic_index(catalog)
+    print(f"{_index_dir(catalog)}: {len(index.vectors)} vectors x {index.vectors.shape[1]} dimensions, "
+          f"{'partitioned' if index.partitioned else 'exact'} search")
+
+
+if __name__ == "__main__":
+    main()
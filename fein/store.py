@@ -0,0 +1,245 @@
+"""Compact, struct-of-arrays storage for the project catalog.
+
+The raw JSON repeats the same tech names, dataset names, keywords, domains
+and difficulty labels thousands of times. :class:`ProjectStore` keeps one
+interned copy of each distinct value and refers to it by integer id:
+
+* titles and descriptions live in UTF-8 blobs addressed by an offsets array
+  (:class:`StringTable`);
+* domain and difficulty are one code per project (:class:`EncodedValues`);
+* tech, datasets and keywords are CSR-style id lists (:class:`EncodedLists`).
+
+:class:`Project` records are materialized on demand for the handful of
+projects a page actually shows.
+"""
+import sys
+from array import array
+from typing import NamedTuple
+
+import numpy as np
+
+
+class Project(NamedTuple):
+    """One catalog project; ``id`` is its position in the store."""
+    id: int
+    domain: str
+    title: str
+    description: str
+    tech: tuple
+    difficulty: str
+    datasets: tuple
+    keywords: tuple
+    github_url: str = None
+
+
+class StringTable:
+    """Immutable sequence of strings stored as one UTF-8 blob plus offsets."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self):
+        return self.blob.nbytes + self.offsets.nbytes
+
+
+class EncodedValues:
+    """One dictionary-encoded value per project."""
+
+    def __init__(self, vocabulary, codes):
+        self.vocabulary = vocabulary
+        self.codes = codes
+
+    def __getitem__(self, i):
+        return self.vocabulary[self.codes[i]]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+
+class EncodedLists:
+    """A list of dictionary-encoded values per project, in CSR layout."""
+
+    def __init__(self, vocabulary, offsets, values):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.values = values
+
+    def ids(self, i):
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        vocabulary = self.vocabulary
+        return tuple(vocabulary[v] for v in self.ids(i).tolist())
+
+    def postings(self):
+        """``{value: sorted unique project ids}`` for every vocabulary entry in use."""
+        n = max(len(self.offsets) - 1, 1)
+        rows = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))
+        # Sorting value * n + row groups rows by value, keeps them in id order
+        # and drops a value repeated within one project.
+        keys = np.unique(self.values.astype(np.int64) * n + rows)
+        values, projects = np.divmod(keys, n)
+        bounds = np.flatnonzero(np.diff(values)) + 1
+        return {
+            self.vocabulary[int(group[0])]: ids.astype(np.int32)
+            for group, ids in zip(np.split(values, bounds), np.split(projects, bounds))
+            if len(group)
+        }
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.values.nbytes
+
+
+class _StringTableBuilder:
+    def __init__(self):
+        self._blob = bytearray()
+        self._offsets = array("q", [0])
+
+    def append(self, value):
+        self._blob += value.encode("utf-8")
+        self._offsets.append(len(self._blob))
+
+    def build(self):
+        return StringTable(np.frombuffer(bytes(self._blob), dtype=np.uint8), np.frombuffer(self._offsets, dtype=np.int64).copy())
+
+
+class _Encoder:
+    def __init__(self):
+        self.ids = {}
+        self.vocabulary = []
+
+    def encode(self, value):
+        code = self.ids.get(value)
+        if code is None:
+            value = sys.intern(value)
+            code = self.ids[value] = len(self.vocabulary)
+            self.vocabulary.append(value)
+        return code
+
+
+class ProjectStore:
+    """All projects of one catalog version in columnar form."""
+
+    def __init__(self, titles, descriptions, domain, difficulty, tech, datasets, keywords, github_urls=None):
+        self.titles = titles
+        self.descriptions = descriptions
+        self.domain = domain
+        self.difficulty = difficulty
+        self.tech = tech
+        self.datasets = datasets
+        self.keywords = keywords
+        # Optional and rare, so kept sparse.
+        self.github_urls = github_urls or {}
+
+    def __len__(self):
+        return len(self.titles)
+
+    def project(self, pid):
+        pid = int(pid)
+        return Project(
+            id=pid,
+            domain=self.domain[pid],
+            title=self.titles[pid],
+            description=self.descriptions[pid],
+            tech=self.tech[pid],
+            difficulty=self.difficulty[pid],
+            datasets=self.datasets[pid],
+            keywords=self.keywords[pid],
+            github_url=self.github_urls.get(pid),
+        )
+
+    def __iter__(self):
+        for pid in range(len(self)):
+            yield self.project(pid)
+
+    @property
+    def domain_names(self):
+        return self.domain.vocabulary
+
+    @property
+    def nbytes(self):
+        """Approximate size of the arrays, excluding the (small) vocabularies."""
+        return sum(column.nbytes for column in (
+            self.titles, self.descriptions, self.domain, self.difficulty, self.tech, self.datasets, self.keywords,
+        ))
+
+
+class StoreBuilder:
+    """Accumulates project dicts into a :class:`ProjectStore`.
+
+    Values are encoded as they arrive, so only the compact form is kept while
+    a catalog is being read.
+    """
+
+    _LIST_FIELDS = ("tech", "datasets", "keywords")
+
+    def __init__(self):
+        self._titles = _StringTableBuilder()
+        self._descriptions = _StringTableBuilder()
+        self._domain = _Encoder()
+        self._domain_codes = array("h")
+        self._difficulty = _Encoder()
+        self._difficulty_codes = array("h")
+        self._lists = {field: (_Encoder(), array("q", [0]), array("i")) for field in self._LIST_FIELDS}
+        self._github_urls = {}
+
+    def __len__(self):
+        return len(self._domain_codes)
+
+    def add(self, project, domain):
+        pid = len(self._domain_codes)
+        self._titles.append(project['title'])
+        self._descriptions.append(project['description'])
+        self._domain_codes.append(self._domain.encode(domain))
+        self._difficulty_codes.append(self._difficulty.encode(project['difficulty']))
+        for field, (encoder, offsets, values) in self._lists.items():
+            values.extend(encoder.encode(value) for value in project.get(field, []))
+            offsets.append(len(values))
+        if project.get('github_url'):
+            self._github_urls[pid] = project['github_url']
+        return pid
+
+    def build(self):
+        def codes(encoded):
+            return np.frombuffer(encoded, dtype=np.int16).copy()
+
+        def lists(field):
+            encoder, offsets, values = self._lists[field]
+            return EncodedLists(
+                list(encoder.vocabulary),
+                np.frombuffer(offsets, dtype=np.int64).copy(),
+                np.frombuffer(values, dtype=np.int32).copy(),
+            )
+
+        return ProjectStore(
+            titles=self._titles.build(),
+            descriptions=self._descriptions.build(),
+            domain=EncodedValues(list(self._domain.vocabulary), codes(self._domain_codes)),
+            difficulty=EncodedValues(list(self._difficulty.vocabulary), codes(self._difficulty_codes)),
+            tech=lists("tech"),
+            datasets=lists("datasets"),
+            keywords=lists("keywords"),
+            github_urls=dict(self._github_urls),
+        )
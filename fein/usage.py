@@ -0,0 +1,314 @@
+"""Append-only usage event log, aggregated as it is written.
+
+Sessions :meth:`~EventLog.record` searches, card clicks and prompt
+generations. Recording only appends to an in-memory list; a daemon thread
+writes the pending events to a JSON-lines file in batches (one ``flock``-ed
+append per batch, so several server processes can share the file) and
+folds them into a :class:`UsageStats`. The aggregates are maintained
+online, never by re-reading the log: per-minute counts over a rolling
+window, and bounded top-N tables (the Space-Saving algorithm) of topics,
+filter combinations, tech filters and projects.
+
+The most frequent filter combinations double as the warm-up list for the
+shared query result cache; see :func:`warm_result_cache`.
+
+``FEIN_USAGE_LOG`` sets the log path (``off`` keeps aggregates in memory
+only).
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG = "usage_events.jsonl"
+EVENT_KINDS = ("search", "card_click", "prompt")
+WINDOW_MINUTES = 24 * 60
+TOP_CAPACITY = 500
+# Beyond this many unwritten events (a full disk, say) new ones are dropped.
+MAX_QUEUED = 10_000
+# How much of an existing log is replayed into the aggregates at start-up.
+REPLAY_BYTES = 16 * 1024 * 1024
+MAX_TOPIC_LENGTH = 100
+WARMUP_QUERIES = 20
+
+
+class TopK:
+    """Approximate heavy hitters in bounded memory (Space-Saving).
+
+    Keeps at most ``capacity`` keys. A new key arriving when full replaces
+    the least frequent one and inherits its count, so counts of rare keys
+    may be overestimated but the frequent ones are always kept.
+    """
+
+    def __init__(self, capacity=TOP_CAPACITY):
+        self.capacity = capacity
+        self._counts = {}
+
+    def add(self, key, count=1):
+        if key in self._counts or len(self._counts) < self.capacity:
+            self._counts[key] = self._counts.get(key, 0) + count
+            return
+        evicted = min(self._counts, key=self._counts.get)
+        self._counts[key] = self._counts.pop(evicted) + count
+
+    def top(self, n):
+        return Counter(self._counts).most_common(n)
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class UsageStats:
+    """Rolling per-minute counts and top-N tables, updated one batch at a time."""
+
+    def __init__(self, window_minutes=WINDOW_MINUTES, capacity=TOP_CAPACITY):
+        self.window_minutes = window_minutes
+        self._lock = threading.Lock()
+        self._minutes = deque()
+        self.totals = Counter()
+        self.topics = TopK(capacity)
+        self.filters = TopK(capacity)
+        self.tech = TopK(capacity)
+        self.projects = TopK(capacity)
+        self.prompts = TopK(capacity)
+
+    def add(self, events):
+        with self._lock:
+            for event in events:
+                self._add(event)
+
+    def _add(self, event):
+        kind = event.get("kind")
+        minute = int(event.get("ts", 0) // 60)
+        # Replayed and batched events arrive roughly in order; older ones go in their own bucket.
+        if not self._minutes or self._minutes[-1][0] < minute:
+            self._minutes.append((minute, Counter()))
+        bucket = next((counts for start, counts in reversed(self._minutes) if start <= minute), None)
+        if bucket is not None:
+            bucket[kind] += 1
+        while self._minutes and self._minutes[0][0] <= self._minutes[-1][0] - self.window_minutes:
+            self._minutes.popleft()
+
+        self.totals[kind] += 1
+        if kind == "search":
+            filters = event.get("filters") or {}
+            if filters.get("topic"):
+                self.topics.add(filters["topic"])
+            # The sort order doesn't change which ids get cached.
+            self.filters.add(json.dumps({key: value for key, value in filters.items() if key != "sort"}, sort_keys=True))
+            for tech in filters.get("tech", ()):
+                self.tech.add(tech)
+        # Ids are only meaningful within the id space they were logged in (see fein.catalog.Catalog.id_space).
+        elif kind == "card_click":
+            self.projects.add((event.get("id_space"), event.get("id")))
+        elif kind == "prompt":
+            self.prompts.add((event.get("id_space"), event.get("id"), event.get("model")))
+
+    def rolling(self, minutes, now=None):
+        """Event counts by kind over the last ``minutes`` minutes."""
+        since = int((time.time() if now is None else now) // 60) - minutes
+        with self._lock:
+            counts = Counter()
+            for start, bucket in self._minutes:
+                if start > since:
+                    counts.update(bucket)
+            return counts
+
+    def timeline(self, minutes, now=None):
+        """``{kind: [count per minute]}`` for the last ``minutes`` minutes, oldest first."""
+        end = int((time.time() if now is None else now) // 60)
+        with self._lock:
+            buckets = dict(self._minutes)
+        return {
+            kind: [buckets.get(minute, {}).get(kind, 0) for minute in range(end - minutes + 1, end + 1)]
+            for kind in EVENT_KINDS
+        }
+
+    def top(self, table, n=10):
+        with self._lock:
+            return getattr(self, table).top(n)
+
+    def warmup_filters(self, n=WARMUP_QUERIES):
+        """The ``n`` most searched filter combinations, as recorded dicts."""
+        return [json.loads(key) for key, _count in self.top("filters", n)]
+
+
+class EventLog:
+    """Batched, asynchronous writer of usage events; see the module docstring."""
+
+    def __init__(self, path, stats=None, flush_interval=2.0, max_pending=200):
+        self.path = path
+        self.stats = stats or UsageStats()
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []
+        self._unwritten = []
+        self._stopped = False
+        self._thread = None
+        self.replayed = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="usage-log-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self.flush()
+        # Stopped early (e.g. before its files go away): nothing left for exit.
+        atexit.unregister(self.stop)
+
+    def _run(self):
+        try:
+            self.replay()
+        finally:
+            self.replayed.set()
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def record(self, kind, **fields):
+        """Queue one event; never blocks on I/O."""
+        event = {"ts": round(time.time(), 3), "kind": kind, **fields}
+        with self._lock:
+            if len(self._pending) + len(self._unwritten) >= MAX_QUEUED:
+                self.dropped += 1
+                return
+            self._pending.append(event)
+            pending = len(self._pending)
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def replay(self):
+        """Fold the tail of an existing log into the aggregates, once at start-up.
+
+        Afterwards only this process's own events are added; other processes
+        appending to the same file show up at the next start.
+        """
+        if not self.path:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - REPLAY_BYTES))
+                if size > REPLAY_BYTES:
+                    f.readline()  # partial first line
+                events = []
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning("Could not replay usage log %s: %s", self.path, e)
+            return
+        self.stats.add(events)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                unwritten, self._unwritten = self._unwritten, []
+            self.stats.add(batch)
+            unwritten += batch
+            if not unwritten or not self.path:
+                return
+            payload = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in unwritten)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    f.write(payload)
+            except OSError as e:
+                logger.warning("Could not append to usage log %s: %s", self.path, e)
+                with self._lock:
+                    # Already aggregated; only the write is retried.
+                    self._unwritten = unwritten + self._unwritten
+
+
+def log_path_from_env():
+    path = os.environ.get("FEIN_USAGE_LOG", DEFAULT_LOG)
+    return None if path.strip().lower() in ("", "off", "0") else path
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def shared_event_log():
+    """The process-wide :class:`EventLog`, started on first use."""
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                _log = EventLog(log_path_from_env()).start()
+    return _log
+
+
+def search_filters(query, sort):
+    """The loggable form of a :class:`~fein.query.ProjectQuery` and sort order."""
+    return {
+        "topic": query.topic[:MAX_TOPIC_LENGTH],
+        "difficulty": list(query.difficulty_range),
+        "tech": list(query.tech),
+        "dataset": query.dataset[:MAX_TOPIC_LENGTH],
+        "keywords": query.keywords[:MAX_TOPIC_LENGTH],
+        "sort": sort,
+    }
+
+
+def warm_result_cache(catalog, log, n=WARMUP_QUERIES, replay_timeout=10.0):
+    """Compute the ids of the ``n`` most searched filter combinations for ``catalog``.
+
+    Runs once per catalog version, on a daemon thread, so the first session
+    after a (re)load finds popular searches already cached. Searches whose
+    text was cut to ``MAX_TOPIC_LENGTH`` when logged are skipped: no session
+    would ever ask for the truncated query.
+    """
+    from fein.query import ProjectQuery, cached_filter_ids
+
+    def warm(catalog):
+        def run():
+            log.replayed.wait(replay_timeout)
+            started = time.perf_counter()
+            queries = []
+            for filters in log.stats.warmup_filters(n):
+                try:
+                    if any(len(filters[key]) >= MAX_TOPIC_LENGTH for key in ("topic", "dataset", "keywords")):
+                        continue
+                    queries.append(ProjectQuery(
+                        filters["topic"], tuple(filters["difficulty"]), tuple(filters["tech"]),
+                        filters["dataset"], filters["keywords"],
+                    ))
+                except (KeyError, TypeError):
+                    continue
+            for query in queries:
+                cached_filter_ids(catalog, query)
+            logger.info("Warmed %d popular searches for catalog %s in %.1f ms",
+                        len(queries), catalog.version, (time.perf_counter() - started) * 1000)
+
+        thread = threading.Thread(target=run, name="result-cache-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    return catalog.derived("result_cache_warmup", warm)
@@ -0,0 +1,208 @@
+"""Global visit counter with pluggable, multi-process-safe persistence.
+
+Sessions bump an in-memory counter; a daemon thread flushes the pending
+increments to the backing store in batches, so page rendering never waits on
+disk I/O. Both stores increment atomically under a lock that is shared
+between server processes:
+
+* :class:`FileCounterStore` - the plain-integer ``global_visits.txt`` file,
+  guarded by ``flock``.
+* :class:`SQLiteCounterStore` - a single-row table in a WAL-mode database.
+
+``FEIN_VISIT_BACKEND`` (``file`` or ``sqlite``) and ``FEIN_VISIT_STORE``
+(its path) choose the store used by :func:`shared_visit_counter`.
+"""
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FILE_STORE = "global_visits.txt"
+DEFAULT_SQLITE_STORE = "global_visits.sqlite3"
+
+
+class FileCounterStore:
+    """Counter kept as a single integer in a text file."""
+
+    def __init__(self, path=DEFAULT_FILE_STORE):
+        self.path = path
+
+    @staticmethod
+    def _parse(text):
+        try:
+            return int(text.strip() or 0)
+        except ValueError:
+            return 0
+
+    def read(self):
+        try:
+            with open(self.path, "r") as f:
+                # add() truncates before it writes; a shared lock never sees that empty file.
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                return self._parse(f.read())
+        except FileNotFoundError:
+            return 0
+
+    def add(self, amount):
+        """Atomically add ``amount`` and return the new total."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            total = self._parse(f.read()) + amount
+            f.seek(0)
+            f.truncate()
+            f.write(str(total))
+            f.flush()
+            return total
+
+
+class SQLiteCounterStore:
+    """Counter kept in a WAL-mode SQLite database."""
+
+    def __init__(self, path=DEFAULT_SQLITE_STORE, name="global_visits"):
+        self.path = path
+        self.name = name
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def read(self):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM counters WHERE name = ?", (self.name,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+    def add(self, amount):
+        """Atomically add ``amount`` and return the new total."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    (self.name, amount),
+                )
+                return conn.execute("SELECT value FROM counters WHERE name = ?", (self.name,)).fetchone()[0]
+        finally:
+            conn.close()
+
+
+class BatchedVisitCounter:
+    """In-memory counter flushed to ``store`` by a background thread.
+
+    A flush happens every ``flush_interval`` seconds, or sooner once
+    ``max_pending`` increments have accumulated. Failed flushes keep their
+    increments pending for the next attempt.
+    """
+
+    def __init__(self, store, flush_interval=2.0, max_pending=50):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = 0
+        self._persisted = None
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="visit-counter-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self.flush()
+        # Stopped early (e.g. before its files go away): nothing left for exit.
+        atexit.unregister(self.stop)
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def increment(self, amount=1):
+        """Count ``amount`` visits and return the best-known total."""
+        with self._lock:
+            self._pending += amount
+            pending = self._pending
+        if pending >= self.max_pending:
+            self._wake.set()
+        return self.total()
+
+    def total(self):
+        """Last persisted total plus increments not flushed yet.
+
+        Only the very first call reads the store; later calls are in-memory.
+        """
+        if self._persisted is None:
+            try:
+                persisted = self.store.read()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Could not read global visit count: %s", e)
+                return self._pending
+            with self._lock:
+                if self._persisted is None:
+                    self._persisted = persisted
+        with self._lock:
+            return self._persisted + self._pending
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                amount = self._pending
+            try:
+                # A zero-sized add still refreshes the total written by other processes.
+                persisted = self.store.add(amount) if amount else self.store.read()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Could not update global visit count: %s", e)
+                return
+            # Only now do the increments move from pending to persisted, so total() never dips.
+            with self._lock:
+                self._pending -= amount
+                self._persisted = persisted
+
+
+def store_from_env():
+    backend = os.environ.get("FEIN_VISIT_BACKEND", "file").lower()
+    path = os.environ.get("FEIN_VISIT_STORE")
+    if backend == "sqlite":
+        return SQLiteCounterStore(path or DEFAULT_SQLITE_STORE)
+    if backend != "file":
+        raise ValueError(f"Unknown FEIN_VISIT_BACKEND {backend!r}; expected 'file' or 'sqlite'")
+    return FileCounterStore(path or DEFAULT_FILE_STORE)
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def shared_visit_counter():
+    """The process-wide :class:`BatchedVisitCounter`, started on first use."""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = BatchedVisitCounter(store_from_env()).start()
+    return _counter
@@ -2,13 +2,35 @@ import streamlit as st
 import time
 import json
 import random
-import pandas as pd
-import plotly.express as px
-import os
+import io
+from functools import partial
+import numpy as np
+
+from fein.admin import is_admin
+from fein.catalog import shared_loader
+from fein.cards import card_html
+from fein.discover import discover_feed
+from fein.export import FORMATS as EXPORT_FORMATS, iter_export, parquet_available
+from fein.facets import catalog_facets, live_facet_counts
+from fein.profiling import begin_run, current_run, end_run, metrics_text, mode_from, span
+from fein.prompts import MODELS as PROMPT_MODELS, export_prompts, generate_prompt, prompt_templates
+from fein.query import PAGE_SIZE, ProjectQuery, page, query_page, resolve_query
+from fein.ranking import warm_ranking_model
+from fein.semantic import related_projects, warm_semantic_index
+from fein.usage import search_filters, shared_event_log, warm_result_cache
+from fein.visits import shared_visit_counter
 
 # --- 1. SET PAGE CONFIG (MUST BE FIRST STREAMLIT COMMAND) ---
 st.set_page_config(layout="wide", page_title="FE!N", page_icon="✨")
 
+# --- PROFILING (timing spans per stage; off unless requested, see fein/profiling.py) ---
+# Admins open the app with ?admin=<FEIN_ADMIN_TOKEN> and may add ?profile=spans|cprofile|tracemalloc
+if is_admin(st.query_params.get("admin")):
+    st.session_state['is_admin'] = True
+IS_ADMIN = st.session_state.get('is_admin', False)
+st.session_state['profile_mode'] = mode_from(st.query_params.get("profile") if IS_ADMIN else None)
+begin_run("app", st.session_state['profile_mode'])
+
 # --- 2. GLOBAL STYLES & GRADIENT BACKGROUND ---
 st.markdown("""
     <style>
@@ -194,63 +216,38 @@ st.markdown("""
 
 # --- Lottie animations and associated functions removed ---
 
-# --- 4. PROJECT DATABASE (Loaded from JSON) ---
-PROJECT_DB = {}
-try:
-    with open("projects_data.json", "r") as f:
-        json_data = json.load(f)
-    
-    for entry in json_data:
-        domain = entry.get("domain")
-        projects = entry.get("projects", [])
-        if domain:
-            PROJECT_DB[domain] = projects
-
-except FileNotFoundError:
-    st.error("projects_data.json not found. Please create the file with your project data.")
-except json.JSONDecodeError:
-    st.error("Error decoding projects_data.json. Please check if the JSON is correctly formatted.")
-except Exception as e:
-    st.error(f"An unexpected error occurred while loading project data: {e}")
-
-if not PROJECT_DB:
-    st.warning("PROJECT_DB is empty. Please add projects to your projects_data.json file.")
-
-# --- 5. Utility Functions ---
-def search_text_match(project, search_text):
-    if not search_text:
-        return True
-    search_text_lower = search_text.lower()
-    return (
-        search_text_lower in project['title'].lower() or
-        search_text_lower in project['description'].lower() or
-        any(search_text_lower in tech.lower() for tech in project['tech']) or
-        any(search_text_lower in kw.lower() for kw in project.get('keywords', []))
-    )
-
-# --- GLOBAL VISIT COUNTER FUNCTIONS (File-based) ---
-GLOBAL_VISIT_COUNT_FILE = "global_visits.txt"
-
-def get_global_visit_count():
-    if not os.path.exists(GLOBAL_VISIT_COUNT_FILE):
-        return 0
-    try:
-        with open(GLOBAL_VISIT_COUNT_FILE, "r") as f:
-            count = int(f.read().strip())
-            return count
-    except (ValueError, FileNotFoundError):
-        return 0
-
-def increment_global_visit_count():
-    current_count = get_global_visit_count()
-    new_count = current_count + 1
+# --- 4. PROJECT DATABASE (Loaded from JSON, shared across sessions) ---
+# The first load runs in the background; until it finishes CATALOG is None and a preview is shown
+LOADER = shared_loader("projects_data.json")
+CATALOG = None
+with span("catalog"):
     try:
-        with open(GLOBAL_VISIT_COUNT_FILE, "w") as f:
-            f.write(str(new_count))
-        return new_count
+        CATALOG = LOADER.get_nowait()
+        if CATALOG is None and not LOADER.loading:
+            # The background load finished (or failed) right after starting
+            CATALOG = LOADER.get_nowait()
+
+    except FileNotFoundError:
+        st.error("projects_data.json not found. Please create the file with your project data.")
+    except json.JSONDecodeError:
+        st.error("Error decoding projects_data.json. Please check if the JSON is correctly formatted.")
     except Exception as e:
-        st.error(f"Could not update global visit count: {e}")
-        return current_count
+        st.error(f"An unexpected error occurred while loading project data: {e}")
+
+if (CATALOG is None and not LOADER.loading) or (CATALOG is not None and not CATALOG.live_count):
+    st.warning("The project catalog is empty. Please add projects to your projects_data.json file.")
+
+# --- GLOBAL VISIT COUNTER (batched, flushed off the render path; see fein/visits.py) ---
+VISIT_COUNTER = shared_visit_counter()
+
+# --- USAGE EVENTS (append-only log, aggregated online; see fein/usage.py) ---
+USAGE_LOG = shared_event_log()
+if CATALOG is not None:
+    # Once per catalog version: precompute the most searched filters in the background
+    warm_result_cache(CATALOG, USAGE_LOG)
+    # ...and load or build the relevance model and related-projects index off the script thread
+    warm_ranking_model(CATALOG)
+    warm_semantic_index(CATALOG)
 
 # --- 6. Session State Initialization ---
 if 'selected_project_for_ai' not in st.session_state:
@@ -268,11 +265,15 @@ if 'last_dataset_filter' not in st.session_state:
     st.session_state['last_dataset_filter'] = ''
 if 'last_keywords_filter' not in st.session_state:
     st.session_state['last_keywords_filter'] = ''
+if 'last_sort' not in st.session_state:
+    st.session_state['last_sort'] = 'Catalog order'
 
 # --- PER-SESSION VISIT COUNTER INITIALIZATION & INCREMENT ---
 if 'page_visits_this_session' not in st.session_state:
     st.session_state.page_visits_this_session = 0
-st.session_state.page_visits_this_session += 1
+# The rerun the loading preview triggers once the catalog is in is not a visit
+if not st.session_state.pop('catalog_ready_rerun', False):
+    st.session_state.page_visits_this_session += 1
 
 # --- PROJECT DISPLAY LIMIT INITIALIZATION ---
 if 'project_display_limit' not in st.session_state:
@@ -291,6 +292,9 @@ TESTIMONIALS = [
 
 
 
+DISCOVER_MIXES = {"Any project": None, "Balance domains": "domain", "Balance levels": "difficulty"}
+
+
 def animated_search(): 
     with st.sidebar:
         
@@ -329,6 +333,7 @@ def animated_search():
         tech_filter_value = st.session_state['last_tech_filter']
         dataset_filter_value = st.session_state['last_dataset_filter']
         keywords_filter_value = st.session_state['last_keywords_filter']
+        sort_value = st.session_state['last_sort']
 
         st.markdown(f"""
             <div style="display: flex; align-items: center; gap: 10px; margin-bottom: 20px;">
@@ -355,11 +360,15 @@ def animated_search():
         """, unsafe_allow_html=True)
 
         with st.expander("🔬 Advanced Filters"):
-            all_tech_options = sorted(list(set(tech for domain_projects in PROJECT_DB.values() for project in domain_projects for tech in project['tech'])))
+            with span("tech_options"):
+                all_tech_options = catalog_facets(CATALOG).tech_options if CATALOG is not None else []
             tech_filter_value = st.multiselect("Tech Stack Contains:", options=all_tech_options, default=tech_filter_value, key="tech_filter")
             dataset_filter_value = st.text_input("Dataset Keywords:", dataset_filter_value, placeholder="e.g., medical, finance, image", key="dataset_keyword")
             keywords_filter_value = st.text_input("Project Keywords:", keywords_filter_value, placeholder="e.g., real-time, generative, blockchain", key="project_keywords")
 
+        sort_options = ["Catalog order", "Relevance"]
+        sort_value = st.radio("↕️ Order results by:", sort_options, index=sort_options.index(sort_value), horizontal=True, key="sort_order", help="Relevance ranks matches against the search topic (title and keywords count most).")
+
         if st.button("🚀 Launch Search", type="primary", use_container_width=True):
             st.session_state['search_triggered'] = True
             st.session_state['project_display_limit'] = 10 # Reset limit for new search results
@@ -367,64 +376,219 @@ def animated_search():
             st.rerun() # Rerun to apply filters and reset limit immediately
         st.divider()
 
+        # The unfiltered feed: any project, or an even mix across domains or levels
+        st.radio("🎲 Discover feed:", list(DISCOVER_MIXES), horizontal=True, key="discover_mix", on_change=show_first_projects,
+                 help="How the random projects shown before a search are picked. The order stays the same for your whole visit.")
+
         # Update session state with current filter values
         st.session_state['last_topic'] = topic_value
         st.session_state['last_difficulty_range'] = difficulty_range_value
         st.session_state['last_tech_filter'] = tech_filter_value
         st.session_state['last_dataset_filter'] = dataset_filter_value
         st.session_state['last_keywords_filter'] = keywords_filter_value
+        st.session_state['last_sort'] = sort_value
         
-        return topic_value, difficulty_range_value, tech_filter_value, dataset_filter_value, keywords_filter_value
+        return topic_value, difficulty_range_value, tech_filter_value, dataset_filter_value, keywords_filter_value, sort_value
+
 
+CARDS_PER_ROW = 2
+# Cards kept on screen; older pages drop out so a deep "Load More" still only repaints this many
+MAX_RENDERED_PROJECTS = 50
 
-def display_project_cards(projects_to_render):
+
+def display_project_cards(source, fetch_page, total, facet_counts=None, corrected_topic=None):
     # Always display the main heading and introductory text
     st.markdown("<h2 style='color:#8CFFB5;'>✨ Explore Projects</h2>", unsafe_allow_html=True)
     st.markdown("<p style='color:#BBBBBB; font-size:1.1em;'>Discover innovative Computer Science projects across diverse domains.</p>", unsafe_allow_html=True)
 
     if st.session_state.get('search_triggered', False):
         st.markdown("<h3 style='color:#8CFFB5;'>Matching Projects</h3>", unsafe_allow_html=True)
-        if not projects_to_render:
+        if corrected_topic:
+            st.info(f"No exact matches for **{st.session_state.last_topic}**. Showing results for **{corrected_topic}** instead.")
+        if facet_counts and facet_counts['total']:
+            difficulty_summary = " · ".join(f"{label}: {count}" for label, count in facet_counts['difficulty'].items() if count)
+            top_domains = sorted(facet_counts['domains'].items(), key=lambda item: -item[1])[:3]
+            domain_summary = ", ".join(f"{domain} ({count})" for domain, count in top_domains)
+            st.caption(f"**{facet_counts['total']}** matching projects · {difficulty_summary} · Top domains: {domain_summary}")
+        if total:
+            display_results_export(source, fetch_page, total)
+            display_prompt_export(source, fetch_page, total)
+        if not total:
             st.info("No projects match your current criteria. Please adjust your filters or broaden your search!")
-    elif not projects_to_render:
+    elif not total:
         st.info("No projects available. Please add projects to your projects_data.json file.") # Fallback for empty DB
 
-    if projects_to_render: # Only proceed to display cards if there are projects
-        cols_per_row = 2
-        for i in range(0, len(projects_to_render), cols_per_row):
-            cols = st.columns(cols_per_row)
-            for j in range(cols_per_row):
-                if i + j < len(projects_to_render):
-                    project, domain = projects_to_render[i + j]
-                    with cols[j]:
-                        with st.container(border=False):
-                            st.markdown(f'<div class="project-card">', unsafe_allow_html=True)
-                            
-                            st.markdown(f'<p class="project-title">{project["title"]}</p>', unsafe_allow_html=True)
-                            st.markdown(f'<p class="project-description">{project["description"]}</p>', unsafe_allow_html=True)
-
-                            st.markdown('<div class="project-details">', unsafe_allow_html=True)
-                            st.markdown(f'<span>🌐 {domain}</span> <span>🧠 {project["difficulty"]}</span>', unsafe_allow_html=True)
-                            if project['tech']:
-                                st.markdown(f'<span>🛠️ {", ".join(project["tech"])}</span>', unsafe_allow_html=True)
-                            if project['datasets']:
-                                st.markdown(f'<span>📊 {", ".join(project["datasets"])}</span>', unsafe_allow_html=True)
-                            st.markdown('</div>', unsafe_allow_html=True)
-
-                            st.markdown('<div class="card-buttons">', unsafe_allow_html=True)
-                            if project.get('github_url'):
-                                st.link_button("View on GitHub", project['github_url'], help="Open GitHub repository in a new tab", type="secondary", use_container_width=False)
-                            
-                            if st.button("✨ Generate AI Prompt", key=f"ai_prompt_{project['title']}_{i+j}", use_container_width=False, type="primary"):
-                                st.session_state['selected_project_for_ai'] = project
-                                st.rerun()
-                            st.markdown('</div>', unsafe_allow_html=True)
-                            st.markdown('</div>', unsafe_allow_html=True)
+    if total: # Only proceed to display cards if there are projects
+        project_feed(source, fetch_page, total)
 
     st.markdown("<br><br>", unsafe_allow_html=True)
     display_testimonials()
 
 
+def display_results_export(source, fetch_page, total):
+    # The whole result set as a file; it is only built when the button is clicked, off the script thread, chunk by chunk
+    with st.expander(f"⬇️ Download all {total} matching projects"):
+        formats = [name for name in EXPORT_FORMATS if name != "parquet" or parquet_available()]
+        export_format = st.radio("Format:", formats, horizontal=True, format_func=str.upper, key="results_export_format")
+
+        def build_export():
+            export_ids, _ = fetch_page(0, total)
+            buffer = io.BytesIO()
+            for chunk in iter_export(source, export_ids, export_format):
+                buffer.write(chunk)
+            buffer.seek(0)
+            return buffer
+
+        st.download_button(f"⬇️ Download {export_format.upper()}", build_export, file_name=f"fein_projects.{export_format}",
+                           mime=EXPORT_FORMATS[export_format], on_click="ignore", key="download_results_export")
+
+
+def display_prompt_export(source, fetch_page, total):
+    # Prompts for the whole result set instead of clicking through each card; like the results file,
+    # only generated when the button is clicked, off the script thread
+    with st.expander(f"📦 Export AI prompts for all {total} matching projects"):
+        export_models = st.multiselect("Models:", list(PROMPT_MODELS), default=list(PROMPT_MODELS)[:1], key="prompt_export_models")
+
+        def build_export():
+            export_ids, _ = fetch_page(0, total)
+            buffer = io.StringIO()
+            export_prompts(source, export_ids, buffer, export_models)
+            return buffer.getvalue()
+
+        st.download_button(f"⬇️ Download {total * len(export_models)} prompts (JSONL)", build_export, file_name="fein_prompts.jsonl",
+                           mime="application/x-ndjson", on_click="ignore", key="download_prompt_export", disabled=not export_models)
+
+
+def load_more_projects(next_cursor):
+    st.session_state.project_display_limit = next_cursor + PAGE_SIZE
+
+
+def show_first_projects():
+    st.session_state.project_display_limit = PAGE_SIZE
+
+
+def project_ref(source, project_id):
+    # Ids are positions in one catalog version; (id space, id) tells when a reload has renumbered them (see fein/catalog.py)
+    return getattr(source, "id_space", None), int(project_id)
+
+
+def select_project_for_ai(project_ref, source="feed"):
+    st.session_state['selected_project_for_ai'] = project_ref
+    id_space, project_id = project_ref
+    USAGE_LOG.record("card_click", id=project_id, id_space=id_space, source=source)
+
+
+@st.fragment
+def project_feed(source, fetch_page, total):
+    # Runs as a fragment: "Load More" and card buttons repaint only the feed, not the sidebar and page around it
+    # fetch_page(cursor, size) -> (ids, next_cursor); only the ids on screen are ever materialized
+    limit = min(st.session_state.project_display_limit, total)
+    first = max(0, limit - MAX_RENDERED_PROJECTS)
+    first -= first % CARDS_PER_ROW
+    if first:
+        st.caption(f"Showing projects {first + 1}–{limit} of {total}; earlier pages are hidden.")
+        st.button("⬆️ Back to the first projects", key="show_first_projects", on_click=show_first_projects)
+
+    # A fragment-only rerun has no app run around it, so it records its own
+    fragment_run = current_run() is None and begin_run("feed", st.session_state.get('profile_mode'))
+
+    with span("feed_page"):
+        visible_ids, next_cursor = fetch_page(first, limit - first)
+        visible_projects = [source.project(project_id) for project_id in visible_ids]
+    for i in range(0, len(visible_projects), CARDS_PER_ROW):
+        cols = st.columns(CARDS_PER_ROW)
+        for j, project in enumerate(visible_projects[i:i + CARDS_PER_ROW]):
+            with cols[j]:
+                with span("cards"):
+                    st.markdown(card_html(source, project.id), unsafe_allow_html=True)
+                if project.github_url:
+                    st.link_button("View on GitHub", project.github_url, help="Open GitHub repository in a new tab", type="secondary", use_container_width=False)
+                # Keys and selection use the project id and its id space, so equal titles can't collide
+                # and a button painted before a reload can't open whichever project took its id
+                ref = project_ref(source, project.id)
+                if st.button("✨ Generate AI Prompt", key=f"ai_prompt_{ref[0]}_{ref[1]}", use_container_width=False, type="primary",
+                             on_click=select_project_for_ai, args=(ref,)):
+                    st.rerun()
+
+    # --- "Load More" Button Logic ---
+    if next_cursor is not None:
+        # Adjust button text to show how many will be loaded next
+        remaining_projects = total - next_cursor
+        button_text = f"Load {min(PAGE_SIZE, remaining_projects)} More Projects"
+        st.button(button_text, key="load_more_projects", use_container_width=True, type="secondary", on_click=load_more_projects, args=(next_cursor,))
+    else:
+        st.success("All projects loaded!")
+    if fragment_run:
+        end_run()
+
+
+# How often the loading preview checks whether the full catalog is in
+LOADING_POLL_SECONDS = 0.5
+
+
+@st.fragment(run_every=LOADING_POLL_SECONDS)
+def catalog_preview():
+    # Polls as a fragment: only the preview repaints while the catalog loads, so polls aren't counted as page visits
+    if not LOADER.loading:
+        # Loaded (or failed): one full rerun picks up the catalog
+        st.session_state['catalog_ready_rerun'] = True
+        st.rerun()
+    fragment_run = current_run() is None and begin_run("preview", st.session_state.get('profile_mode'))
+    st.info("Loading the full project catalog…")
+    try:
+        preview = LOADER.preview()
+        display_project_cards(preview, partial(page, np.arange(len(preview), dtype=np.int32)), len(preview))
+    except (OSError, ValueError):
+        pass
+    if fragment_run:
+        end_run()
+
+
+def display_admin_panel(summary):
+    with st.sidebar.expander("🛠️ Admin: performance"):
+        if summary is None:
+            st.caption("Profiling is off for this run. Add profile=spans, cprofile or tracemalloc to the URL.")
+        else:
+            st.caption(f"This run: **{summary['total_ms']:.1f} ms** ({summary['mode']})")
+            stages = sorted(summary['spans_ms'].items(), key=lambda item: -item[1])
+            st.table([{"stage": stage, "ms": round(ms, 2)} for stage, ms in stages])
+            for note in summary.get('notes', []):
+                st.warning(note)
+            if 'cprofile' in summary:
+                st.code(summary['cprofile'], language="text")
+            if 'allocations' in summary:
+                st.caption(f"Traced peak: {summary['traced_peak_kib']:.0f} KiB")
+                st.code("\n".join(summary['allocations']), language="text")
+        st.caption("Catalog loader")
+        st.json(LOADER.stats(), expanded=False)
+        st.caption("Stage histograms (Prometheus text)")
+        st.code(metrics_text(), language="text")
+
+
+def display_admin_analytics():
+    stats = USAGE_LOG.stats
+    with st.sidebar.expander("📈 Admin: usage"):
+        last_hour, last_day = stats.rolling(60), stats.rolling(24 * 60)
+        cols = st.columns(3)
+        for col, kind, label in zip(cols, ("search", "card_click", "prompt"), ("Searches", "Card clicks", "Prompts")):
+            col.metric(label, last_day[kind], f"{last_hour[kind]} last hour", delta_color="off")
+        st.caption("Events per minute, last hour")
+        st.bar_chart(stats.timeline(60))
+        st.caption("Top topics")
+        st.table([{"topic": topic, "searches": count} for topic, count in stats.top("topics")])
+        st.caption("Top tech filters")
+        st.table([{"tech": tech, "searches": count} for tech, count in stats.top("tech")])
+        if CATALOG is not None:
+            st.caption("Most opened projects")
+            # Clicks from before the catalog was renumbered can't be named from the current one
+            st.table([{"project": CATALOG.project(pid).title if id_space == CATALOG.id_space and isinstance(pid, int) and CATALOG.has_project(pid)
+                       else f"#{pid} (earlier catalog)", "clicks": count} for (id_space, pid), count in stats.top("projects")])
+        st.caption(f"Result-cache warm-up list ({len(stats.warmup_filters())} searches)")
+        st.json(stats.warmup_filters(), expanded=False)
+        if USAGE_LOG.dropped:
+            st.warning(f"{USAGE_LOG.dropped} events dropped while the log was unwritable")
+
+
 def display_testimonials():
     st.markdown("<h2 style='color:#8CFFB5; text-align:center;'>What Our Users Say</h2>", unsafe_allow_html=True)
     st.markdown("<p style='color:#BBBBBB; text-align:center; margin-bottom: 30px;'>Hear from students who loved the Project Contents.</p>", unsafe_allow_html=True)
@@ -441,166 +605,30 @@ def display_testimonials():
 
 
 def generate_ai_prompt_page(project):
-    st.title(f"Generate AI Prompt for: {project['title']}")
+    st.title(f"Generate AI Prompt for: {project.title}")
     st.markdown(f"""
         <p style="font-size: 1.1em; color: #E0E0E0;">
             Use the power of AI to kickstart your project! Select an AI model below to generate a tailored prompt.
         </p>
     """, unsafe_allow_html=True)
 
-    st.markdown(f"**Project Description:** {project['description']}")
-    st.markdown(f"**Key Technologies:** {', '.join(project['tech'])}")
-    st.markdown(f"**Difficulty:** {project['difficulty']}")
+    st.markdown(f"**Project Description:** {project.description}")
+    st.markdown(f"**Key Technologies:** {', '.join(project.tech)}")
+    st.markdown(f"**Difficulty:** {project.difficulty}")
 
     st.subheader("Choose an AI Model:")
     ai_model = st.selectbox(
         "Select an AI model to generate the prompt:",
-        options=["Gemini (Google)", "ChatGPT (OpenAI)", "Llama 3 (Meta)"],
+        options=list(PROMPT_MODELS),
         key="ai_model_select"
     )
 
-    generated_prompt = ""
-    model_link = ""
-
-    if ai_model == "Gemini (Google)":
-        generated_prompt = f"""
-        **Role:** You are an expert Computer Science Project Mentor and a leading AI Engineer specializing in practical project implementation and effective planning.
-
-        **Task:** Generate a highly detailed and actionable project plan for the following project. Your response should serve as a step-by-step guide for a developer to initiate and complete this project successfully.
-
-        **Project Details:**
-        * **Project Title:** "{project['title']}"
-        * **Project Description:** "{project['description']}"
-        * **Key Technologies:** {', '.join(project['tech'])}
-        * **Difficulty Level:** {project['difficulty']}
-
-        **Expected Output Structure and Content:**
-
-        **1. Comprehensive Project Breakdown (Phases & Modules):**
-        * **Phase 1: Planning & Setup:**
-            * Detailed steps for environment setup, dependency installation, and initial project structure.
-            * Specific considerations for the chosen technologies (e.g., cloud account setup for paid services, virtual environments for Python).
-        * **Phase 2: Core Development - Module 1 (e.g., Data Ingestion/Frontend):**
-            * Break down into granular tasks (e.g., "Design API endpoints," "Implement data parsing logic," "Build user authentication").
-            * Mention specific libraries or components relevant to each task.
-        * **Phase 3: Core Development - Module 2 (e.g., Model Training/Backend Logic):**
-            * Similarly, list granular tasks and technology-specific implementation details.
-        * **Phase 4: Integration & Testing:**
-            * Steps for integrating different modules.
-            * Strategies for unit, integration, and system testing.
-            * Recommended testing frameworks/tools if applicable.
-        * **Phase 5: Deployment & Monitoring:**
-            * Detailed steps for deploying the project (e.g., "Containerize application with Docker," "Deploy to AWS Lambda/Azure App Service," "Set up monitoring dashboards").
-            * Post-deployment considerations.
-
-        **2. Key Technical Challenges & Solutions:**
-        * For each major challenge identified, suggest 2-3 concrete approaches or solutions.
-        * Example: "Challenge: Handling real-time data streams. Solution: Use Apache Kafka for message queuing."
-
-        **3. Required Skill Set Enhancement:**
-        * Beyond the listed technologies, specify complementary skills that would be highly beneficial (e.g., "Strong understanding of distributed systems," "Proficiency in SQL query optimization").
-
-        **4. Curated Learning Resources (3-5 specific suggestions):**
-        * **Online Courses:** Name 1-2 reputable courses (e.g., Coursera, Udemy, edX) relevant to core technologies or concepts.
-        * **Documentation/Official Guides:** Mention crucial official documentation (e.g., TensorFlow docs, AWS Boto3 docs).
-        * **Research Papers/Blogs:** Suggest types of academic papers or industry blogs for deeper insights.
-        * **Open-Source Projects:** Point to similar open-source projects for inspiration or learning patterns.
-
-        **5. Measurable Mini-Milestones (5-7 initial, achievable steps):**
-        * "Week 1: Set up project repository, install dependencies, and create a 'Hello World' endpoint."
-        * "Week 2: Implement basic data ingestion and storage for a small dataset."
-        * Ensure these are concrete and provide a sense of early progress.
-
-        **6. Project Success Metrics & Evaluation:**
-        * Define 2-3 quantitative and qualitative metrics for evaluating the project's success (e.g., "Model accuracy > 90%", "Latency < 200ms," "User satisfaction via surveys").
-
-        **Call to Action:** Generate the detailed project plan based on the above instructions.
-        """
-        model_link = "https://gemini.google.com/"
-    elif ai_model == "ChatGPT (OpenAI)":
-        generated_prompt = f"""
-        **Role:** You are an experienced Software Architect and Project Manager. Your task is to provide a comprehensive architectural outline and strategic plan for the given project, suitable for a team of developers.
-
-        **Task:** Based on the project details below, deliver a structured response covering scope, architecture, features, testing, and future work.
-
-        **Project Details:**
-        * **Project Title:** "{project['title']}"
-        * **Project Overview:** "{project['description']}"
-        * **Technical Stack:** {', '.join(project['tech'])}
-        * **Target Difficulty:** {project['difficulty']}
-
-        **Expected Output Structure and Content:**
-
-        **1. Detailed Project Scope & Objectives:**
-        * **Primary Objectives:** Clearly state 2-3 main goals of the project.
-        * **Key Deliverables:** List specific outputs or artifacts expected from the project (e.g., "Functional web application," "Deployed machine learning API," "Comprehensive test suite").
-        * **Non-Goals:** Briefly mention what the project will *not* cover to manage expectations.
-
-        **2. High-Level Architectural Design:**
-        * **Components:** Identify the major logical components of the system (e.g., "Frontend UI," "Backend API Service," "Database Layer," "Message Queue," "ML Model Service").
-        * **Data Flow Diagram (Conceptual):** Describe the flow of data between these components (e.g., "User interaction -> Frontend -> API Gateway -> Backend Service -> Database").
-        * **Architectural Style (if applicable):** Suggest suitable architectural patterns (e.g., Microservices, Monolithic, Serverless, Event-Driven).
-        * **Technology Mapping:** Briefly explain which core technologies from the stack map to which architectural components.
-
-        **3. Prioritized Feature List:**
-        * **Must-Have (MVP):** 3-5 essential features for a minimum viable product.
-        * **Should-Have:** 2-3 important features for a subsequent release.
-        * **Nice-to-Have:** 1-2 potential future enhancements.
-        * For each feature, briefly describe its purpose.
-
-        **4. Testing Strategies & Quality Assurance:**
-        * **Unit Testing:** Describe how unit tests would be structured (e.g., "Per-module/function testing").
-        * **Integration Testing:** Outline integration points to test (e.g., "API endpoint testing," "database connectivity").
-        * **End-to-End Testing:** Suggest E2E scenarios.
-        * **Performance/Load Testing (if applicable):** Briefly mention considerations for high-traffic systems.
-        * **Security Testing:** Highlight critical security considerations (e.g., "Input validation," "Authentication/Authorization testing").
-
-        **5. Potential Extensions & Future Work:**
-        * Brainstorm 3-5 ideas for evolving the project beyond its initial scope (e.g., "Adding a mobile application," "Integrating advanced analytics," "Multi-language support").
-
-        **Call to Action:** Provide a detailed architectural and strategic project plan using the requested structure.
-        """
-        model_link = "https://chat.openai.com/"
-    elif ai_model == "Llama 3 (Meta)":
-        generated_prompt = f"""
-        **Role:** You are an Open-Source Advocate and a practical Lead Developer focused on building robust, community-friendly projects.
-
-        **Task:** Provide guidance for a project with the aim of fostering open-source best practices, accelerating development with existing tools, and outlining a clear learning path.
-
-        **Project Details:**
-        * **Project Title:** "{project['title']}"
-        * **Project Core:** "{project['description']}"
-        * **Technologies Involved:** {', '.join(project['tech'])}
-        * **Complexity Level:** {project['difficulty']}
-
-        **Expected Output Structure and Content:**
-
-        **1. Core Functionalities (Detailed):**
-        * List 5-7 fundamental features that define the project's primary purpose.
-        * For each functionality, provide a brief technical explanation of how it would be achieved using the specified technologies.
-
-        **2. Strategic Open-Source Tool & Library Recommendations:**
-        * For each major component or task (e.g., "Data processing," "UI Framework," "Deployment," "Database management"), recommend 2-3 specific open-source tools or libraries from the project's tech stack or complementary ones.
-        * Briefly explain *why* each tool is a good fit for this project and how it accelerates development.
-
-        **3. Open-Source Community Best Practices:**
-        * **Documentation:** What essential documentation should be created (e.g., "README.md," "CONTRIBUTING.md," "API docs," "User Guide")?
-        * **Contribution Guidelines:** What process should be established for external contributions (e.g., "Issue tracking," "Pull Request review process," "Code of Conduct")?
-        * **Version Control:** Emphasize Git best practices (e.g., branching strategy, commit message conventions).
-        * **Licensing:** Suggest a suitable open-source license and explain why.
-
-        **4. Straightforward Deployment Options:**
-        * Propose 2-3 accessible deployment strategies, particularly for an open-source context (e.g., "Docker containers on a VPS," "Heroku/Netlify for web apps," "GitHub Pages for static sites").
-        * Briefly outline the steps for each option.
-
-        **5. Practical Learning Path for Technologies:**
-        * For each core technology listed in the project, suggest a "learn-by-doing" approach.
-        * Recommend specific mini-projects or tutorials that would help a developer quickly gain proficiency relevant to this project (e.g., "Build a simple REST API with Flask," "Implement a basic CNN for image classification").
-        * Suggest how to leverage official documentation and community forums effectively.
-
-        **Call to Action:** Generate the detailed guidance for this open-source-focused project.
-        """
-        model_link = "https://llama.meta.com/"
+    # Templates are compiled once per process and prompts memoized per project/model (see fein/prompts.py)
+    generated_prompt = generate_prompt(CATALOG, project.id, ai_model)
+    if st.session_state.get('logged_prompt') != (CATALOG.ref(project.id), ai_model):
+        st.session_state['logged_prompt'] = (CATALOG.ref(project.id), ai_model)
+        USAGE_LOG.record("prompt", id=project.id, id_space=CATALOG.id_space, model=ai_model)
+    model_link = prompt_templates()[ai_model].link
     
     st.subheader("Generated AI Prompt:")
     st.code(generated_prompt, language="markdown")
@@ -613,68 +641,106 @@ def generate_ai_prompt_page(project):
     if st.link_button(f"Go to {ai_model}", model_link, type="primary"):
         pass
 
+    display_related_projects(project)
+
+
+def display_related_projects(project):
+    # Nearest neighbours in the catalog's precomputed semantic vectors (see fein/semantic.py); none until they're ready
+    with span("related"):
+        related_ids = related_projects(CATALOG, project.id)
+    if not related_ids:
+        return
+    st.subheader("Related Projects:")
+    cols = st.columns(CARDS_PER_ROW)
+    for i, related_id in enumerate(related_ids):
+        with cols[i % CARDS_PER_ROW]:
+            st.markdown(card_html(CATALOG, related_id), unsafe_allow_html=True)
+            st.button("✨ Generate AI Prompt", key=f"related_prompt_{CATALOG.id_space}_{related_id}", type="secondary",
+                      on_click=select_project_for_ai, args=(CATALOG.ref(related_id), "related"))
+
 # --- 8. Final Main App Execution Block ---
 
 # --- GLOBAL VISIT COUNTER INCREMENT ---
-st.session_state.global_total_visits = increment_global_visit_count()
+# Count each session once, not every widget-triggered rerun
+with span("visit_counter"):
+    if 'global_visit_counted' not in st.session_state:
+        st.session_state.global_visit_counted = True
+        st.session_state.global_total_visits = VISIT_COUNTER.increment()
+    else:
+        st.session_state.global_total_visits = VISIT_COUNTER.total()
 
 # Call animated_search at the top of the main execution block to ensure sidebar is always rendered
-topic, difficulty_range, tech_filter, dataset_filter, keywords_filter = animated_search()
+with span("sidebar"):
+    topic, difficulty_range, tech_filter, dataset_filter, keywords_filter, sort_order = animated_search()
+
+# A project removed by a catalog patch, or renumbered by a reload, while its prompt page was open falls back to the feed
+selected_project_id = None
+if CATALOG is not None and st.session_state.get('selected_project_for_ai') is not None:
+    selected_project_id = CATALOG.resolve(st.session_state['selected_project_for_ai'])
+    if selected_project_id is None:
+        st.session_state['selected_project_for_ai'] = None
 
 # Determine which page to display based on selected_project_for_ai
-if st.session_state.get('selected_project_for_ai'):
+if selected_project_id is not None:
     # If a project is selected for AI prompt, show the AI page
-    generate_ai_prompt_page(st.session_state['selected_project_for_ai'])
+    with span("prompt_page"):
+        generate_ai_prompt_page(CATALOG.project(selected_project_id))
+elif CATALOG is None and LOADER.loading:
+    # First start: show the head of the catalog while the rest streams in, checking again every LOADING_POLL_SECONDS
+    catalog_preview()
 else:
     # Otherwise, show the project explorer
     
-    all_projects_flat = []
-    for domain, projects_list in PROJECT_DB.items():
-        for project in projects_list:
-            all_projects_flat.append((project, domain))
-
-    projects_to_consider = []
+    fetch_page = partial(page, ())
+    total = 0
+    facet_counts = None
+    corrected_topic = None
 
     if st.session_state.get('search_triggered', False):
-        # Filter projects based on current session state filters
-        min_diff_val, max_diff_val = st.session_state.last_difficulty_range
-        difficulty_levels_map = {"Beginner": 1, "Intermediate": 2, "Advanced": 3, "Expert": 4}
+        # Filter projects based on current session state filters (vectorized over the catalog columns)
+        if CATALOG is not None:
+            query = ProjectQuery.from_filters(
+                st.session_state.last_topic,
+                st.session_state.last_difficulty_range,
+                st.session_state.last_tech_filter,
+                st.session_state.last_dataset_filter,
+                st.session_state.last_keywords_filter,
+            )
+            with span("filter"):
+                # Falls back to a spelling-corrected topic when the exact search finds nothing
+                resolved_query, matching_ids = resolve_query(CATALOG, query)
+            total = len(matching_ids)
+            # Log each distinct search once per session, not on every rerun that repaints it
+            if st.session_state.get('logged_search') != (query, st.session_state.last_sort):
+                st.session_state['logged_search'] = (query, st.session_state.last_sort)
+                USAGE_LOG.record("search", filters=search_filters(query, st.session_state.last_sort), results=total,
+                                 corrected=resolved_query.topic if resolved_query != query else None)
+            if resolved_query != query:
+                corrected_topic, query = resolved_query.topic, resolved_query
+            with span("facet_counts"):
+                facet_counts = live_facet_counts(CATALOG, matching_ids)
+            # Relevance only ranks up to the end of the visible page; a heap picks it without sorting every match.
+            # Until the model is built in the background, matches keep catalog order rather than waiting for it
+            ranked = st.session_state.last_sort == 'Relevance'
+            if ranked and query.topic and CATALOG.built("ranking_model") is None:
+                st.caption("Relevance ranking is still being prepared; showing catalog order for now.")
+            fetch_page = partial(query_page, CATALOG, query, ranked=ranked, wait=False)
         
-        for domain, projects in PROJECT_DB.items():
-            for project in projects:
-                project_difficulty_numeric = difficulty_levels_map.get(project['difficulty'], 0)
-                
-                if not (min_diff_val <= project_difficulty_numeric <= max_diff_val): continue
-                if st.session_state.last_topic and not search_text_match(project, st.session_state.last_topic): continue
-                if st.session_state.last_tech_filter and not any(t in project['tech'] for t in st.session_state.last_tech_filter): continue
-                if st.session_state.last_dataset_filter and not any(st.session_state.last_dataset_filter.lower() in ds.lower() for ds in project['datasets']): continue
-                if st.session_state.last_keywords_filter and not any(st.session_state.last_keywords_filter.lower() in kw.lower() for kw in project.get('keywords', [])): continue
-                
-                projects_to_consider.append((project, domain))
-        
-    else:
+    elif CATALOG is not None:
         # Initial load or no search triggered, display random projects
-        if 'initial_shuffled_projects' not in st.session_state:
-            random.shuffle(all_projects_flat)
-            st.session_state.initial_shuffled_projects = all_projects_flat
-        
-        projects_to_consider = st.session_state.initial_shuffled_projects
-
-
-    # Display the projects up to the current limit
-    display_project_cards(projects_to_consider[:st.session_state.project_display_limit])
-
-    # --- "Load More" Button Logic ---
-    if st.session_state.project_display_limit < len(projects_to_consider):
-        # Calculate how many more can be loaded in the next click
-        load_increment = 10 # Number of projects to load with each click
-        remaining_projects = len(projects_to_consider) - st.session_state.project_display_limit
-        
-        # Adjust button text to show how many will be loaded next
-        button_text = f"Load {min(load_increment, remaining_projects)} More Projects"
-        
-        if st.button(button_text, key="load_more_projects", use_container_width=True, type="secondary"):
-            st.session_state.project_display_limit += load_increment
-            st.rerun() # Rerun the app to display more projects
-    elif len(projects_to_consider) > 0: # Only show this if there are projects to display
-        st.success("All projects loaded!")
+        # Sessions keep only a seed; each page of the random order is computed on demand (see fein/discover.py)
+        if 'shuffle_seed' not in st.session_state:
+            st.session_state.shuffle_seed = random.getrandbits(32)
+        feed = discover_feed(CATALOG, st.session_state.shuffle_seed, DISCOVER_MIXES[st.session_state.get('discover_mix', "Any project")])
+        total = feed.total
+        fetch_page = feed.page
+
+
+    # Display the projects up to the current limit; paging happens inside the feed fragment
+    display_project_cards(CATALOG, fetch_page, total, facet_counts, corrected_topic)
+
+# --- PROFILING RESULTS (admin only) ---
+RUN_SUMMARY = end_run()
+if IS_ADMIN:
+    display_admin_panel(RUN_SUMMARY)
+    display_admin_analytics()